@@ -65,10 +65,12 @@ const ConfiguracionRecibos = () => {
   const generarRecibosAutomatico = async () => {
     setLoading(true);
     try {
-      const response = await condominioService.generarRecibosAutomatico();
-      setMensaje(`${response.message} - Fecha: ${response.fecha_generacion}`);
+      const tarea = await condominioService.generarRecibosAutomatico();
+      setMensaje(tarea.message);
+      const job = await condominioService.esperarJob(tarea.job_id);
+      setMensaje(job.estado === 'Fallida' ? `Error en generación automática: ${job.error}` : job.resultado.message);
     } catch (error) {
-      setMensaje('Error en generación automática');
+      setMensaje(`Error en generación automática: ${error.response?.data?.error || error.message}`);
       console.error('Error:', error);
     }
     setLoading(false);
@@ -77,10 +79,12 @@ const ConfiguracionRecibos = () => {
   const enviarRecordatorios = async () => {
     setLoading(true);
     try {
-      const response = await condominioService.enviarRecordatorios();
-      setMensaje(`Recordatorios enviados: ${response.enviados || 0}`);
+      const tarea = await condominioService.enviarRecordatorios();
+      setMensaje(tarea.message);
+      const job = await condominioService.esperarJob(tarea.job_id);
+      setMensaje(job.estado === 'Fallida' ? `Error enviando recordatorios: ${job.error}` : `Recordatorios enviados: ${job.resultado.enviados || 0}`);
     } catch (error) {
-      setMensaje('Error enviando recordatorios');
+      setMensaje(`Error enviando recordatorios: ${error.response?.data?.error || error.message}`);
       console.error('Error:', error);
     }
     setLoading(false);
@@ -51,7 +51,7 @@ export default function PagosPage() {
       setLoading(true)
       const [morososList, verificados, creditos] = await Promise.all([
         condominioService.getMorosos(),
-        condominioService.getPagos({ estado: 'Verificado', fecha: new Date().toISOString().split('T')[0] }),
+        condominioService.getPagos({ estado: 'Verificado', fecha: new Date().toISOString().split('T')[0], view: 'compact' }),
         condominioService.getCreditosPropietarios()
       ])
       setMorosos(morososList || [])
@@ -69,7 +69,7 @@ export default function PagosPage() {
   
   const cargarHistorialGeneral = async () => {
     try {
-      const pagos = await condominioService.getPagos({ estado: 'Verificado' })
+      const pagos = await condominioService.getPagos({ estado: 'Verificado', view: 'compact' })
       const pagosArray = pagos?.results || []
       
       const historialData = pagosArray.map(pago => ({
@@ -45,25 +45,30 @@ export default function Recibos() {
   const handleGenerateAll = async () => {
     setIsGenerating(true)
     setGenerationProgress(0)
+    let progressInterval
 
     try {
       // Simulate progress
-      const progressInterval = setInterval(() => {
+      progressInterval = setInterval(() => {
         setGenerationProgress(prev => Math.min(prev + 10, 90))
       }, 200)
 
       const mesAplicacion = selectedMonth + '-01'
-      const response = await condominioService.generarRecibos(mesAplicacion)
+      const tarea = await condominioService.generarRecibos(mesAplicacion)
+      const job = await condominioService.esperarJob(tarea.job_id)
       
       clearInterval(progressInterval)
+      if (job.estado === 'Fallida') throw new Error(job.error)
       setGenerationProgress(100)
       
-      alert(`${response.message || 'Recibos generados exitosamente'}`)
+      alert(`${job.resultado?.message || 'Recibos generados exitosamente'}`)
       loadData() // Reload data after generation
     } catch (error) {
       console.error('Error generando recibos:', error)
-      alert('Error al generar recibos')
+      // 409: ya hay otra operación de facturación en curso para el mes
+      alert(error.response?.data?.error || error.message || 'Error al generar recibos')
     } finally {
+      clearInterval(progressInterval)
       setIsGenerating(false)
       setTimeout(() => setGenerationProgress(0), 1000)
     }
@@ -76,25 +81,30 @@ export default function Recibos() {
 
     setIsGenerating(true)
     setGenerationProgress(0)
+    let progressInterval
 
     try {
-      const progressInterval = setInterval(() => {
+      progressInterval = setInterval(() => {
         setGenerationProgress(prev => Math.min(prev + 10, 90))
       }, 200)
 
       const mesAplicacion = selectedMonth + '-01'
-      const response = await condominioService.actualizarRecibos(mesAplicacion)
+      const tarea = await condominioService.actualizarRecibos(mesAplicacion)
+      const job = await condominioService.esperarJob(tarea.job_id)
       
       clearInterval(progressInterval)
+      if (job.estado === 'Fallida') throw new Error(job.error)
       setGenerationProgress(100)
       
-      alert(`${response.message || 'Recibos actualizados exitosamente'}`)
+      alert(`${job.resultado?.message || 'Recibos actualizados exitosamente'}`)
       // Force reload with fresh data
       window.location.reload()
     } catch (error) {
       console.error('Error actualizando recibos:', error)
-      alert('Error al actualizar recibos')
+      // 409: ya hay otra operación de facturación en curso para el mes
+      alert(error.response?.data?.error || error.message || 'Error al actualizar recibos')
     } finally {
+      clearInterval(progressInterval)
       setIsGenerating(false)
       setTimeout(() => setGenerationProgress(0), 1000)
     }
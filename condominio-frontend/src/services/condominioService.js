@@ -112,6 +112,7 @@ export const condominioService = {
   // Generar recibos
   generarRecibos: (mesAplicacion) => api.post('/recibos/generar_recibos/', { mes_aplicacion: mesAplicacion }),
   actualizarRecibos: (mesAplicacion) => api.post('/recibos/actualizar_recibos/', { mes_aplicacion: mesAplicacion }),
+  previsualizarRecibos: (mesAplicacion) => api.get(`/recibos/previsualizar/?mes_aplicacion=${mesAplicacion}`),
 
   // Configuración de recibos
   getConfiguracionRecibos: () => api.get('/configuracion-recibos/'),
@@ -119,6 +120,27 @@ export const condominioService = {
   updateConfiguracionRecibos: (id, data) => api.put(`/configuracion-recibos/${id}/`, data),
   generarRecibosAutomatico: () => api.post('/configuracion-recibos/generar_automatico/'),
   enviarRecordatorios: () => api.post('/configuracion-recibos/enviar_recordatorios/'),
+
+  // Tareas en segundo plano
+  getJob: (id) => api.get(`/jobs/${id}/`),
+  esperarJob: async (id, onProgreso, { intervalo = 1500, maxEspera = 15 * 60 * 1000, maxPendiente = 2 * 60 * 1000 } = {}) => {
+    // Consulta la tarea hasta que termine; devuelve la tarea completada o fallida.
+    // Falla si nadie la toma en maxPendiente (no hay worker) o si no termina en maxEspera
+    const inicio = Date.now();
+    while (true) {
+      const job = await api.get(`/jobs/${id}/`);
+      if (onProgreso) onProgreso(job);
+      if (job.estado === 'Completada' || job.estado === 'Fallida') return job;
+      const transcurrido = Date.now() - inicio;
+      if (job.estado === 'Pendiente' && transcurrido > maxPendiente) {
+        throw new Error('La tarea sigue en cola: no hay un worker procesando tareas');
+      }
+      if (transcurrido > maxEspera) {
+        throw new Error(`La tarea ${id} no terminó a tiempo; consulte su avance más tarde`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalo));
+    }
+  },
   
   // PDF
   descargarReciboPDF: (reciboId) => {
@@ -126,4 +148,11 @@ export const condominioService = {
     const url = `${import.meta.env.VITE_API_URL || 'http://localhost:8000'}/api/recibos/${reciboId}/pdf/`;
     window.open(`${url}?token=${token}`, '_blank');
   },
+
+  // Exportación CSV (recibos/exportar, pagos/exportar, reportes/exportar_morosos, reportes/exportar_historial_pagos)
+  exportarCSV: (ruta, params = {}) => {
+    const token = localStorage.getItem('token');
+    const query = new URLSearchParams({ ...params, token }).toString();
+    window.open(`${import.meta.env.VITE_API_URL || 'http://localhost:8000'}/api/${ruta}/?${query}`, '_blank');
+  },
 };
\ No newline at end of file
@@ -1,9 +1,12 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import (
     Propietario, Edificio, Inmueble, Tipos_Gasto, Conceptos_Gasto,
     Gastos_del_Mes, Movimientos_Gastos, Gastos_Edificios, Movimientos_Edificios,
-    Recibos, Detalles_Recibo, Pagos, Tasa_Cambio, Configuracion_Recibos
+    Recibos, Detalles_Recibo, Pagos, Tasa_Cambio, Configuracion_Recibos, Tarea,
+    Corrida_Facturacion, Notificacion
 )
+from .services import verificar_pagos_en_lote
 
 
 @admin.register(Propietario)
@@ -120,8 +123,9 @@ class PagosAdmin(admin.ModelAdmin):
     actions = ['verificar_pagos', 'rechazar_pagos']
 
     def verificar_pagos(self, request, queryset):
-        queryset.update(estado_verificacion='Verificado')
-        self.message_user(request, f'Se verificaron {queryset.count()} pagos.')
+        resultados = verificar_pagos_en_lote(queryset.values_list('id', flat=True))
+        verificados = sum(1 for resultado in resultados if resultado['resultado'] == 'Verificado')
+        self.message_user(request, f'Se verificaron {verificados} pagos.')
     verificar_pagos.short_description = 'Verificar pagos seleccionados'
 
     def rechazar_pagos(self, request, queryset):
@@ -148,4 +152,34 @@ class Configuracion_RecibosAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         # No permitir eliminar la configuración
-        return False
\ No newline at end of file
+        return False
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'periodo', 'estado', 'procesados', 'total', 'errores', 'intentos', 'fecha_creacion']
+    list_filter = ['tipo', 'estado']
+    search_fields = ['periodo']
+    readonly_fields = ['fecha_creacion', 'fecha_inicio', 'fecha_actualizacion', 'fecha_fin']
+
+
+@admin.register(Corrida_Facturacion)
+class Corrida_FacturacionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'periodo', 'estado', 'procesados', 'total_inmuebles', 'recibos_creados', 'lotes', 'fecha_inicio']
+    list_filter = ['estado']
+    search_fields = ['periodo']
+    readonly_fields = ['fecha_inicio', 'fecha_actualizacion', 'fecha_fin']
+
+
+@admin.register(Notificacion)
+class NotificacionAdmin(admin.ModelAdmin):
+    list_display = ['clave', 'tipo', 'propietario', 'periodo', 'estado', 'intentos', 'proximo_intento', 'fecha_envio']
+    list_filter = ['tipo', 'estado', 'periodo']
+    search_fields = ['clave', 'propietario__nombre', 'propietario__apellido']
+    actions = ['reintentar_notificaciones']
+
+    def reintentar_notificaciones(self, request, queryset):
+        # Devuelve a la cola las notificaciones descartadas tras agotar los intentos
+        cantidad = queryset.filter(estado='Fallida').update(estado='Pendiente', intentos=0, proximo_intento=timezone.now())
+        self.message_user(request, f'Se reintentarán {cantidad} notificaciones.')
+    reintentar_notificaciones.short_description = 'Reintentar notificaciones fallidas'
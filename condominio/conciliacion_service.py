@@ -0,0 +1,185 @@
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from .models import Pagos
+from .services import verificar_pagos_en_lote
+
+# Nombres de columna aceptados en los estados de cuenta CSV
+COLUMNAS_REFERENCIA = ('referencia', 'referencia_bancaria', 'reference', 'ref', 'numero_referencia')
+COLUMNAS_MONTO = ('monto', 'amount', 'importe', 'credito', 'abono')
+COLUMNAS_FECHA = ('fecha', 'date', 'fecha_valor')
+
+ETIQUETA_OFX = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def normalizar_referencia(referencia):
+    """Normaliza una referencia bancaria para comparar la del banco con la registrada"""
+    return (referencia or '').strip().replace(' ', '').upper().lstrip('0')
+
+
+def convertir_monto(texto):
+    """Convierte montos como '1234.56', '1.234,56' o '1,234.56' a Decimal"""
+    texto = (texto or '').strip().replace(' ', '').replace('$', '')
+    if ',' in texto and '.' in texto:
+        # El último separador es el decimal
+        if texto.rfind(',') > texto.rfind('.'):
+            texto = texto.replace('.', '').replace(',', '.')
+        else:
+            texto = texto.replace(',', '')
+    elif ',' in texto:
+        texto = texto.replace(',', '.')
+    try:
+        return Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def _columna(fila, nombres):
+    for nombre in nombres:
+        if fila.get(nombre) not in (None, ''):
+            return fila[nombre]
+    return None
+
+
+def _encadenar(primera_linea, resto):
+    yield primera_linea
+    yield from resto
+
+
+def leer_csv(archivo):
+    """Lee un estado de cuenta CSV fila por fila (sin cargarlo completo en memoria)"""
+    muestra = archivo.readline()
+    delimitador = ';' if muestra.count(';') > muestra.count(',') else ','
+    lector = csv.DictReader(
+        _encadenar(muestra, archivo),
+        delimiter=delimitador
+    )
+    lector.fieldnames = [nombre.strip().lower() for nombre in lector.fieldnames or []]
+
+    for numero_linea, fila in enumerate(lector, start=2):
+        yield {
+            'linea': numero_linea,
+            'referencia': _columna(fila, COLUMNAS_REFERENCIA),
+            'monto': convertir_monto(_columna(fila, COLUMNAS_MONTO)),
+            'fecha': _columna(fila, COLUMNAS_FECHA),
+        }
+
+
+def leer_ofx(archivo):
+    """Lee las transacciones (STMTTRN) de un archivo OFX/QFX línea por línea"""
+    transaccion = None
+    for numero_linea, linea in enumerate(archivo, start=1):
+        for cierre, etiqueta, valor in ETIQUETA_OFX.findall(linea):
+            etiqueta = etiqueta.upper()
+            if etiqueta == 'STMTTRN':
+                if transaccion:
+                    yield _movimiento_ofx(transaccion)
+                transaccion = None if cierre else {'linea': numero_linea}
+            elif transaccion is not None and not cierre and valor.strip():
+                transaccion[etiqueta] = valor.strip()
+    if transaccion:
+        yield _movimiento_ofx(transaccion)
+
+
+def _movimiento_ofx(transaccion):
+    fecha = transaccion.get('DTPOSTED', '')[:8]
+    return {
+        'linea': transaccion['linea'],
+        'referencia': transaccion.get('REFNUM') or transaccion.get('CHECKNUM') or transaccion.get('FITID'),
+        'monto': convertir_monto(transaccion.get('TRNAMT')),
+        'fecha': datetime.strptime(fecha, '%Y%m%d').date().isoformat() if len(fecha) == 8 else None,
+    }
+
+
+def leer_estado_cuenta(archivo, formato=None, nombre=''):
+    """Devuelve un generador de movimientos {linea, referencia, monto, fecha}.
+
+    `archivo` puede ser binario (archivo subido) o de texto; el formato se
+    deduce de la extensión del nombre si no se indica.
+    """
+    if not formato:
+        formato = 'ofx' if nombre.lower().endswith(('.ofx', '.qfx')) else 'csv'
+    if isinstance(archivo.read(0), bytes):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', errors='replace', newline='')
+    return leer_ofx(archivo) if formato == 'ofx' else leer_csv(archivo)
+
+
+def conciliar_estado_cuenta(movimientos):
+    """Concilia los movimientos del banco contra los pagos 'Por Verificar'.
+
+    Los pagos pendientes se indexan una sola vez por referencia normalizada;
+    como referencias distintas pueden normalizarse igual ('00123' y '123'),
+    cada referencia guarda la lista de sus pagos y el movimiento se concilia
+    con el único de ellos que tenga su monto. Si ninguno o varios coinciden,
+    el movimiento queda como discrepancia. Los pagos encontrados se verifican
+    juntos en lote y solo cuentan como conciliados los que quedaron verificados.
+    """
+    pendientes = defaultdict(list)
+    for pago_id, referencia, monto in Pagos.objects.filter(
+        estado_verificacion='Por Verificar'
+    ).values_list('id', 'referencia_bancaria', 'monto_pagado').order_by('id').iterator(chunk_size=2000):
+        pendientes[normalizar_referencia(referencia)].append((pago_id, monto))
+
+    encontrados = []
+    discrepancias = []
+    no_conciliados = []
+    ignorados = 0
+
+    for movimiento in movimientos:
+        if movimiento['monto'] is not None and movimiento['monto'] <= 0:
+            # Débitos y comisiones del estado de cuenta
+            ignorados += 1
+            continue
+
+        referencia = normalizar_referencia(movimiento['referencia'])
+        if not referencia or movimiento['monto'] is None:
+            no_conciliados.append({**movimiento, 'motivo': 'Movimiento sin referencia o monto válido'})
+            continue
+
+        candidatos = pendientes.get(referencia)
+        if not candidatos:
+            no_conciliados.append({**movimiento, 'motivo': 'No hay pago por verificar con esta referencia'})
+            continue
+
+        iguales = [candidato for candidato in candidatos if candidato[1] == movimiento['monto']]
+        if len(iguales) == 1:
+            # Un movimiento repetido en el archivo no verifica dos veces el mismo pago
+            candidatos.remove(iguales[0])
+            encontrados.append({**movimiento, 'pago_id': iguales[0][0]})
+            continue
+
+        discrepancias.append({
+            **movimiento,
+            'motivo': 'Varios pagos con esta referencia y monto' if iguales else 'El monto no coincide con el registrado',
+            'pagos': [
+                {'pago_id': pago_id, 'monto_registrado': monto}
+                for pago_id, monto in (iguales or candidatos)
+            ],
+        })
+
+    resultados = {
+        resultado['pago_id']: resultado['resultado']
+        for resultado in verificar_pagos_en_lote([encontrado['pago_id'] for encontrado in encontrados])
+    }
+    conciliados = []
+    for encontrado in encontrados:
+        if resultados[encontrado['pago_id']] == 'Verificado':
+            conciliados.append(encontrado)
+        else:
+            # Verificado o eliminado por otro usuario mientras se conciliaba
+            no_conciliados.append({
+                **encontrado, 'motivo': f"Pago {encontrado['pago_id']}: {resultados[encontrado['pago_id']]}"
+            })
+
+    return {
+        'conciliados': conciliados,
+        'discrepancias': discrepancias,
+        'no_conciliados': no_conciliados,
+        'total_conciliados': len(conciliados),
+        'total_discrepancias': len(discrepancias),
+        'total_no_conciliados': len(no_conciliados),
+        'total_ignorados': ignorados,
+    }
@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+
+def a_centimos(monto):
+    """Decimal -> céntimos enteros (redondeando a 2 decimales)"""
+    return int(monto.quantize(Decimal('0.01')).scaleb(2))
+
+
+def repartir_centimos(centimos, pesos):
+    """Reparte `centimos` proporcionalmente a `pesos` (enteros) por el método del mayor resto.
+
+    Cada parte recibe el piso de su cuota exacta y los céntimos que sobran se
+    asignan, uno a uno, a las partes con mayor resto (en empate, a la primera);
+    la suma de las partes es siempre exactamente `centimos`.
+    """
+    total_pesos = sum(pesos)
+    if total_pesos <= 0:
+        return [0] * len(pesos)
+
+    productos = [centimos * peso for peso in pesos]
+    partes = [producto // total_pesos for producto in productos]
+    sobrante = centimos - sum(partes)
+    if sobrante:
+        restos = [producto % total_pesos for producto in productos]
+        # sorted es estable también con reverse: en empate queda primero la primera parte
+        for indice in sorted(range(len(restos)), key=restos.__getitem__, reverse=True)[:sobrante]:
+            partes[indice] += 1
+    return partes
+
+
+def repartir_partes_iguales(centimos, cantidad):
+    """Reparte `centimos` en `cantidad` partes iguales; el sobrante va a las primeras"""
+    if cantidad <= 0:
+        return []
+    base, sobrante = divmod(centimos, cantidad)
+    return [base + 1] * sobrante + [base] * (cantidad - sobrante)
+
+
+def repartir_cargos(cargos, inmuebles):
+    """Calcula el reparto de cada cargo entre los inmuebles que le corresponden.
+
+    `inmuebles` son todos los inmuebles del condominio (con edificio_id y alicuota),
+    también los ya facturados, para que el reparto no dependa de cuáles falten.
+    Cada cargo debe traer 'monto', 'tipo_calculo' y 'edificios' (None = todos);
+    se le agrega 'reparto' = {inmueble_id: monto}, que suma exactamente su monto.
+    Los gastos comunes se reparten por alícuota y los demás en partes iguales.
+    """
+    pesos = [int(inmueble.alicuota.scaleb(6)) for inmueble in inmuebles]
+    grupos = {}
+    montos = {}
+
+    for cargo in cargos:
+        clave = None if cargo['edificios'] is None else frozenset(cargo['edificios'])
+        if clave not in grupos:
+            # Inmuebles y alícuotas de cada conjunto de edificios, calculados una sola vez
+            miembros = [
+                indice for indice, inmueble in enumerate(inmuebles)
+                if clave is None or inmueble.edificio_id in clave
+            ]
+            grupos[clave] = ([inmuebles[i].id for i in miembros], [pesos[i] for i in miembros])
+        ids, alicuotas = grupos[clave]
+
+        centimos = a_centimos(cargo['monto'])
+        if cargo['tipo_calculo'] == 'Comun':
+            partes = repartir_centimos(centimos, alicuotas)
+        else:
+            partes = repartir_partes_iguales(centimos, len(ids))
+
+        # Cada valor en céntimos se convierte a Decimal una sola vez
+        for parte in set(partes):
+            if parte not in montos:
+                montos[parte] = Decimal(parte).scaleb(-2)
+        cargo['reparto'] = {inmueble_id: montos[parte] for inmueble_id, parte in zip(ids, partes)}
+
+    return cargos
@@ -0,0 +1,97 @@
+import csv
+from django.db.models import Case, When, Value, CharField
+from django.http import StreamingHttpResponse
+
+# Filas leídas de la base de datos por cada viaje del cursor
+TAMANO_LOTE = 2000
+
+# (encabezado, campo) de cada exportación; los campos se leen con values_list
+COLUMNAS_RECIBOS = (
+    ('Número', 'numero_recibo'),
+    ('Fecha emisión', 'fecha_emision'),
+    ('Edificio', 'id_inmueble__edificio__numero_edificio'),
+    ('Piso', 'id_inmueble__piso'),
+    ('Apartamento', 'id_inmueble__apartamento'),
+    ('Cédula', 'id_inmueble__propietario__cedula'),
+    ('Nombre', 'id_inmueble__propietario__nombre'),
+    ('Apellido', 'id_inmueble__propietario__apellido'),
+    ('Deuda anterior', 'monto_deuda_anterior'),
+    ('Cargos del mes', 'monto_cargos_mes'),
+    ('Interés de mora', 'monto_interes_mora'),
+    ('Total a pagar', 'monto_total_pagar'),
+    ('Saldo pendiente', 'saldo_pendiente'),
+    ('Estado', 'estado'),
+)
+
+COLUMNAS_PAGOS = (
+    ('ID', 'id'),
+    ('Recibo', 'id_recibo__numero_recibo'),
+    ('Edificio', 'id_recibo__id_inmueble__edificio__numero_edificio'),
+    ('Piso', 'id_recibo__id_inmueble__piso'),
+    ('Apartamento', 'id_recibo__id_inmueble__apartamento'),
+    ('Fecha pago', 'fecha_pago'),
+    ('Monto pagado', 'monto_pagado'),
+    ('Referencia bancaria', 'referencia_bancaria'),
+    ('Método', 'metodo_pago'),
+    ('Estado', 'estado_verificacion'),
+    ('Nota', 'nota'),
+)
+
+COLUMNAS_HISTORIAL = (
+    ('ID', 'id'),
+    ('Recibo', 'id_recibo__numero_recibo'),
+    ('Monto aplicado', 'monto_aplicado'),
+    ('Crédito generado', 'monto_credito_generado'),
+    ('Tipo', 'tipo_transaccion'),
+    ('Referencia bancaria', 'referencia_bancaria'),
+    ('Fecha', 'fecha_transaccion'),
+    ('Notas', 'notas'),
+)
+
+COLUMNAS_MOROSOS = (
+    ('Propietario ID', 'inmueble__propietario__id'),
+    ('Nombre', 'inmueble__propietario__nombre'),
+    ('Apellido', 'inmueble__propietario__apellido'),
+    ('Edificio', 'inmueble__edificio__numero_edificio'),
+    ('Piso', 'inmueble__piso'),
+    ('Apartamento', 'inmueble__apartamento'),
+    ('Saldo pendiente', 'total_deuda'),
+    ('Recibos pendientes', 'recibos_pendientes'),
+    ('Moroso', 'es_moroso'),
+)
+
+
+class _Eco:
+    """Pseudo-archivo: csv.writer devuelve la línea escrita en lugar de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+def filas_csv(queryset, columnas):
+    """Genera el CSV línea por línea leyendo el queryset por lotes.
+
+    Solo se traen las columnas exportadas (values_list) y se recorren con
+    iterator(), así la memoria no crece con la cantidad de filas.
+    """
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca los acentos como UTF-8
+    yield '\ufeff' + escritor.writerow([encabezado for encabezado, _ in columnas])
+    campos = [campo for _, campo in columnas]
+    for fila in queryset.values_list(*campos).iterator(chunk_size=TAMANO_LOTE):
+        yield escritor.writerow(fila)
+
+
+def respuesta_csv(queryset, columnas, nombre):
+    """StreamingHttpResponse que descarga el queryset como `nombre`.csv"""
+    respuesta = StreamingHttpResponse(filas_csv(queryset, columnas), content_type='text/csv; charset=utf-8')
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return respuesta
+
+
+def anotar_morosidad(queryset):
+    """Agrega la columna es_moroso (más de 3 recibos pendientes) al queryset de saldos"""
+    return queryset.annotate(es_moroso=Case(
+        When(recibos_pendientes__gt=3, then=Value('Sí')),
+        default=Value('No'),
+        output_field=CharField()
+    ))
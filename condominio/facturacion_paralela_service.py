@@ -0,0 +1,111 @@
+import heapq
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.db import connection, connections, transaction
+from .models import Recibos, Secuencia_Recibos
+from .services import BATCH_SIZE, calcular_facturacion, persistir_facturacion
+
+# Estado de cada proceso hijo: el plan heredado del proceso principal (solo lectura)
+_plan = None
+_corrida = None
+_inmuebles = None
+
+# Segundos entre consultas del avance mientras los procesos facturan
+INTERVALO_PROGRESO = 2
+
+
+def repartir_por_edificio(inmuebles, partes):
+    """Agrupa los inmuebles por edificio en hasta `partes` fragmentos de tamaño parecido.
+
+    Cada edificio queda entero en un solo fragmento; los edificios se asignan
+    del más grande al más chico al fragmento con menos inmuebles.
+    Devuelve listas de ids de inmueble, ordenadas por edificio y por id.
+    """
+    por_edificio = defaultdict(list)
+    for inmueble in inmuebles:
+        por_edificio[inmueble.edificio_id].append(inmueble.id)
+
+    fragmentos = [(0, indice, []) for indice in range(min(partes, len(por_edificio)))]
+    for edificio_id in sorted(por_edificio, key=lambda edificio_id: (-len(por_edificio[edificio_id]), edificio_id)):
+        cantidad, indice, edificios = heapq.heappop(fragmentos)
+        edificios.append(edificio_id)
+        heapq.heappush(fragmentos, (cantidad + len(por_edificio[edificio_id]), indice, edificios))
+
+    return [
+        [inmueble_id for edificio_id in sorted(edificios) for inmueble_id in por_edificio[edificio_id]]
+        for _, _, edificios in sorted(fragmentos, key=lambda fragmento: fragmento[1])
+    ]
+
+
+def _iniciar_proceso(plan, corrida):
+    global _plan, _corrida, _inmuebles
+    _plan = plan
+    _corrida = corrida
+    _inmuebles = {inmueble.id: inmueble for inmueble in plan['inmuebles']}
+
+
+def _facturar_fragmento(inmueble_ids, lote):
+    """Factura un fragmento en lotes confirmados; devuelve los ids de los recibos creados"""
+    prefijo = _plan['fecha_emision'].strftime('%Y%m')
+    recibo_ids = []
+    try:
+        for inicio in range(0, len(inmueble_ids), lote):
+            inmuebles = [_inmuebles[inmueble_id] for inmueble_id in inmueble_ids[inicio:inicio + lote]]
+            calculados = calcular_facturacion(_plan, inmuebles)
+            # El bloque de números se reserva en su propia transacción para no bloquear
+            # la secuencia mientras se inserta el lote; si el lote falla quedan sin usar
+            primer_numero = Secuencia_Recibos.reservar(prefijo, len(calculados)) if calculados else 1
+            with transaction.atomic():
+                recibos = persistir_facturacion(_plan, calculados, primer_numero=primer_numero)
+                _corrida.registrar_lote(len(inmuebles), len(recibos))
+            recibo_ids.extend(recibo.id for recibo in recibos)
+    finally:
+        connection.close()
+    return recibo_ids
+
+
+def facturar_en_paralelo(plan, corrida, procesos, lote, progreso=None):
+    """Factura plan['inmuebles'] repartidos por edificio entre `procesos` procesos.
+
+    El plan (cargos ya repartidos, membresías de edificios y deuda anterior) se
+    calcula una vez y cada proceso lo hereda al crearse con fork. Cada proceso
+    reserva sus números en Secuencia_Recibos y suma su avance a la misma
+    corrida, así la numeración no se repite y los totales de la corrida cuadran.
+    progreso(procesados, total) se llama cada INTERVALO_PROGRESO segundos con
+    los lotes ya guardados por todos los procesos.
+    """
+    if connection.in_atomic_block:
+        raise ValueError('La facturación en paralelo no puede ejecutarse dentro de una transacción')
+
+    fragmentos = repartir_por_edificio(plan['inmuebles'], procesos)
+    if not fragmentos:
+        return []
+
+    # Los hijos no deben compartir las conexiones abiertas del proceso principal
+    connections.close_all()
+    recibo_ids = []
+    with ProcessPoolExecutor(
+        max_workers=len(fragmentos),
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_iniciar_proceso,
+        initargs=(plan, corrida)
+    ) as pool:
+        # Si un fragmento falla, los demás terminan antes de propagar el error:
+        # sus lotes quedan guardados y la corrida se reanuda desde ahí
+        pendientes = {pool.submit(_facturar_fragmento, fragmento, lote) for fragmento in fragmentos}
+        while pendientes:
+            terminados, pendientes = wait(pendientes, timeout=INTERVALO_PROGRESO, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                recibo_ids.extend(futuro.result())
+            if progreso:
+                # Los hijos suman cada lote confirmado a la corrida; el avance se lee de ahí
+                corrida.refresh_from_db(fields=['procesados'])
+                progreso(corrida.procesados, corrida.total_inmuebles)
+
+    corrida.refresh_from_db()
+    recibo_ids.sort()
+    recibos = []
+    for inicio in range(0, len(recibo_ids), BATCH_SIZE):
+        recibos.extend(Recibos.objects.filter(id__in=recibo_ids[inicio:inicio + BATCH_SIZE]).order_by('id'))
+    return recibos
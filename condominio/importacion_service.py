@@ -0,0 +1,229 @@
+import csv
+import io
+from decimal import Decimal
+from itertools import islice
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Sum
+from .models import Propietario, Edificio, Inmueble
+
+# Filas validadas y escritas por lote
+LOTE = 1000
+
+COLUMNAS = ('edificio', 'piso', 'apartamento', 'alicuota', 'cedula', 'nombre', 'apellido', 'telefono', 'email')
+CAMPOS_PROPIETARIO = ('nombre', 'apellido', 'telefono', 'email')
+
+
+def leer_filas(archivo):
+    """Lee el CSV de inmuebles fila por fila como (linea, {columna: valor}).
+
+    Una fila por inmueble con los datos de su propietario; columnas requeridas:
+    edificio, piso, apartamento, alicuota, cedula, nombre, apellido, telefono,
+    email (opcional: descripcion_edificio).
+    """
+    if isinstance(archivo.read(0), bytes):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', errors='replace', newline='')
+    muestra = archivo.readline()
+    delimitador = ';' if muestra.count(';') > muestra.count(',') else ','
+    encabezados = [nombre.strip().lower() for nombre in next(csv.reader([muestra], delimiter=delimitador), [])]
+
+    faltantes = [columna for columna in COLUMNAS if columna not in encabezados]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el archivo: {', '.join(faltantes)}")
+
+    for numero_linea, valores in enumerate(csv.reader(archivo, delimiter=delimitador), start=2):
+        if not any(valor.strip() for valor in valores):
+            continue
+        yield numero_linea, {columna: valor.strip() for columna, valor in zip(encabezados, valores)}
+
+
+def _errores_modelo(instancia, excluir=()):
+    """Validaciones de campo del modelo (sin consultas de unicidad a la base de datos)"""
+    try:
+        instancia.full_clean(exclude=excluir, validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        return [f'{campo}: {" ".join(mensajes)}' for campo, mensajes in e.message_dict.items()]
+    return []
+
+
+class _Importacion:
+    """Estado de una importación: lo ya visto en el archivo y las claves ya existentes"""
+
+    def __init__(self):
+        self.propietarios = {}      # cedula -> (linea, datos)
+        self.edificios = {}         # numero_edificio -> descripcion
+        self.inmuebles = {}         # (numero_edificio, piso, apartamento) -> linea
+        self.id_propietario = {}    # cedula -> id
+        self.id_edificio = {}       # numero_edificio -> id
+        self.inmuebles_existentes = {}  # edificio_id -> {(piso, apartamento)}
+        self.errores = []
+        self.filas = 0
+        self.conteo = {
+            modelo: {'creados': 0, 'actualizados': 0}
+            for modelo in ('propietarios', 'edificios', 'inmuebles')
+        }
+
+    def validar(self, linea, fila):
+        """Valida una fila contra el modelo y contra las filas anteriores del archivo"""
+        errores = []
+        datos_propietario = {campo: fila.get(campo, '') for campo in CAMPOS_PROPIETARIO}
+        cedula = fila.get('cedula', '')
+        numero_edificio = fila.get('edificio', '')
+        clave = (numero_edificio, fila.get('piso', ''), fila.get('apartamento', ''))
+
+        previo = self.propietarios.get(cedula)
+        if previo is None:
+            errores += _errores_modelo(Propietario(cedula=cedula, **datos_propietario))
+        elif previo[1] != datos_propietario:
+            errores.append(f'cedula: {cedula} aparece en la línea {previo[0]} con otros datos del propietario')
+
+        if numero_edificio not in self.edificios:
+            errores += _errores_modelo(Edificio(numero_edificio=numero_edificio, descripcion=fila.get('descripcion_edificio', '')))
+
+        inmueble = Inmueble(piso=clave[1], apartamento=clave[2], alicuota=fila.get('alicuota', '').replace(',', '.'))
+        errores += _errores_modelo(inmueble, excluir=['propietario', 'edificio'])
+        if clave in self.inmuebles:
+            errores.append(f'inmueble: {"-".join(clave)} ya aparece en la línea {self.inmuebles[clave]}')
+
+        if errores:
+            self.errores.append({'linea': linea, 'errores': errores})
+            return None
+
+        self.propietarios.setdefault(cedula, (linea, datos_propietario))
+        if numero_edificio not in self.edificios or fila.get('descripcion_edificio'):
+            self.edificios[numero_edificio] = fila.get('descripcion_edificio', '')
+        self.inmuebles[clave] = linea
+        return {'cedula': cedula, 'edificio': numero_edificio, 'inmueble': inmueble}
+
+    def guardar_edificios(self, numeros):
+        nuevos = [numero for numero in numeros if numero not in self.id_edificio]
+        if not nuevos:
+            return
+        existentes = set(Edificio.objects.filter(numero_edificio__in=nuevos).values_list('numero_edificio', flat=True))
+        con_descripcion = [Edificio(numero_edificio=n, descripcion=self.edificios[n]) for n in nuevos if self.edificios[n]]
+        sin_descripcion = [Edificio(numero_edificio=n) for n in nuevos if not self.edificios[n]]
+        # Sin descripción en el archivo se conserva la que ya tenga el edificio
+        Edificio.objects.bulk_create(
+            con_descripcion, update_conflicts=True,
+            unique_fields=['numero_edificio'], update_fields=['descripcion']
+        )
+        Edificio.objects.bulk_create(sin_descripcion, ignore_conflicts=True)
+        self.id_edificio.update(Edificio.objects.filter(numero_edificio__in=nuevos).values_list('numero_edificio', 'id'))
+        self.conteo['edificios']['actualizados'] += len(existentes)
+        self.conteo['edificios']['creados'] += len(nuevos) - len(existentes)
+
+    def guardar_propietarios(self, cedulas):
+        nuevas = [cedula for cedula in cedulas if cedula not in self.id_propietario]
+        if not nuevas:
+            return
+        existentes = set(Propietario.objects.filter(cedula__in=nuevas).values_list('cedula', flat=True))
+        Propietario.objects.bulk_create(
+            [Propietario(cedula=cedula, **self.propietarios[cedula][1]) for cedula in nuevas],
+            update_conflicts=True, unique_fields=['cedula'], update_fields=list(CAMPOS_PROPIETARIO)
+        )
+        self.id_propietario.update(Propietario.objects.filter(cedula__in=nuevas).values_list('cedula', 'id'))
+        self.conteo['propietarios']['actualizados'] += len(existentes)
+        self.conteo['propietarios']['creados'] += len(nuevas) - len(existentes)
+
+    def guardar_inmuebles(self, validas):
+        nuevos_edificios = {self.id_edificio[fila['edificio']] for fila in validas} - set(self.inmuebles_existentes)
+        for edificio_id in nuevos_edificios:
+            self.inmuebles_existentes[edificio_id] = set()
+        for edificio_id, piso, apartamento in Inmueble.objects.filter(
+            edificio_id__in=nuevos_edificios
+        ).values_list('edificio_id', 'piso', 'apartamento'):
+            self.inmuebles_existentes[edificio_id].add((piso, apartamento))
+
+        inmuebles = []
+        for fila in validas:
+            inmueble = fila['inmueble']
+            inmueble.edificio_id = self.id_edificio[fila['edificio']]
+            inmueble.propietario_id = self.id_propietario[fila['cedula']]
+            if (inmueble.piso, inmueble.apartamento) in self.inmuebles_existentes[inmueble.edificio_id]:
+                self.conteo['inmuebles']['actualizados'] += 1
+            else:
+                self.conteo['inmuebles']['creados'] += 1
+            inmuebles.append(inmueble)
+
+        Inmueble.objects.bulk_create(
+            inmuebles, update_conflicts=True,
+            unique_fields=['edificio', 'piso', 'apartamento'], update_fields=['propietario', 'alicuota']
+        )
+
+    def procesar_lote(self, filas):
+        validas = []
+        for linea, fila in filas:
+            self.filas += 1
+            valida = self.validar(linea, fila)
+            if valida:
+                validas.append(valida)
+
+        # Con errores ya no se escribirá nada: solo se sigue validando el resto del archivo
+        if validas and not self.errores:
+            self.guardar_edificios(dict.fromkeys(fila['edificio'] for fila in validas))
+            self.guardar_propietarios(dict.fromkeys(fila['cedula'] for fila in validas))
+            self.guardar_inmuebles(validas)
+
+
+def resumen_alicuotas():
+    """Suma de alícuotas por edificio y total del condominio.
+
+    Los gastos comunes se reparten por alícuota entre todos los inmuebles, así
+    que el total debe ser 1; se tolera medio millonésimo por inmueble, que es
+    lo que puede desviarse al redondear cada alícuota a 6 decimales.
+    """
+    por_edificio = {}
+    cantidad = 0
+    for numero_edificio, suma, inmuebles in Inmueble.objects.values('edificio__numero_edificio').annotate(
+        suma=Sum('alicuota'), inmuebles=Count('id')
+    ).values_list('edificio__numero_edificio', 'suma', 'inmuebles').order_by('edificio__numero_edificio'):
+        # SQLite suma los decimales como float
+        por_edificio[numero_edificio] = Decimal(str(suma)).quantize(Decimal('0.000001'))
+        cantidad += inmuebles
+    total = sum(por_edificio.values(), Decimal('0'))
+    tolerancia = Decimal('0.0000005') * cantidad
+    return {
+        'por_edificio': por_edificio,
+        'total': total,
+        'cuadra': abs(total - 1) <= tolerancia,
+    }
+
+
+def importar_inmuebles(filas, solo_validar=False, validar_alicuotas=True, lote=LOTE):
+    """Importa (o actualiza) propietarios, edificios e inmuebles desde las filas de leer_filas.
+
+    Las filas se validan y escriben por lotes con bulk_create(update_conflicts=True):
+    la cédula identifica al propietario, el número al edificio y
+    edificio/piso/apartamento al inmueble. La importación es de todo o nada:
+    si alguna fila tiene errores, o si las alícuotas no suman 1 con
+    validar_alicuotas, no se guarda nada y se devuelven los errores por línea.
+    """
+    importacion = _Importacion()
+    filas = iter(filas)
+
+    with transaction.atomic():
+        while True:
+            bloque = list(islice(filas, lote))
+            if not bloque:
+                break
+            importacion.procesar_lote(bloque)
+
+        alicuotas = resumen_alicuotas() if not importacion.errores else None
+        if alicuotas and validar_alicuotas and not alicuotas['cuadra']:
+            importacion.errores.append({
+                'linea': None,
+                'errores': [f"alicuota: la suma de alícuotas del condominio es {alicuotas['total']} y debe ser 1"]
+            })
+
+        importado = not importacion.errores and not solo_validar
+        if not importado:
+            transaction.set_rollback(True)
+
+    return {
+        'importado': importado,
+        'total_filas': importacion.filas,
+        'total_errores': len(importacion.errores),
+        'errores': importacion.errores,
+        'alicuotas': alicuotas,
+        **importacion.conteo,
+    }
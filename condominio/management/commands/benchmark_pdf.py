@@ -0,0 +1,53 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from condominio.models import Recibos
+from condominio.pdf_service import generar_pdf_recibo
+
+
+class Command(BaseCommand):
+    help = 'Mide tiempo y memoria por recibo del generador de PDFs, con y sin reutilizar la plantilla'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recibos', type=int, default=50, help='Cantidad de recibos a generar por modo')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Veces que se genera cada recibo al medir el tiempo')
+
+    def medir(self, recibos, reutilizar_plantilla, repeticiones):
+        # Primera llamada fuera de la medición (carga de fuentes y plantilla)
+        generar_pdf_recibo(recibos[0], reutilizar_plantilla=reutilizar_plantilla)
+
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            for recibo in recibos:
+                generar_pdf_recibo(recibo, reutilizar_plantilla=reutilizar_plantilla)
+        ms_por_recibo = (time.perf_counter() - inicio) * 1000 / (len(recibos) * repeticiones)
+
+        # Memoria máxima asignada durante la generación de cada recibo
+        picos = []
+        tracemalloc.start()
+        try:
+            for recibo in recibos:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+                generar_pdf_recibo(recibo, reutilizar_plantilla=reutilizar_plantilla)
+                _, pico = tracemalloc.get_traced_memory()
+                picos.append(pico - base)
+        finally:
+            tracemalloc.stop()
+
+        return ms_por_recibo, sum(picos) / len(picos) / 1024
+
+    def handle(self, *args, **options):
+        recibos = list(Recibos.objects.para_listado()[:options['recibos']])
+        if not recibos:
+            raise CommandError('No hay recibos para generar')
+
+        self.stdout.write(f'Generando {len(recibos)} recibos por modo...')
+        resultados = {}
+        for nombre, reutilizar in [('Sin plantilla', False), ('Con plantilla', True)]:
+            ms, pico_kb = self.medir(recibos, reutilizar, options['repeticiones'])
+            resultados[nombre] = ms
+            self.stdout.write(f'{nombre}: {ms:.2f} ms/recibo | {pico_kb:.0f} KB asignados/recibo (pico)')
+
+        mejora = resultados['Sin plantilla'] / resultados['Con plantilla']
+        self.stdout.write(self.style.SUCCESS(f'Reutilizar la plantilla es {mejora:.2f}x más rápido'))
@@ -0,0 +1,91 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from condominio.models import Inmueble
+from condominio.distribucion_service import repartir_cargos
+
+
+class Command(BaseCommand):
+    help = 'Compara el reparto de gastos por inmueble: bucle escalar con Decimal vs. mayor resto en céntimos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inmuebles', type=int, default=10000, help='Cantidad de inmuebles simulados')
+        parser.add_argument('--gastos', type=int, default=50, help='Cantidad de gastos simulados')
+        parser.add_argument('--edificios', type=int, default=20, help='Cantidad de edificios simulados')
+        parser.add_argument('--semilla', type=int, default=1, help='Semilla de los datos aleatorios')
+
+    def datos(self, cantidad_inmuebles, cantidad_gastos, cantidad_edificios, semilla):
+        """Inmuebles (sin guardar) con alícuotas que suman 1 y gastos de ambos tipos"""
+        azar = random.Random(semilla)
+        pesos = [azar.randint(50, 150) for _ in range(cantidad_inmuebles)]
+        total = sum(pesos)
+        inmuebles = [
+            Inmueble(
+                id=indice + 1,
+                edificio_id=indice % cantidad_edificios + 1,
+                alicuota=(Decimal(peso) / total).quantize(Decimal('0.000001'))
+            )
+            for indice, peso in enumerate(pesos)
+        ]
+        cargos = []
+        for _ in range(cantidad_gastos):
+            # Los comunes van a todo el condominio; los no comunes, a veces a algunos edificios
+            tipo_calculo = 'Comun' if azar.random() < 0.7 else 'No_Comun'
+            edificios = None
+            if tipo_calculo == 'No_Comun' and azar.random() < 0.5:
+                edificios = set(azar.sample(range(1, cantidad_edificios + 1), azar.randint(1, cantidad_edificios)))
+            cargos.append({
+                'monto': Decimal(azar.randint(1000, 50000000)).scaleb(-2),
+                'tipo_calculo': tipo_calculo,
+                'edificios': edificios,
+            })
+        return inmuebles, cargos
+
+    def escalar(self, inmuebles, cargos):
+        """Reparto anterior: cada cuota se redondea por separado con Decimal"""
+        for cargo in cargos:
+            afectados = sum(1 for i in inmuebles if cargo['edificios'] is None or i.edificio_id in cargo['edificios'])
+            cargo['cuota'] = (cargo['monto'] / afectados).quantize(Decimal('0.01')) if afectados else Decimal('0')
+
+        repartos = [{} for _ in cargos]
+        for inmueble in inmuebles:
+            for cargo, reparto in zip(cargos, repartos):
+                if cargo['edificios'] is not None and inmueble.edificio_id not in cargo['edificios']:
+                    continue
+                if cargo['tipo_calculo'] == 'Comun':
+                    reparto[inmueble.id] = (cargo['monto'] * inmueble.alicuota).quantize(Decimal('0.01'))
+                else:
+                    reparto[inmueble.id] = cargo['cuota']
+        return repartos
+
+    def mayor_resto(self, inmuebles, cargos):
+        return [cargo['reparto'] for cargo in repartir_cargos(cargos, inmuebles)]
+
+    def handle(self, *args, **options):
+        inmuebles, cargos = self.datos(options['inmuebles'], options['gastos'], options['edificios'], options['semilla'])
+        self.stdout.write(f'{len(inmuebles)} inmuebles x {len(cargos)} gastos')
+
+        tiempos = {}
+        for nombre, funcion in [('Escalar (Decimal)', self.escalar), ('Mayor resto (céntimos)', self.mayor_resto)]:
+            copia = [dict(cargo) for cargo in cargos]
+            inicio = time.perf_counter()
+            repartos = funcion(inmuebles, copia)
+            tiempos[nombre] = time.perf_counter() - inicio
+
+            descuadrados = 0
+            diferencia = Decimal('0')
+            for cargo, reparto in zip(cargos, repartos):
+                if not reparto:
+                    continue
+                desvio = sum(reparto.values()) - cargo['monto']
+                if desvio:
+                    descuadrados += 1
+                    diferencia += abs(desvio)
+            self.stdout.write(
+                f'{nombre}: {tiempos[nombre] * 1000:.0f} ms | '
+                f'{descuadrados} gastos no suman su monto (diferencia total {diferencia})'
+            )
+
+        mejora = tiempos['Escalar (Decimal)'] / tiempos['Mayor resto (céntimos)']
+        self.stdout.write(self.style.SUCCESS(f'El reparto por mayor resto es {mejora:.2f}x más rápido'))
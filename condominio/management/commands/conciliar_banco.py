@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from condominio.conciliacion_service import leer_estado_cuenta, conciliar_estado_cuenta
+
+
+class Command(BaseCommand):
+    help = 'Concilia un estado de cuenta bancario (CSV u OFX) contra los pagos por verificar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta del estado de cuenta')
+        parser.add_argument('--formato', type=str, choices=['csv', 'ofx'], help='Formato del archivo (por defecto según la extensión)')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        try:
+            archivo = open(ruta, 'rb')
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir {ruta}: {e}')
+
+        with archivo:
+            resultado = conciliar_estado_cuenta(
+                leer_estado_cuenta(archivo, options['formato'], nombre=ruta)
+            )
+
+        for discrepancia in resultado['discrepancias']:
+            self.stdout.write(self.style.WARNING(
+                f"Línea {discrepancia['linea']}: referencia {discrepancia['referencia']} por {discrepancia['monto']} - "
+                f"{discrepancia['motivo']} ("
+                + ', '.join(f"pago {pago['pago_id']}: {pago['monto_registrado']}" for pago in discrepancia['pagos'])
+                + ")"
+            ))
+        for movimiento in resultado['no_conciliados']:
+            self.stdout.write(f"Línea {movimiento['linea']}: {movimiento['referencia'] or '-'} - {movimiento['motivo']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Conciliados: {resultado['total_conciliados']} | "
+            f"Discrepancias: {resultado['total_discrepancias']} | "
+            f"Sin conciliar: {resultado['total_no_conciliados']} | "
+            f"Débitos ignorados: {resultado['total_ignorados']}"
+        ))
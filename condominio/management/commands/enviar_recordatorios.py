@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db.models import Sum
-from condominio.models import Propietario, Recibos
+from condominio.notificaciones_service import encolar_recordatorios, drenar_notificaciones
+from condominio.services import planificar_recordatorios
 from condominio.whatsapp_service import whatsapp_service
 
 
@@ -17,61 +17,35 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         solo_morosos = options.get('solo_morosos', False)
+        periodo = timezone.now().strftime('%Y-%m')
         
         self.stdout.write('Enviando recordatorios de pago por WhatsApp...')
 
-        # Obtener propietarios con recibos pendientes
-        propietarios_con_deuda = Propietario.objects.filter(
-            inmuebles__recibos__saldo_pendiente__gt=0
-        ).distinct()
+        if not whatsapp_service.recargar_config():
+            self.stdout.write(self.style.WARNING('WhatsApp no está configurado o activo'))
+            return
+
+        # Solo se registran los recordatorios que no existan ya para el período
+        encolar_recordatorios(planificar_recordatorios(solo_morosos), periodo)
 
         recordatorios_enviados = 0
         errores = 0
 
-        for propietario in propietarios_con_deuda:
-            try:
-                # Obtener recibos pendientes del propietario
-                recibos_pendientes = Recibos.objects.filter(
-                    id_inmueble__propietario=propietario,
-                    saldo_pendiente__gt=0
-                ).order_by('fecha_emision')
-
-                if not recibos_pendientes:
-                    continue
-
-                # Si solo_morosos está activo, verificar si es moroso
-                if solo_morosos and recibos_pendientes.count() <= 3:
-                    continue
-
-                # Calcular deuda total
-                total_deuda = recibos_pendientes.aggregate(
-                    total=Sum('saldo_pendiente')
-                )['total'] or 0
-
-                # Enviar recordatorio
-                if whatsapp_service.send_payment_reminder(
-                    propietario, 
-                    recibos_pendientes, 
-                    total_deuda
-                ):
-                    recordatorios_enviados += 1
-                    self.stdout.write(
-                        f'Recordatorio enviado a {propietario.nombre} {propietario.apellido} '
-                        f'({recibos_pendientes.count()} recibos, ${total_deuda})'
-                    )
-                else:
-                    errores += 1
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'No se pudo enviar recordatorio a {propietario.nombre} {propietario.apellido}'
-                        )
-                    )
-
-            except Exception as e:
+        for notificacion, enviada, error in drenar_notificaciones(tipo='recordatorio', periodo=periodo):
+            propietario = notificacion.propietario
+            if enviada:
+                recordatorios_enviados += 1
+                self.stdout.write(
+                    f'Recordatorio enviado a {propietario.nombre} {propietario.apellido} '
+                    f"(meses {notificacion.datos['meses_pendientes']}, ${notificacion.datos['total_deuda']})"
+                )
+            else:
                 errores += 1
+                destino = 'descartado' if notificacion.estado == 'Fallida' else 'se reintentará'
                 self.stdout.write(
-                    self.style.ERROR(
-                        f'Error procesando {propietario.nombre} {propietario.apellido}: {e}'
+                    self.style.WARNING(
+                        f'No se pudo enviar recordatorio a {propietario.nombre} {propietario.apellido} '
+                        f'({error or "envío rechazado"}; {destino})'
                     )
                 )
 
@@ -79,4 +53,4 @@ class Command(BaseCommand):
             self.style.SUCCESS(
                 f'Proceso completado: {recordatorios_enviados} recordatorios enviados, {errores} errores'
             )
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from condominio.models import rango_periodo
+from condominio.pdf_service import generar_zip_periodo
+
+
+class Command(BaseCommand):
+    help = 'Genera en paralelo los PDFs de todos los recibos de un mes en un archivo ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', type=str, help='Mes en formato YYYY-MM (por defecto el mes actual)')
+        parser.add_argument('--salida', type=str, help='Ruta del ZIP (por defecto recibos_<mes>.zip)')
+        parser.add_argument('--procesos', type=int, help='Procesos en paralelo (por defecto uno por núcleo)')
+
+    def handle(self, *args, **options):
+        mes = options.get('mes')
+        if not mes:
+            today = timezone.now().date()
+            mes = f"{today.year}-{today.month:02d}"
+        if not rango_periodo(mes):
+            raise CommandError('El mes debe tener el formato YYYY-MM')
+
+        salida = options.get('salida') or f'recibos_{mes}.zip'
+        self.stdout.write(f'Generando PDFs de {mes} en {salida}...')
+
+        resultado = generar_zip_periodo(mes, salida, procesos=options.get('procesos'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['recibos']} recibos, {resultado['paginas']} páginas en {resultado['segundos']}s "
+            f"({resultado['paginas_por_segundo']} páginas/s)"
+        ))
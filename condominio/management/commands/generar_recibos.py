@@ -1,8 +1,10 @@
+import time
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from condominio.models import Inmueble, Movimientos_Gastos, Gastos_del_Mes
-from condominio.services import generar_recibo_mensual
-from condominio.whatsapp_service import whatsapp_service
+from condominio.models import Movimientos_Gastos, Recibos
+from condominio.services import facturar_mes
+from condominio.notificaciones_service import encolar_avisos_recibos, drenar_notificaciones
 
 
 class Command(BaseCommand):
@@ -14,6 +16,12 @@ class Command(BaseCommand):
             type=str,
             help='Mes de aplicación en formato YYYY-MM (por defecto el mes actual)',
         )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=settings.FACTURACION_PROCESOS,
+            help='Procesos entre los que se reparten los edificios (por defecto FACTURACION_PROCESOS)',
+        )
 
     def handle(self, *args, **options):
         mes_aplicacion = options.get('mes')
@@ -27,38 +35,40 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Generando recibos para {mes_aplicacion}...')
 
-        # Obtener movimientos del mes
-        movimientos = Movimientos_Gastos.objects.filter(
-            mes_aplicacion=mes_date
-        ).select_related('id_gasto_mes__id_concepto')
-
-        if not movimientos:
+        # Verificar que haya movimientos del mes
+        if not Movimientos_Gastos.objects.filter(mes_aplicacion=mes_date).exists():
             self.stdout.write(self.style.WARNING('No hay movimientos para este mes'))
             return
 
-        # Obtener todos los inmuebles activos
-        inmuebles = Inmueble.objects.all()
+        inicio = time.perf_counter()
+        try:
+            recibos = facturar_mes(
+                mes_date, origen='movimientos', acumular_deuda=True, procesos=max(options['procesos'], 1)
+            )
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error generando recibos: {e}'))
+            return
+        self.stdout.write(f'Facturación en {time.perf_counter() - inicio:.1f} s con {options["procesos"]} proceso(s)')
 
-        recibos_generados = 0
+        recibos_generados = len(recibos)
         notificaciones_enviadas = 0
         
-        for inmueble in inmuebles:
-            try:
-                recibo = generar_recibo_mensual(inmueble, mes_date, movimientos)
-                self.stdout.write(f'Recibo generado para {inmueble}: {recibo.monto_total_pagar}')
-                recibos_generados += 1
-                
-                # Enviar notificación WhatsApp
-                try:
-                    pdf_url = f"http://localhost:8000/api/recibos/{recibo.id}/pdf/"
-                    if whatsapp_service.send_new_receipt_notification(inmueble.propietario, recibo, pdf_url):
-                        notificaciones_enviadas += 1
-                        self.stdout.write(f'Notificación WhatsApp enviada a {inmueble.propietario.nombre}')
-                except Exception as e:
-                    self.stdout.write(self.style.WARNING(f'Error enviando WhatsApp a {inmueble.propietario.nombre}: {e}'))
-                    
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error generando recibo para {inmueble}: {e}'))
+        for recibo in recibos:
+            self.stdout.write(f'Recibo generado para {recibo.id_inmueble}: {recibo.monto_total_pagar}')
+
+        # Registrar los avisos WhatsApp de todos los recibos del mes (también los creados por una
+        # corrida anterior que se interrumpió; los ya registrados se ignoran) y enviarlos
+        encolar_avisos_recibos(
+            Recibos.objects.del_periodo(mes_aplicacion).select_related('id_inmueble__propietario').iterator(chunk_size=2000),
+            lambda recibo: f"http://localhost:8000/api/recibos/{recibo.id}/pdf/"
+        )
+        for notificacion, enviada, error in drenar_notificaciones(tipo='nuevo_recibo', periodo=mes_aplicacion):
+            propietario = notificacion.propietario
+            if enviada:
+                notificaciones_enviadas += 1
+                self.stdout.write(f'Notificación WhatsApp enviada a {propietario.nombre}')
+            elif error:
+                self.stdout.write(self.style.WARNING(f'Error enviando WhatsApp a {propietario.nombre}: {error}'))
 
         self.stdout.write(self.style.SUCCESS(f'Se generaron {recibos_generados} recibos exitosamente'))
         self.stdout.write(self.style.SUCCESS(f'Se enviaron {notificaciones_enviadas} notificaciones WhatsApp'))
\ No newline at end of file
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from condominio.importacion_service import leer_filas, importar_inmuebles, LOTE
+
+
+class Command(BaseCommand):
+    help = 'Importa propietarios, edificios e inmuebles desde un CSV (una fila por inmueble)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta del CSV')
+        parser.add_argument('--solo-validar', action='store_true', help='Valida el archivo sin guardar nada')
+        parser.add_argument('--sin-validar-alicuotas', action='store_true', help='No exige que las alícuotas del condominio sumen 1 (carga parcial)')
+        parser.add_argument('--lote', type=int, default=LOTE, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        try:
+            archivo = open(ruta, 'rb')
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir {ruta}: {e}')
+
+        with archivo:
+            try:
+                resultado = importar_inmuebles(
+                    leer_filas(archivo),
+                    solo_validar=options['solo_validar'],
+                    validar_alicuotas=not options['sin_validar_alicuotas'],
+                    lote=options['lote']
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in resultado['errores']:
+            linea = f"Línea {error['linea']}" if error['linea'] else 'Archivo'
+            self.stdout.write(self.style.WARNING(f"{linea}: {'; '.join(error['errores'])}"))
+
+        if resultado['alicuotas']:
+            for edificio, suma in resultado['alicuotas']['por_edificio'].items():
+                self.stdout.write(f'Edificio {edificio}: alícuotas {suma}')
+
+        resumen = ' | '.join(
+            f"{modelo.capitalize()}: {resultado[modelo]['creados']} nuevos, {resultado[modelo]['actualizados']} actualizados"
+            for modelo in ('propietarios', 'edificios', 'inmuebles')
+        )
+        if resultado['errores']:
+            raise CommandError(f"{resultado['total_errores']} errores en {resultado['total_filas']} filas; no se importó nada")
+        if not resultado['importado']:
+            self.stdout.write(self.style.SUCCESS(f'Archivo válido ({resultado["total_filas"]} filas), sin guardar. {resumen}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Importación completa ({resultado["total_filas"]} filas). {resumen}'))
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from condominio.models import Tarea
+from condominio.notificaciones_service import drenar_notificaciones
+from condominio.tareas_service import ejecutar_tarea
+
+
+class Command(BaseCommand):
+    help = 'Worker que ejecuta las tareas en cola (facturación, PDFs, recordatorios) y reintenta notificaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Procesar las tareas pendientes y terminar')
+        parser.add_argument('--intervalo', type=float, default=2, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--tiempo-maximo', type=int, default=60, help='Minutos sin avance tras los que una tarea en proceso se da por fallida')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Esperando tareas...')
+        while True:
+            close_old_connections()
+            liberadas = Tarea.liberar_colgadas(options['tiempo_maximo'])
+            if liberadas:
+                self.stdout.write(self.style.WARNING(f'{liberadas} tareas colgadas marcadas como fallidas'))
+
+            tarea = Tarea.tomar_siguiente()
+            if tarea is None:
+                # Sin tareas en cola, se envían las notificaciones cuyo reintento ya toca
+                enviadas = sum(1 for _, enviada, _ in drenar_notificaciones() if enviada)
+                if enviadas:
+                    self.stdout.write(f'{enviadas} notificaciones enviadas')
+                if options['una_vez']:
+                    break
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f'Ejecutando {tarea}...')
+            if ejecutar_tarea(tarea):
+                self.stdout.write(self.style.SUCCESS(f"Tarea {tarea.id}: {tarea.resultado.get('message', 'completada')}"))
+            else:
+                self.stdout.write(self.style.ERROR(f'Tarea {tarea.id} fallida: {tarea.error}'))
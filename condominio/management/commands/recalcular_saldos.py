@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from condominio.models import Saldo_Inmueble
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la deuda materializada (Saldo_Inmueble) de todos los inmuebles desde sus recibos'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recalculando saldos de inmuebles...')
+        Saldo_Inmueble.recalcular()
+        deudores = Saldo_Inmueble.objects.filter(recibos_pendientes__gt=0).count()
+        self.stdout.write(self.style.SUCCESS(f'Saldos recalculados: {deudores} inmuebles con deuda'))
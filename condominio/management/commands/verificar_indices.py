@@ -0,0 +1,101 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from condominio.models import Recibos, Pagos, Historial_Pagos, Saldo_Inmueble
+
+
+class Command(BaseCommand):
+    help = 'Verifica con EXPLAIN que las consultas frecuentes usan sus índices (PostgreSQL o SQLite)'
+
+    def consultas(self):
+        """(nombre, queryset, índices aceptados, motores) de cada consulta frecuente"""
+        todos = ('postgresql', 'sqlite')
+        return [
+            (
+                'Reporte de morosos',
+                Saldo_Inmueble.objects.filter(recibos_pendientes__gt=0).order_by('-total_deuda'),
+                ['saldos_deudores_idx'],
+                todos,
+            ),
+            (
+                'Recálculo de saldos por inmueble',
+                Recibos.objects.filter(saldo_pendiente__gt=0, id_inmueble_id__in=[1, 2]).values('id_inmueble_id').annotate(
+                    cantidad=Count('id'),
+                    total=Sum('saldo_pendiente')
+                ),
+                ['recibos_pendientes_idx'],
+                todos,
+            ),
+            (
+                'Listado de recibos',
+                Recibos.objects.order_by('-fecha_emision', 'numero_recibo')[:20],
+                ['recibos_fecha_numero_idx'],
+                todos,
+            ),
+            (
+                'Recibos de un mes',
+                Recibos.objects.del_periodo('2025-01').order_by('-fecha_emision', 'numero_recibo')[:20],
+                ['recibos_fecha_numero_idx'],
+                todos,
+            ),
+            (
+                'Recibos sin pagar de un inmueble',
+                Recibos.objects.filter(id_inmueble_id=1, saldo_pendiente__gt=0).order_by('fecha_emision'),
+                ['recibos_pendientes_idx'],
+                todos,
+            ),
+            (
+                'Búsqueda por número de recibo',
+                Recibos.objects.filter(numero_recibo__startswith='202501-'),
+                ['recibos_numero_idx'],
+                # SQLite no usa índices para LIKE sin case_sensitive_like
+                ('postgresql',),
+            ),
+            (
+                'Referencia bancaria verificada',
+                Pagos.objects.filter(referencia_bancaria='REF', estado_verificacion='Verificado'),
+                ['pagos_referencia_estado_idx', 'referencia_bancaria'],
+                todos,
+            ),
+            (
+                'Cola de verificación de pagos',
+                Pagos.objects.filter(estado_verificacion='Por Verificar').order_by('fecha_pago'),
+                ['pagos_estado_fecha_idx'],
+                todos,
+            ),
+            (
+                'Historial de pagos del propietario',
+                Historial_Pagos.objects.filter(propietario_id=1).order_by('-fecha_transaccion'),
+                ['historial_propietario_idx'],
+                todos,
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.stdout.write(self.style.WARNING(f'Motor {connection.vendor} no soportado, no se verifica nada'))
+            return
+
+        fallos = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Con tablas pequeñas el planificador prefiere un seq scan; se desactiva
+                # para comprobar que existe un índice utilizable para cada consulta
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for nombre, queryset, indices, motores in self.consultas():
+                if connection.vendor not in motores:
+                    self.stdout.write(f'--   {nombre}: no aplica en {connection.vendor}')
+                    continue
+                plan = queryset.explain()
+                if any(indice in plan for indice in indices):
+                    self.stdout.write(self.style.SUCCESS(f'OK   {nombre}'))
+                else:
+                    fallos.append(nombre)
+                    self.stdout.write(self.style.ERROR(f'FALLA {nombre}: no usa {", ".join(indices)}'))
+                    self.stdout.write(plan)
+
+        if fallos:
+            raise CommandError(f'{len(fallos)} consultas no usan sus índices')
+        self.stdout.write(self.style.SUCCESS('Todas las consultas frecuentes usan sus índices'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0009_configuracion_recibos_mensaje_nuevo_recibo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia_Recibos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=6, unique=True)),
+                ('ultimo_numero', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Secuencias de Recibos',
+            },
+        ),
+    ]
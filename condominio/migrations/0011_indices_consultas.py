@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0010_secuencia_recibos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historial_pagos',
+            index=models.Index(fields=['propietario', '-fecha_transaccion'], name='historial_propietario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagos',
+            index=models.Index(fields=['referencia_bancaria', 'estado_verificacion'], name='pagos_referencia_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagos',
+            index=models.Index(fields=['estado_verificacion', 'fecha_pago'], name='pagos_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recibos',
+            index=models.Index(condition=models.Q(('saldo_pendiente__gt', 0)), fields=['id_inmueble', 'fecha_emision'], name='recibos_pendientes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recibos',
+            index=models.Index(fields=['-fecha_emision', 'numero_recibo'], name='recibos_fecha_numero_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recibos',
+            index=models.Index(fields=['numero_recibo'], name='recibos_numero_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def poblar_saldos(apps, schema_editor):
+    Inmueble = apps.get_model('condominio', 'Inmueble')
+    Recibos = apps.get_model('condominio', 'Recibos')
+    Saldo_Inmueble = apps.get_model('condominio', 'Saldo_Inmueble')
+
+    agregados = {
+        fila['id_inmueble_id']: fila
+        for fila in Recibos.objects.filter(saldo_pendiente__gt=0).order_by().values('id_inmueble_id').annotate(
+            cantidad=models.Count('id'),
+            total=models.Sum('saldo_pendiente')
+        )
+    }
+    Saldo_Inmueble.objects.bulk_create([
+        Saldo_Inmueble(
+            inmueble_id=inmueble_id,
+            recibos_pendientes=agregados.get(inmueble_id, {}).get('cantidad', 0),
+            total_deuda=agregados.get(inmueble_id, {}).get('total') or Decimal('0')
+        )
+        for inmueble_id in Inmueble.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0011_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Saldo_Inmueble',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recibos_pendientes', models.PositiveIntegerField(default=0)),
+                ('total_deuda', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('inmueble', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saldo', to='condominio.inmueble')),
+            ],
+            options={
+                'verbose_name_plural': 'Saldos de Inmuebles',
+                'indexes': [models.Index(condition=models.Q(('recibos_pendientes__gt', 0)), fields=['-total_deuda'], name='saldos_deudores_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_saldos, migrations.RunPython.noop),
+    ]
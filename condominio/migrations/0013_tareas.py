@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0012_saldo_inmueble'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('facturacion', 'Facturación del mes'), ('pdf_lote', 'PDFs del mes'), ('recordatorios', 'Recordatorios de pago')], max_length=20)),
+                ('periodo', models.CharField(help_text='YYYY-MM', max_length=7)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('En_proceso', 'En proceso'), ('Completada', 'Completada'), ('Fallida', 'Fallida')], default='Pendiente', max_length=15)),
+                ('total', models.IntegerField(default=0)),
+                ('procesados', models.IntegerField(default=0)),
+                ('errores', models.IntegerField(default=0)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('intentos', models.IntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Tareas',
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='tareas_cola_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado__in', ['Pendiente', 'En_proceso'])), fields=('tipo', 'periodo'), name='tarea_activa_unica')],
+            },
+        ),
+    ]
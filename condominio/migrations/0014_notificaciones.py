@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0013_tareas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='Clave de idempotencia: tipo:propietario:período', max_length=100, unique=True)),
+                ('tipo', models.CharField(choices=[('recordatorio', 'Recordatorio de pago'), ('nuevo_recibo', 'Nuevo recibo')], max_length=20)),
+                ('periodo', models.CharField(help_text='YYYY-MM', max_length=7)),
+                ('datos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('Pendiente', 'Pendiente'), ('Enviando', 'Enviando'), ('Enviada', 'Enviada'), ('Fallida', 'Fallida')], default='Pendiente', max_length=10)),
+                ('intentos', models.IntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('propietario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='condominio.propietario')),
+            ],
+            options={
+                'verbose_name_plural': 'Notificaciones',
+                'indexes': [models.Index(condition=models.Q(('estado__in', ['Pendiente', 'Enviando'])), fields=['proximo_intento'], name='notificaciones_cola_idx')],
+            },
+        ),
+    ]
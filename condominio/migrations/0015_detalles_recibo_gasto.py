@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def vincular_gastos(apps, schema_editor):
+    Detalles_Recibo = apps.get_model('condominio', 'Detalles_Recibo')
+    Movimientos_Gastos = apps.get_model('condominio', 'Movimientos_Gastos')
+    Gastos_del_Mes = apps.get_model('condominio', 'Gastos_del_Mes')
+
+    # Líneas de movimientos: el gasto del movimiento
+    Detalles_Recibo.objects.filter(id_movimiento__isnull=False).update(
+        id_gasto_mes=models.Subquery(
+            Movimientos_Gastos.objects.filter(id=models.OuterRef('id_movimiento')).values('id_gasto_mes')[:1]
+        )
+    )
+
+    # Líneas facturadas desde gastos: por descripción, solo si un único gasto la tiene
+    gastos_por_descripcion = {}
+    for gasto_id, descripcion in Gastos_del_Mes.objects.values_list('id', 'id_concepto__descripcion'):
+        gastos_por_descripcion.setdefault(descripcion, []).append(gasto_id)
+    for descripcion, gastos in gastos_por_descripcion.items():
+        if len(gastos) == 1:
+            Detalles_Recibo.objects.filter(
+                id_movimiento__isnull=True, descripcion_gasto=descripcion
+            ).update(id_gasto_mes=gastos[0])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0014_notificaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalles_recibo',
+            name='id_gasto_mes',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='detalles_recibo', to='condominio.gastos_del_mes'),
+        ),
+        migrations.RunPython(vincular_gastos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+def asignar_periodos(apps, schema_editor):
+    Recibos = apps.get_model('condominio', 'Recibos')
+
+    # El primer recibo de cada inmueble y mes toma el período; los duplicados
+    # anteriores a la restricción quedan sin período para no violarla
+    vistos = set()
+    por_periodo = {}
+    for recibo_id, inmueble_id, fecha_emision in Recibos.objects.order_by('id').values_list(
+        'id', 'id_inmueble_id', 'fecha_emision'
+    ).iterator():
+        periodo = fecha_emision.strftime('%Y-%m')
+        if (inmueble_id, periodo) not in vistos:
+            vistos.add((inmueble_id, periodo))
+            por_periodo.setdefault(periodo, []).append(recibo_id)
+    for periodo, ids in por_periodo.items():
+        for inicio in range(0, len(ids), 1000):
+            Recibos.objects.filter(id__in=ids[inicio:inicio + 1000]).update(periodo=periodo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0015_detalles_recibo_gasto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Corrida_Facturacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(help_text='YYYY-MM', max_length=7)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('En_proceso', 'En proceso'), ('Completada', 'Completada'), ('Fallida', 'Fallida')], default='En_proceso', max_length=15)),
+                ('total_inmuebles', models.IntegerField(default=0)),
+                ('procesados', models.IntegerField(default=0)),
+                ('recibos_creados', models.IntegerField(default=0)),
+                ('lotes', models.IntegerField(default=0)),
+                ('ultimo_inmueble_id', models.IntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_inicio', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Corridas de Facturación',
+            },
+        ),
+        migrations.AddField(
+            model_name='recibos',
+            name='periodo',
+            field=models.CharField(editable=False, max_length=7, null=True),
+        ),
+        migrations.RunPython(asignar_periodos, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recibos',
+            constraint=models.UniqueConstraint(fields=('id_inmueble', 'periodo'), name='recibo_unico_por_periodo'),
+        ),
+        migrations.AddConstraint(
+            model_name='corrida_facturacion',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'En_proceso')), fields=('periodo',), name='corrida_activa_unica'),
+        ),
+    ]
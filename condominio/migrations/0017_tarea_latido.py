@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:08
+
+from django.db import migrations, models
+
+
+def latido_inicial(apps, schema_editor):
+    # Las tareas ya iniciadas toman su fecha de inicio como último avance
+    Tarea = apps.get_model('condominio', 'Tarea')
+    Tarea.objects.filter(fecha_inicio__isnull=False).update(fecha_actualizacion=models.F('fecha_inicio'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('condominio', '0016_corrida_facturacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(latido_inicial, migrations.RunPython.noop),
+    ]
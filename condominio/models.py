@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
 
@@ -53,6 +56,69 @@ class Inmueble(models.Model):
         return f"{self.edificio} - Piso {self.piso} Apt {self.apartamento}"
 
 
+class Saldo_Inmueble(models.Model):
+    """Deuda materializada de cada inmueble (cantidad y total de recibos sin pagar).
+
+    Se recalcula dentro de la misma transacción cada vez que cambian sus recibos,
+    para que la morosidad y el reporte de morosos sean búsquedas por índice:
+    lo hacen Recibos.save y delete y RecibosQuerySet.delete y update (que
+    también usa bulk_update); tras bulk_create hay que llamar a recalcular.
+    """
+    inmueble = models.OneToOneField(Inmueble, on_delete=models.CASCADE, related_name='saldo')
+    recibos_pendientes = models.PositiveIntegerField(default=0)
+    total_deuda = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Saldos de Inmuebles"
+        indexes = [
+            models.Index(
+                fields=['-total_deuda'],
+                name='saldos_deudores_idx',
+                condition=models.Q(recibos_pendientes__gt=0),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Saldo {self.inmueble} - {self.recibos_pendientes} recibos - ${self.total_deuda}"
+
+    @classmethod
+    def recalcular(cls, inmueble_ids=None):
+        """Recalcula el saldo de los inmuebles indicados (o de todos si es None) desde sus recibos sin pagar"""
+        recibos = Recibos.objects.filter(saldo_pendiente__gt=0)
+        if inmueble_ids is None:
+            inmueble_ids = Inmueble.objects.values_list('id', flat=True)
+        else:
+            inmueble_ids = set(inmueble_ids)
+            recibos = recibos.filter(id_inmueble_id__in=inmueble_ids)
+
+        agregados = {
+            fila['id_inmueble_id']: fila
+            for fila in recibos.order_by().values('id_inmueble_id').annotate(
+                cantidad=models.Count('id'),
+                total=models.Sum('saldo_pendiente')
+            )
+        }
+
+        saldos = []
+        for inmueble_id in inmueble_ids:
+            fila = agregados.get(inmueble_id, {})
+            saldos.append(cls(
+                inmueble_id=inmueble_id,
+                recibos_pendientes=fila.get('cantidad', 0),
+                total_deuda=fila.get('total') or Decimal('0')
+            ))
+
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                saldos,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['inmueble'],
+                update_fields=['recibos_pendientes', 'total_deuda', 'fecha_actualizacion']
+            )
+
+
 class Tipos_Gasto(models.Model):
     ESTADO_CHOICES = [
         ('Activo', 'Activo'),
@@ -148,6 +214,116 @@ class Movimientos_Edificios(models.Model):
         return f"{self.id_movimiento} - {self.id_edificio}"
 
 
+class Secuencia_Recibos(models.Model):
+    prefijo = models.CharField(max_length=6, unique=True)
+    ultimo_numero = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Secuencias de Recibos"
+
+    def __str__(self):
+        return f"Secuencia {self.prefijo} - {self.ultimo_numero}"
+
+    @classmethod
+    def reservar(cls, prefijo, cantidad=1):
+        """Reserva atómicamente un bloque de `cantidad` números para el mes `prefijo` (YYYYMM).
+
+        Devuelve el primer número del bloque. La fila queda bloqueada hasta que
+        termine la transacción del llamador, así dos workers nunca reciben el mismo número.
+        """
+        with transaction.atomic():
+            secuencia = cls.objects.select_for_update().filter(prefijo=prefijo).first()
+            if secuencia is None:
+                # Primer uso del mes: continuar después del mayor número ya emitido
+                # numero_recibo es editable: solo cuentan los de la forma YYYYMM-NNNN
+                emitidos = Recibos.objects.filter(
+                    numero_recibo__regex=rf'^{prefijo}-[0-9]+$'
+                ).values_list('numero_recibo', flat=True)
+                ultimo = max((int(numero.split('-')[1]) for numero in emitidos), default=0)
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(prefijo=prefijo, ultimo_numero=ultimo)
+                except IntegrityError:
+                    # Otro worker creó la secuencia al mismo tiempo
+                    pass
+                secuencia = cls.objects.select_for_update().get(prefijo=prefijo)
+
+            primero = secuencia.ultimo_numero + 1
+            secuencia.ultimo_numero += cantidad
+            secuencia.save(update_fields=['ultimo_numero'])
+        return primero
+
+
+def rango_periodo(periodo):
+    """Convierte un periodo 'YYYY', 'YYYY-MM' o 'YYYY-MM-DD' en el rango de fechas [inicio, fin)
+    equivalente a fecha__startswith=periodo. Devuelve None si el texto no tiene ese formato."""
+    try:
+        if len(periodo) == 4:
+            inicio = date(int(periodo), 1, 1)
+            return inicio, inicio.replace(year=inicio.year + 1)
+        if len(periodo) == 7:
+            inicio = datetime.strptime(periodo, '%Y-%m').date()
+            if inicio.month == 12:
+                return inicio, inicio.replace(year=inicio.year + 1, month=1)
+            return inicio, inicio.replace(month=inicio.month + 1)
+        if len(periodo) == 10:
+            inicio = datetime.strptime(periodo, '%Y-%m-%d').date()
+            return inicio, inicio + timedelta(days=1)
+    except ValueError:
+        pass
+    return None
+
+
+class RecibosQuerySet(models.QuerySet):
+    # Campos de los que depende Saldo_Inmueble
+    CAMPOS_SALDO = {'saldo_pendiente', 'id_inmueble', 'id_inmueble_id'}
+
+    def delete(self):
+        """Borra los recibos (también desde la acción del admin) y recalcula en la
+        misma transacción el saldo de sus inmuebles"""
+        with transaction.atomic():
+            inmueble_ids = set(self.values_list('id_inmueble_id', flat=True))
+            resultado = super().delete()
+            Saldo_Inmueble.recalcular(inmueble_ids)
+        return resultado
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def update(self, **campos):
+        """Como QuerySet.update; si cambia el saldo o el inmueble (también con
+        bulk_update) recalcula en la misma transacción el saldo de los inmuebles"""
+        if not self.CAMPOS_SALDO & campos.keys():
+            return super().update(**campos)
+        with transaction.atomic():
+            inmueble_ids = set(self.values_list('id_inmueble_id', flat=True))
+            filas = super().update(**campos)
+            nuevo = campos.get('id_inmueble_id', campos.get('id_inmueble'))
+            if nuevo is not None:
+                inmueble_ids.add(getattr(nuevo, 'pk', nuevo))
+            Saldo_Inmueble.recalcular(inmueble_ids)
+        return filas
+    update.alters_data = True
+
+    def del_periodo(self, periodo):
+        """Filtra por mes ('YYYY-MM') con un rango de fechas que puede usar índices,
+        en lugar de fecha_emision__startswith, que obliga a convertir la fecha a texto"""
+        rango = rango_periodo(periodo)
+        if rango is None:
+            return self.filter(fecha_emision__startswith=periodo)
+        return self.filter(fecha_emision__gte=rango[0], fecha_emision__lt=rango[1])
+
+    def para_listado(self):
+        """Carga inmueble, propietario, edificio, detalles y el conteo de recibos sin pagar
+        del inmueble en un número fijo de consultas, sin importar cuántos recibos se listen"""
+        return self.select_related(
+            'id_inmueble__propietario', 'id_inmueble__edificio'
+        ).prefetch_related(
+            models.Prefetch('detalles', queryset=Detalles_Recibo.objects.order_by('tipo_gasto', 'descripcion_gasto'))
+        ).annotate(
+            recibos_sin_pagar_count=Coalesce('id_inmueble__saldo__recibos_pendientes', 0)
+        )
+
+
 class Recibos(models.Model):
     ESTADO_CHOICES = [
         ('Pendiente', 'Pendiente'),
@@ -157,24 +333,61 @@ class Recibos(models.Model):
     numero_recibo = models.CharField(max_length=20, blank=True)
     id_inmueble = models.ForeignKey(Inmueble, on_delete=models.CASCADE, related_name='recibos')
     fecha_emision = models.DateField()
+    # YYYY-MM de fecha_emision; solo queda vacío en duplicados anteriores a la restricción
+    periodo = models.CharField(max_length=7, null=True, editable=False)
     monto_deuda_anterior = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     monto_cargos_mes = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     monto_interes_mora = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     monto_total_pagar = models.DecimalField(max_digits=10, decimal_places=2)
     saldo_pendiente = models.DecimalField(max_digits=10, decimal_places=2)
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='Pendiente')
+
+    objects = RecibosQuerySet.as_manager()
     
     def save(self, *args, **kwargs):
-        if not self.numero_recibo:
-            # Generar número: YYYYMM-NNNN
-            fecha = self.fecha_emision
-            prefijo = fecha.strftime('%Y%m')
-            ultimo = Recibos.objects.filter(numero_recibo__startswith=prefijo).count() + 1
-            self.numero_recibo = f"{prefijo}-{ultimo:04d}"
-        super().save(*args, **kwargs)
+        # Los duplicados anteriores a la restricción conservan su período vacío
+        if self._state.adding or self.periodo is not None:
+            self.periodo = self.fecha_emision.strftime('%Y-%m')
+        numero_asignado = not self.numero_recibo
+        # El número se reserva en la transacción del INSERT: si este falla la reserva
+        # se deshace y no queda un hueco en la numeración
+        with transaction.atomic():
+            if numero_asignado:
+                # Generar número: YYYYMM-NNNN
+                prefijo = self.fecha_emision.strftime('%Y%m')
+                self.numero_recibo = f"{prefijo}-{Secuencia_Recibos.reservar(prefijo):04d}"
+            try:
+                super().save(*args, **kwargs)
+            except Exception:
+                if numero_asignado:
+                    self.numero_recibo = ''
+                raise
+            Saldo_Inmueble.recalcular([self.id_inmueble_id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            Saldo_Inmueble.recalcular([self.id_inmueble_id])
+        return resultado
 
     class Meta:
         verbose_name_plural = "Recibos"
+        indexes = [
+            # Recibos sin pagar por inmueble (morosidad, aplicación de pagos)
+            models.Index(
+                fields=['id_inmueble', 'fecha_emision'],
+                name='recibos_pendientes_idx',
+                condition=models.Q(saldo_pendiente__gt=0),
+            ),
+            # Listado por defecto y filtros por mes
+            models.Index(fields=['-fecha_emision', 'numero_recibo'], name='recibos_fecha_numero_idx'),
+            # Búsqueda por prefijo de número (YYYYMM-)
+            models.Index(fields=['numero_recibo'], name='recibos_numero_idx', opclasses=['varchar_pattern_ops']),
+        ]
+        constraints = [
+            # Un solo recibo por inmueble y mes: repetir una facturación no duplica recibos
+            models.UniqueConstraint(fields=['id_inmueble', 'periodo'], name='recibo_unico_por_periodo'),
+        ]
 
     def __str__(self):
         return f"Recibo {self.numero_recibo} - {self.id_inmueble} - {self.fecha_emision}"
@@ -182,10 +395,12 @@ class Recibos(models.Model):
     @property
     def recibos_sin_pagar_inmueble(self):
         """Cuenta recibos sin pagar del inmueble para determinar morosidad"""
-        return Recibos.objects.filter(
-            id_inmueble=self.id_inmueble,
-            saldo_pendiente__gt=0
-        ).count()
+        # Anotado por RecibosQuerySet.para_listado para evitar una consulta por recibo
+        if hasattr(self, 'recibos_sin_pagar_count'):
+            return self.recibos_sin_pagar_count
+        return Saldo_Inmueble.objects.filter(
+            inmueble_id=self.id_inmueble_id
+        ).values_list('recibos_pendientes', flat=True).first() or 0
     
     @property
     def es_moroso(self):
@@ -196,6 +411,8 @@ class Recibos(models.Model):
 class Detalles_Recibo(models.Model):
     id_recibo = models.ForeignKey(Recibos, on_delete=models.CASCADE, related_name='detalles')
     id_movimiento = models.ForeignKey(Movimientos_Gastos, on_delete=models.CASCADE, related_name='detalles_recibo', null=True, blank=True)
+    # Gasto que originó la línea (directamente o por uno de sus movimientos), para recalcular solo sus líneas
+    id_gasto_mes = models.ForeignKey(Gastos_del_Mes, on_delete=models.SET_NULL, related_name='detalles_recibo', null=True, blank=True)
     descripcion_gasto = models.CharField(max_length=100)
     tipo_gasto = models.CharField(max_length=10, choices=[('Comun', 'Común'), ('No_Comun', 'No Común')], default='Comun')
     monto_calculado = models.DecimalField(max_digits=10, decimal_places=2)
@@ -224,6 +441,10 @@ class Pagos(models.Model):
 
     class Meta:
         verbose_name_plural = "Pagos"
+        indexes = [
+            models.Index(fields=['referencia_bancaria', 'estado_verificacion'], name='pagos_referencia_estado_idx'),
+            models.Index(fields=['estado_verificacion', 'fecha_pago'], name='pagos_estado_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Pago {self.id} - Ref: {self.referencia_bancaria}"
@@ -283,6 +504,9 @@ class Historial_Pagos(models.Model):
     
     class Meta:
         verbose_name_plural = "Historial de Pagos"
+        indexes = [
+            models.Index(fields=['propietario', '-fecha_transaccion'], name='historial_propietario_idx'),
+        ]
     
     def __str__(self):
         return f"Historial {self.id} - {self.tipo_transaccion} - ${self.monto_aplicado}"
@@ -297,4 +521,280 @@ class Creditos_Propietario(models.Model):
         verbose_name_plural = "Créditos de Propietarios"
     
     def __str__(self):
-        return f"Crédito {self.propietario} - ${self.saldo_credito}"
\ No newline at end of file
+        return f"Crédito {self.propietario} - ${self.saldo_credito}"
+
+class Tarea(models.Model):
+    """Trabajo en segundo plano (facturación, PDFs, recordatorios) ejecutado por procesar_tareas"""
+    TIPO_CHOICES = [
+        ('facturacion', 'Facturación del mes'),
+        ('pdf_lote', 'PDFs del mes'),
+        ('recordatorios', 'Recordatorios de pago'),
+    ]
+    ESTADO_CHOICES = [
+        ('Pendiente', 'Pendiente'),
+        ('En_proceso', 'En proceso'),
+        ('Completada', 'Completada'),
+        ('Fallida', 'Fallida'),
+    ]
+    ESTADOS_ACTIVOS = ['Pendiente', 'En_proceso']
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    periodo = models.CharField(max_length=7, help_text='YYYY-MM')
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='Pendiente')
+    total = models.IntegerField(default=0)
+    procesados = models.IntegerField(default=0)
+    errores = models.IntegerField(default=0)
+    resultado = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.IntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    # Último avance informado por el worker; una tarea sin avance reciente se da por caída
+    fecha_actualizacion = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Tareas"
+        constraints = [
+            # Una misma tarea no puede estar dos veces en cola o ejecutándose para el mismo período
+            models.UniqueConstraint(
+                fields=['tipo', 'periodo'],
+                condition=models.Q(estado__in=['Pendiente', 'En_proceso']),
+                name='tarea_activa_unica'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion'], name='tareas_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tarea {self.id} - {self.tipo} {self.periodo} ({self.estado})"
+
+    @classmethod
+    def encolar(cls, tipo, periodo, **parametros):
+        """Crea la tarea o devuelve la que ya está activa para ese tipo y período: (tarea, creada).
+
+        La tarea activa puede tener otros parámetros (p. ej. generar frente a
+        actualizar la facturación): el llamador debe compararlos.
+        """
+        # La tarea activa puede terminar entre el INSERT rechazado y la consulta: se reintenta
+        for intento in range(3):
+            try:
+                with transaction.atomic():
+                    return cls.objects.create(tipo=tipo, periodo=periodo, parametros=parametros), True
+            except IntegrityError:
+                try:
+                    return cls.objects.get(tipo=tipo, periodo=periodo, estado__in=cls.ESTADOS_ACTIVOS), False
+                except cls.DoesNotExist:
+                    if intento == 2:
+                        raise
+
+    @classmethod
+    def tomar_siguiente(cls):
+        """Reserva la tarea pendiente más antigua; varios workers no toman la misma gracias a skip_locked"""
+        with transaction.atomic():
+            tarea = cls.objects.select_for_update(skip_locked=True).filter(
+                estado='Pendiente'
+            ).order_by('fecha_creacion', 'id').first()
+            if tarea is None:
+                return None
+            tarea.estado = 'En_proceso'
+            tarea.fecha_inicio = tarea.fecha_actualizacion = timezone.now()
+            tarea.intentos += 1
+            tarea.save(update_fields=['estado', 'fecha_inicio', 'fecha_actualizacion', 'intentos'])
+        return tarea
+
+    @classmethod
+    def liberar_colgadas(cls, minutos):
+        """Marca como fallidas las tareas en proceso sin avance hace más de `minutos` (worker caído)"""
+        return cls.objects.filter(
+            estado='En_proceso',
+            fecha_actualizacion__lt=timezone.now() - timedelta(minutes=minutos)
+        ).update(estado='Fallida', error='Sin avance del worker', fecha_fin=timezone.now())
+
+    def avanzar(self, procesados=None, errores=None, total=None):
+        """Guarda los contadores de progreso sin tocar el resto de la fila; cada llamada renueva el latido"""
+        campos = {'fecha_actualizacion': timezone.now()}
+        for campo, valor in [('procesados', procesados), ('errores', errores), ('total', total)]:
+            if valor is not None:
+                campos[campo] = valor
+        for campo, valor in campos.items():
+            setattr(self, campo, valor)
+        Tarea.objects.filter(pk=self.pk).update(**campos)
+
+    def finalizar(self, resultado=None, error=''):
+        """Registra el resultado solo si la tarea sigue en proceso (no fue liberada por colgada).
+
+        Devuelve False si otro proceso ya la había dado por fallida.
+        """
+        campos = {
+            'estado': 'Fallida' if error else 'Completada',
+            'resultado': resultado or {},
+            'error': error,
+            'fecha_fin': timezone.now(),
+        }
+        if not Tarea.objects.filter(pk=self.pk, estado='En_proceso').update(**campos):
+            self.refresh_from_db()
+            return False
+        for campo, valor in campos.items():
+            setattr(self, campo, valor)
+        return True
+
+    def reintentar(self):
+        """Vuelve a poner en cola una tarea fallida"""
+        if self.estado != 'Fallida':
+            raise ValueError('Solo se pueden reintentar tareas fallidas')
+        self.estado = 'Pendiente'
+        self.procesados = self.errores = 0
+        self.error = ''
+        self.fecha_inicio = self.fecha_actualizacion = self.fecha_fin = None
+        try:
+            with transaction.atomic():
+                self.save()
+        except IntegrityError:
+            raise ValueError('Ya hay una tarea activa para este período')
+
+
+class Corrida_Facturacion(models.Model):
+    """Registro de cada facturación de un mes, con su avance guardado lote por lote.
+
+    Cada lote de recibos se confirma junto con el avance de la corrida, así una
+    corrida interrumpida se reanuda desde el último inmueble facturado.
+    """
+    ESTADO_CHOICES = [
+        ('En_proceso', 'En proceso'),
+        ('Completada', 'Completada'),
+        ('Fallida', 'Fallida'),
+    ]
+    # Sin avance en este tiempo, una corrida en proceso se considera interrumpida
+    MINUTOS_INACTIVA = 15
+
+    periodo = models.CharField(max_length=7, help_text='YYYY-MM')
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='En_proceso')
+    total_inmuebles = models.IntegerField(default=0)
+    procesados = models.IntegerField(default=0)
+    recibos_creados = models.IntegerField(default=0)
+    lotes = models.IntegerField(default=0)
+    ultimo_inmueble_id = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_inicio = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Corridas de Facturación"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['periodo'],
+                condition=models.Q(estado='En_proceso'),
+                name='corrida_activa_unica'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Corrida {self.id} - {self.periodo} ({self.estado})"
+
+    @classmethod
+    def iniciar(cls, periodo, parametros):
+        """Reanuda la última corrida del período si quedó a medias con los mismos parámetros o crea una nueva"""
+        with transaction.atomic():
+            ultima = cls.objects.select_for_update().filter(periodo=periodo).order_by('-id').first()
+            if ultima and ultima.estado == 'En_proceso':
+                if ultima.fecha_actualizacion > timezone.now() - timedelta(minutes=cls.MINUTOS_INACTIVA):
+                    raise ValueError(f'Ya hay una facturación en curso para {periodo}')
+                if ultima.parametros != parametros:
+                    ultima.finalizar('Interrumpida sin avance')
+
+            if ultima and ultima.estado != 'Completada' and ultima.parametros == parametros:
+                ultima.estado = 'En_proceso'
+                ultima.error = ''
+                ultima.save(update_fields=['estado', 'error', 'fecha_actualizacion'])
+                return ultima
+            return cls.objects.create(periodo=periodo, parametros=parametros)
+
+    def registrar_lote(self, procesados, recibos_creados, ultimo_inmueble_id=None):
+        """Suma el avance de un lote (se llama dentro de la transacción del lote).
+
+        Los contadores se incrementan en la base de datos, así varios procesos
+        pueden registrar lotes de la misma corrida. ultimo_inmueble_id solo
+        tiene sentido cuando los lotes se guardan en orden de inmueble.
+        """
+        campos = {
+            'procesados': models.F('procesados') + procesados,
+            'recibos_creados': models.F('recibos_creados') + recibos_creados,
+            'lotes': models.F('lotes') + 1,
+            'fecha_actualizacion': timezone.now(),
+        }
+        if ultimo_inmueble_id is not None:
+            campos['ultimo_inmueble_id'] = ultimo_inmueble_id
+        Corrida_Facturacion.objects.filter(pk=self.pk).update(**campos)
+        self.refresh_from_db(fields=['procesados', 'recibos_creados', 'lotes', 'ultimo_inmueble_id', 'fecha_actualizacion'])
+
+    def finalizar(self, error=''):
+        self.estado = 'Fallida' if error else 'Completada'
+        self.error = error
+        self.fecha_fin = timezone.now()
+        self.save(update_fields=['estado', 'error', 'fecha_fin', 'fecha_actualizacion'])
+
+
+class Notificacion(models.Model):
+    """Bandeja de salida de mensajes WhatsApp; cada mensaje se registra una sola vez por su clave"""
+    TIPO_CHOICES = [
+        ('recordatorio', 'Recordatorio de pago'),
+        ('nuevo_recibo', 'Nuevo recibo'),
+    ]
+    ESTADO_CHOICES = [
+        ('Pendiente', 'Pendiente'),
+        ('Enviando', 'Enviando'),
+        ('Enviada', 'Enviada'),
+        ('Fallida', 'Fallida'),
+    ]
+    MAX_INTENTOS = 5
+
+    clave = models.CharField(max_length=100, unique=True, help_text='Clave de idempotencia: tipo:propietario:período')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    propietario = models.ForeignKey(Propietario, on_delete=models.CASCADE, related_name='notificaciones')
+    periodo = models.CharField(max_length=7, help_text='YYYY-MM')
+    datos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='Pendiente')
+    intentos = models.IntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Notificaciones"
+        indexes = [
+            models.Index(
+                fields=['proximo_intento'],
+                name='notificaciones_cola_idx',
+                condition=models.Q(estado__in=['Pendiente', 'Enviando'])
+            ),
+        ]
+
+    def __str__(self):
+        return f"Notificación {self.clave} ({self.estado})"
+
+    def registrar_resultado(self, enviada, error=None, permanente=False):
+        """Marca el envío como hecho, lo reprograma con espera exponencial o lo descarta.
+
+        Con `permanente` el fallo no se reintenta: reenviar daría el mismo rechazo.
+        """
+        ahora = timezone.now()
+        self.intentos += 1
+        if enviada:
+            self.estado = 'Enviada'
+            self.fecha_envio = ahora
+            self.ultimo_error = ''
+        elif permanente or self.intentos >= self.MAX_INTENTOS:
+            self.estado = 'Fallida'
+            self.ultimo_error = error or 'Envío rechazado'
+        else:
+            # 1, 2, 4, 8... minutos entre intentos
+            self.estado = 'Pendiente'
+            self.proximo_intento = ahora + timedelta(minutes=2 ** (self.intentos - 1))
+            self.ultimo_error = error or 'Envío rechazado'
+        self.save(update_fields=['estado', 'intentos', 'proximo_intento', 'ultimo_error', 'fecha_envio'])
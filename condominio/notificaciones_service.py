@@ -0,0 +1,99 @@
+from datetime import timedelta
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from .models import Notificacion
+
+# Notificaciones que se reservan y envían juntas
+LOTE = 100
+# Tiempo que una notificación queda reservada; si el proceso muere, otro drenado la retoma
+RESERVA = timedelta(minutes=10)
+
+
+def encolar_recordatorios(plan, periodo):
+    """Registra un recordatorio por propietario y período; los ya registrados se ignoran.
+
+    `plan` se consume por lotes, así que puede ser el generador de planificar_recordatorios.
+    """
+    plan = iter(plan)
+    while True:
+        notificaciones = [
+            Notificacion(
+                clave=f'recordatorio:{propietario.id}:{periodo}',
+                tipo='recordatorio',
+                propietario=propietario,
+                periodo=periodo,
+                datos={
+                    'meses_pendientes': ", ".join(fecha.strftime('%m/%Y') for fecha in fechas_pendientes),
+                    'total_deuda': str(total_deuda),
+                }
+            )
+            for propietario, fechas_pendientes, total_deuda in islice(plan, 1000)
+        ]
+        if not notificaciones:
+            return
+        Notificacion.objects.bulk_create(notificaciones, ignore_conflicts=True)
+
+
+def encolar_avisos_recibos(recibos, pdf_url):
+    """Registra el aviso de cada recibo nuevo; pdf_url(recibo) arma el enlace del PDF"""
+    notificaciones = [
+        Notificacion(
+            clave=f'nuevo_recibo:{recibo.id_inmueble.propietario_id}:{recibo.numero_recibo}',
+            tipo='nuevo_recibo',
+            propietario=recibo.id_inmueble.propietario,
+            periodo=recibo.fecha_emision.strftime('%Y-%m'),
+            datos={'monto': str(recibo.monto_total_pagar), 'pdf_url': pdf_url(recibo)}
+        )
+        for recibo in recibos
+    ]
+    Notificacion.objects.bulk_create(notificaciones, batch_size=1000, ignore_conflicts=True)
+
+
+def _enviar(notificacion):
+    from .whatsapp_service import whatsapp_service
+
+    datos = notificacion.datos
+    if notificacion.tipo == 'recordatorio':
+        return whatsapp_service.send_reminder(notificacion.propietario, datos['meses_pendientes'], datos['total_deuda'])
+    return whatsapp_service.send_receipt_notice(notificacion.propietario, datos['monto'], datos.get('pdf_url'))
+
+
+def drenar_notificaciones(lote=LOTE, **filtros):
+    """Envía las notificaciones pendientes cuyo turno llegó, por lotes.
+
+    Cada lote se reserva con skip_locked (varios procesos pueden drenar a la vez)
+    y el resultado de cada mensaje se guarda apenas termina, así que una caída
+    solo deja por reenviar los mensajes que estaban en vuelo. Genera
+    (notificacion, enviada, error) por cada mensaje. Los rechazos permanentes
+    (EnvioRechazado) se descartan sin esperar a agotar los intentos.
+    """
+    from .whatsapp_service import EnvioRechazado, whatsapp_service
+
+    config = whatsapp_service.recargar_config()
+    if not config or not config.whatsapp_activo:
+        # Sin WhatsApp configurado no se gastan intentos
+        return
+
+    while True:
+        ahora = timezone.now()
+        with transaction.atomic():
+            notificaciones = list(
+                Notificacion.objects.select_for_update(skip_locked=True, of=('self',)).select_related('propietario').filter(
+                    estado__in=['Pendiente', 'Enviando'],
+                    proximo_intento__lte=ahora,
+                    **filtros
+                ).order_by('proximo_intento', 'id')[:lote]
+            )
+            if not notificaciones:
+                return
+            Notificacion.objects.filter(id__in=[notificacion.id for notificacion in notificaciones]).update(
+                estado='Enviando',
+                proximo_intento=ahora + RESERVA
+            )
+
+        for notificacion, enviada, error in whatsapp_service.despachar(_enviar, notificaciones):
+            permanente = isinstance(error, EnvioRechazado)
+            error = str(error) if error else None
+            notificacion.registrar_resultado(enviada, error, permanente=permanente)
+            yield notificacion, enviada, error
@@ -4,8 +4,18 @@ from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.pdfgen import canvas
 from io import BytesIO
-from django.http import HttpResponse
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import parse_etags, quote_etag
+from concurrent.futures import ProcessPoolExecutor
+from django.db import connections
+import hashlib
 import os
+import re
+import threading
+import time
+import zipfile
 
 # ==================== PALETA DE COLORES ====================
 COLOR_PRIMARY = colors.HexColor('#2c5282')
@@ -18,22 +28,18 @@ COLOR_TEXT = colors.HexColor('#2d3748')
 # ==================== LOGO (ruta dentro del proyecto) ====================
 LOGO_PATH = os.path.join('static', 'img', 'logo_condominio.png')
 
+# ==================== CACHÉ DE PDFs ====================
+# Incrementar al cambiar el diseño para invalidar todos los PDFs guardados
+VERSION_PLANTILLA = 1
+CARPETA_CACHE = 'recibos_pdf'
+
 # ==================== FOOTER PERSONALIZADO ====================
 class FooterCanvas(canvas.Canvas):
-    def __init__(self, *args, **kwargs):
-        canvas.Canvas.__init__(self, *args, **kwargs)
-        self.pages = []
-
+    # El pie es fijo, así que se dibuja al cerrar cada página en lugar de
+    # guardar una copia del estado del canvas por página hasta el final
     def showPage(self):
-        self.pages.append(dict(self.__dict__))
-        self._startPage()
-
-    def save(self):
-        for page in self.pages:
-            self.__dict__.update(page)
-            self.draw_footer()
-            canvas.Canvas.showPage(self)
-        canvas.Canvas.save(self)
+        self.draw_footer()
+        canvas.Canvas.showPage(self)
 
     def draw_footer(self):
         self.saveState()
@@ -46,30 +52,103 @@ class FooterCanvas(canvas.Canvas):
                                "Condominio Los Jardines • Gestión Administrativa")
         self.restoreState()
 
-# ==================== GENERACIÓN DEL PDF ====================
-def generar_pdf_recibo(recibo):
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=50,
-        leftMargin=50,
-        topMargin=60,
-        bottomMargin=60
-    )
 
-    story = []
-    page_width = letter[0] - 100  # ancho útil de la página
+# ==================== PLANTILLA (partes fijas) ====================
+PAGE_WIDTH = letter[0] - 100  # ancho útil de la página
+
+MESES = ['', 'ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO',
+         'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
+
+# Cada hilo conserva su propia plantilla: los flowables guardan estado al maquetarse
+_plantilla_local = threading.local()
+
+
+def _construir_plantilla():
+    """Estilos y flowables que son iguales en todos los recibos"""
+    page_width = PAGE_WIDTH
+    estilos = {
+        'titulo': TableStyle([
+            ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (0, 0), 14),
+            ('TEXTCOLOR', (0, 0), (0, 0), COLOR_HEADER),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 1), (0, 1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (0, 1), 9),
+            ('TEXTCOLOR', (0, 1), (0, 1), COLOR_PRIMARY),
+        ]),
+        'propietario': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('TEXTCOLOR', (0, 0), (-1, -1), COLOR_TEXT),
+            ('TEXTCOLOR', (0, 0), (0, -1), COLOR_HEADER),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+        ]),
+        'gastos': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), COLOR_HEADER),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+            ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, COLOR_LIGHT]),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ALIGN', (1, 1), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+            ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
+        ]),
+        'resumen': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+            ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
+        ]),
+        'total': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), COLOR_ACCENT),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('BOX', (0, 0), (-1, -1), 1, COLOR_ACCENT),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ]),
+        'saldo': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), COLOR_LIGHT),
+            ('TEXTCOLOR', (0, 0), (-1, -1), COLOR_TEXT),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ]),
+    }
 
     # ==================== ENCABEZADO ====================
-    header_elements = []
-
     if os.path.exists(LOGO_PATH):
-        logo = Image(LOGO_PATH, width=1.2 * inch, height=1.2 * inch)
+        # lazy=0 deja el ImageReader del logo cargado en memoria
+        logo = Image(LOGO_PATH, width=1.2 * inch, height=1.2 * inch, lazy=0)
         logo.hAlign = 'LEFT'
-        header_elements.append(logo)
     else:
-        header_elements.append(Spacer(1, 1.2 * inch))
+        logo = Spacer(1, 1.2 * inch)
 
     header_text_data = [
         ['CONDOMINIO LOS JARDINES'],
@@ -88,44 +167,17 @@ def generar_pdf_recibo(recibo):
         ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
     ]))
 
-    header_container = Table([[header_elements[0], header_table]], colWidths=[100, page_width - 100])
+    header_container = Table([[logo, header_table]], colWidths=[100, page_width - 100])
     header_container.setStyle(TableStyle([
         ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
     ]))
-    story.append(header_container)
 
     # línea divisoria elegante
-    story.append(Spacer(1, 6))
     divider = Table([['']], colWidths=[page_width])
     divider.setStyle(TableStyle([
         ('LINEBELOW', (0, 0), (-1, 0), 1, COLOR_PRIMARY),
     ]))
-    story.append(divider)
-    story.append(Spacer(1, 8))
 
-    # ==================== TÍTULO ====================
-    meses = ['', 'ENERO', 'FEBRERO', 'MARZO', 'ABRIL', 'MAYO', 'JUNIO',
-             'JULIO', 'AGOSTO', 'SEPTIEMBRE', 'OCTUBRE', 'NOVIEMBRE', 'DICIEMBRE']
-    mes_nombre = meses[recibo.fecha_emision.month]
-
-    titulo_data = [
-        ['RECIBO DE CONDOMINIO'],
-        [f"No. {recibo.numero_recibo} • {mes_nombre} {recibo.fecha_emision.year}"]
-    ]
-    titulo_table = Table(titulo_data, colWidths=[page_width])
-    titulo_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (0, 0), 14),
-        ('TEXTCOLOR', (0, 0), (0, 0), COLOR_HEADER),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 1), (0, 1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (0, 1), 9),
-        ('TEXTCOLOR', (0, 1), (0, 1), COLOR_PRIMARY),
-    ]))
-    story.append(titulo_table)
-    story.append(Spacer(1, 10))
-
-    # ==================== DATOS DEL PROPIETARIO ====================
     def section_header(title):
         h = Table([[title]], colWidths=[page_width])
         h.setStyle(TableStyle([
@@ -139,7 +191,97 @@ def generar_pdf_recibo(recibo):
         ]))
         return h
 
-    story.append(section_header('DATOS DEL PROPIETARIO'))
+    # ==================== INFORMACIÓN DE PAGO ====================
+    pago_data = [
+        ['Banco:', 'Banco de Venezuela'],
+        ['Número de Cuenta:', '0102-1234-56-7890123456'],
+        ['Titular:', 'Condominio Los Jardines'],
+        ['RIF:', 'J-123456789-0'],
+    ]
+    pago_table = Table(pago_data, colWidths=[page_width * 0.3, page_width * 0.7])
+    pago_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('TEXTCOLOR', (0, 0), (-1, -1), COLOR_TEXT),
+        ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+
+    # ==================== NOTA ====================
+    nota_text = (
+        "IMPORTANTE: Este recibo constituye constancia de la deuda pendiente. "
+        "Los pagos realizados después del vencimiento generarán intereses por mora según el reglamento. "
+        "Para consultas, comuníquese con la administración."
+    )
+    nota = Table([[nota_text]], colWidths=[page_width])
+    nota.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Oblique'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#4a5568')),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+
+    return {
+        'estilos': estilos,
+        'encabezado': [header_container, Spacer(1, 6), divider, Spacer(1, 8)],
+        'seccion_propietario': section_header('DATOS DEL PROPIETARIO'),
+        'seccion_gastos': section_header('DETALLE DE GASTOS DEL PERÍODO'),
+        'seccion_resumen': section_header('RESUMEN FINANCIERO'),
+        'seccion_pago': section_header('INFORMACIÓN PARA REALIZAR EL PAGO'),
+        'pie': [pago_table, Spacer(1, 4), nota],
+    }
+
+
+def obtener_plantilla():
+    plantilla = getattr(_plantilla_local, 'plantilla', None)
+    if plantilla is None:
+        plantilla = _plantilla_local.plantilla = _construir_plantilla()
+    return plantilla
+
+
+# ==================== GENERACIÓN DEL PDF ====================
+def generar_pdf_recibo(recibo, reutilizar_plantilla=True):
+    """Genera el PDF del recibo; solo las tablas con datos del recibo se arman en cada llamada.
+
+    Con reutilizar_plantilla=False las partes fijas se reconstruyen (útil para comparar).
+    """
+    plantilla = obtener_plantilla() if reutilizar_plantilla else _construir_plantilla()
+    estilos = plantilla['estilos']
+    page_width = PAGE_WIDTH
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=50,
+        leftMargin=50,
+        topMargin=60,
+        bottomMargin=60
+    )
+
+    story = list(plantilla['encabezado'])
+
+    # ==================== TÍTULO ====================
+    mes_nombre = MESES[recibo.fecha_emision.month]
+
+    titulo_data = [
+        ['RECIBO DE CONDOMINIO'],
+        [f"No. {recibo.numero_recibo} • {mes_nombre} {recibo.fecha_emision.year}"]
+    ]
+    titulo_table = Table(titulo_data, colWidths=[page_width])
+    titulo_table.setStyle(estilos['titulo'])
+    story.append(titulo_table)
+    story.append(Spacer(1, 10))
+
+    # ==================== DATOS DEL PROPIETARIO ====================
+    story.append(plantilla['seccion_propietario'])
 
     prop_data = [
         ['Propietario:', f"{recibo.id_inmueble.propietario.nombre} {recibo.id_inmueble.propietario.apellido}"],
@@ -149,23 +291,12 @@ def generar_pdf_recibo(recibo):
     ]
 
     prop_table = Table(prop_data, colWidths=[page_width * 0.3, page_width * 0.7])
-    prop_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (-1, -1), COLOR_TEXT),
-        ('TEXTCOLOR', (0, 0), (0, -1), COLOR_HEADER),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 8),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-    ]))
+    prop_table.setStyle(estilos['propietario'])
     story.append(prop_table)
     story.append(Spacer(1, 8))
 
     # ==================== DETALLE DE GASTOS ====================
-    story.append(section_header('DETALLE DE GASTOS DEL PERÍODO'))
+    story.append(plantilla['seccion_gastos'])
 
     gastos_data = [['Descripción', 'Tipo', 'Monto']]
     for detalle in recibo.detalles.all():
@@ -173,32 +304,12 @@ def generar_pdf_recibo(recibo):
         gastos_data.append([detalle.descripcion_gasto, tipo_gasto, f"${float(detalle.monto_calculado):,.2f}"])
 
     gastos_table = Table(gastos_data, colWidths=[page_width * 0.60, page_width * 0.20, page_width * 0.20])
-    gastos_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), COLOR_HEADER),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
-        ('ALIGN', (2, 0), (2, 0), 'RIGHT'),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, COLOR_LIGHT]),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('ALIGN', (1, 1), (1, -1), 'CENTER'),
-        ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
-    ]))
+    gastos_table.setStyle(estilos['gastos'])
     story.append(gastos_table)
     story.append(Spacer(1, 6))
 
     # ==================== RESUMEN FINANCIERO ====================
-    story.append(section_header('RESUMEN FINANCIERO'))
+    story.append(plantilla['seccion_resumen'])
 
     resumen_data = [
         ['Deuda Anterior:', f"${float(recibo.monto_deuda_anterior):,.2f}"],
@@ -207,91 +318,25 @@ def generar_pdf_recibo(recibo):
     ]
 
     resumen_table = Table(resumen_data, colWidths=[page_width * 0.65, page_width * 0.35])
-    resumen_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
-    ]))
+    resumen_table.setStyle(estilos['resumen'])
     story.append(resumen_table)
 
     # Total a pagar
     total_data = [['TOTAL A PAGAR:', f"${float(recibo.monto_total_pagar):,.2f}"]]
     total_table = Table(total_data, colWidths=[page_width * 0.65, page_width * 0.35])
-    total_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), COLOR_ACCENT),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('BOX', (0, 0), (-1, -1), 1, COLOR_ACCENT),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
+    total_table.setStyle(estilos['total'])
     story.append(total_table)
 
     # Saldo pendiente
     saldo_data = [['Saldo Pendiente:', f"${float(recibo.saldo_pendiente):,.2f}"]]
     saldo_table = Table(saldo_data, colWidths=[page_width * 0.65, page_width * 0.35])
-    saldo_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), COLOR_LIGHT),
-        ('TEXTCOLOR', (0, 0), (-1, -1), COLOR_TEXT),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
+    saldo_table.setStyle(estilos['saldo'])
     story.append(saldo_table)
     story.append(Spacer(1, 6))
 
-    # ==================== INFORMACIÓN DE PAGO ====================
-    story.append(section_header('INFORMACIÓN PARA REALIZAR EL PAGO'))
-
-    pago_data = [
-        ['Banco:', 'Banco de Venezuela'],
-        ['Número de Cuenta:', '0102-1234-56-7890123456'],
-        ['Titular:', 'Condominio Los Jardines'],
-        ['RIF:', 'J-123456789-0'],
-    ]
-    pago_table = Table(pago_data, colWidths=[page_width * 0.3, page_width * 0.7])
-    pago_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ('TEXTCOLOR', (0, 0), (-1, -1), COLOR_TEXT),
-        ('BOX', (0, 0), (-1, -1), 1, COLOR_BORDER),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-    story.append(pago_table)
-    story.append(Spacer(1, 4))
-
-    # ==================== NOTA ====================
-    nota_text = (
-        "IMPORTANTE: Este recibo constituye constancia de la deuda pendiente. "
-        "Los pagos realizados después del vencimiento generarán intereses por mora según el reglamento. "
-        "Para consultas, comuníquese con la administración."
-    )
-    nota = Table([[nota_text]], colWidths=[page_width])
-    nota.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Oblique'),
-        ('FONTSIZE', (0, 0), (-1, -1), 7),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#4a5568')),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 2),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-    ]))
-    story.append(nota)
+    # ==================== INFORMACIÓN DE PAGO Y NOTA ====================
+    story.append(plantilla['seccion_pago'])
+    story.extend(plantilla['pie'])
 
     # ==================== CONSTRUCCIÓN ====================
     doc.build(story, canvasmaker=FooterCanvas)
@@ -299,8 +344,138 @@ def generar_pdf_recibo(recibo):
     return buffer
 
 
-def crear_respuesta_pdf(recibo):
-    pdf_buffer = generar_pdf_recibo(recibo)
-    response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="recibo_{recibo.numero_recibo}.pdf"'
+# ==================== CACHÉ ====================
+def huella_recibo(recibo):
+    """Hash de todos los datos que se imprimen en el PDF del recibo.
+
+    Cualquier cambio en el saldo, los montos o los detalles produce una huella
+    distinta, así que el PDF guardado deja de usarse sin invalidarlo a mano.
+    """
+    inmueble = recibo.id_inmueble
+    datos = [
+        VERSION_PLANTILLA,
+        recibo.numero_recibo,
+        recibo.fecha_emision.isoformat(),
+        inmueble.propietario.nombre,
+        inmueble.propietario.apellido,
+        inmueble.edificio.numero_edificio,
+        inmueble.piso,
+        inmueble.apartamento,
+        inmueble.alicuota,
+        recibo.monto_deuda_anterior,
+        recibo.monto_cargos_mes,
+        recibo.monto_interes_mora,
+        recibo.monto_total_pagar,
+        recibo.saldo_pendiente,
+    ]
+    for detalle in recibo.detalles.all():
+        datos.extend([detalle.descripcion_gasto, detalle.tipo_gasto, detalle.monto_calculado])
+    return hashlib.sha256('\x1f'.join(str(dato) for dato in datos).encode()).hexdigest()
+
+
+def obtener_pdf_recibo(recibo, huella=None):
+    """Devuelve (nombre en el storage, huella) del PDF, generándolo solo si cambió el recibo"""
+    huella = huella or huella_recibo(recibo)
+    carpeta = f'{CARPETA_CACHE}/{recibo.id}'
+    nombre = f'{carpeta}/{huella}.pdf'
+
+    if not default_storage.exists(nombre):
+        guardado = default_storage.save(nombre, ContentFile(generar_pdf_recibo(recibo).getvalue()))
+        if guardado != nombre:
+            # Otra petición lo generó al mismo tiempo; se conserva el primero
+            default_storage.delete(guardado)
+
+        # Eliminar las versiones anteriores del recibo
+        _, archivos = default_storage.listdir(carpeta)
+        for archivo in archivos:
+            if archivo != f'{huella}.pdf':
+                default_storage.delete(f'{carpeta}/{archivo}')
+
+    return nombre, huella
+
+
+def crear_respuesta_pdf(recibo, request=None):
+    # La huella sale de los datos del recibo: si el cliente ya tiene esa versión
+    # se responde 304 sin generar ni leer el PDF
+    huella = huella_recibo(recibo)
+    etag = quote_etag(huella)
+
+    if request is not None and etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        nombre, _ = obtener_pdf_recibo(recibo, huella)
+        response = FileResponse(
+            default_storage.open(nombre, 'rb'),
+            as_attachment=True,
+            filename=f'recibo_{recibo.numero_recibo}.pdf',
+            content_type='application/pdf'
+        )
+    response['ETag'] = etag
+    # El cliente puede guardar el PDF pero debe revalidarlo con If-None-Match
+    response['Cache-Control'] = 'private, no-cache'
     return response
+
+
+# ==================== LOTE MENSUAL ====================
+PAGINA_PDF = re.compile(rb'/Type\s*/Page(?![s\w])')
+
+
+def _iniciar_proceso():
+    import django
+    django.setup()
+
+
+def _renderizar_bloque(recibo_ids):
+    """Genera (o toma de la caché) los PDFs de un bloque de recibos en un proceso hijo"""
+    from .models import Recibos
+
+    resultados = []
+    for recibo in Recibos.objects.filter(id__in=recibo_ids).para_listado():
+        nombre, _ = obtener_pdf_recibo(recibo)
+        with default_storage.open(nombre, 'rb') as archivo:
+            paginas = len(PAGINA_PDF.findall(archivo.read()))
+        resultados.append((recibo.numero_recibo, nombre, paginas))
+    connections.close_all()
+    return resultados
+
+
+def generar_zip_periodo(periodo, destino, procesos=None, tamano_bloque=50, progreso=None):
+    """Escribe en `destino` (ruta o archivo binario) un ZIP con los PDFs de los recibos del período.
+
+    Los recibos se reparten en bloques entre un pool de procesos (por defecto uno
+    por núcleo); el ZIP se escribe a medida que llegan los bloques y, si se indica,
+    se llama a progreso(procesados, total) tras cada bloque. Devuelve recibos,
+    páginas, segundos y páginas por segundo.
+    """
+    from .models import Recibos
+
+    recibo_ids = list(Recibos.objects.del_periodo(periodo).order_by('numero_recibo').values_list('id', flat=True))
+    bloques = [recibo_ids[i:i + tamano_bloque] for i in range(0, len(recibo_ids), tamano_bloque)]
+
+    inicio = time.perf_counter()
+    paginas = 0
+    procesados = 0
+    # Los hijos no deben heredar las conexiones abiertas del proceso padre
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) as pool, \
+            zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zip_lote:
+        for resultados in pool.map(_renderizar_bloque, bloques):
+            for numero_recibo, nombre, paginas_recibo in resultados:
+                with default_storage.open(nombre, 'rb') as archivo:
+                    zip_lote.writestr(f'recibo_{numero_recibo}.pdf', archivo.read())
+                paginas += paginas_recibo
+            procesados += len(resultados)
+            if progreso:
+                progreso(procesados, len(recibo_ids))
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'recibos': len(recibo_ids),
+        'paginas': paginas,
+        'segundos': round(segundos, 2),
+        'paginas_por_segundo': round(paginas / segundos, 1) if segundos else 0,
+    }
+
+
+def nombre_lote(periodo):
+    return f'{CARPETA_CACHE}/lotes/recibos_{periodo}.zip'
@@ -3,7 +3,7 @@ from .models import (
     Propietario, Edificio, Inmueble, Tipos_Gasto, Conceptos_Gasto,
     Gastos_del_Mes, Movimientos_Gastos, Gastos_Edificios, Movimientos_Edificios,
     Recibos, Detalles_Recibo, Pagos, Tasa_Cambio, Configuracion_Recibos,
-    Historial_Pagos, Creditos_Propietario
+    Historial_Pagos, Creditos_Propietario, Tarea
 )
 
 
@@ -139,6 +139,10 @@ class Movimientos_EdificiosSerializer(serializers.ModelSerializer):
 
 class RecibosSerializer(serializers.ModelSerializer):
     id_inmueble = InmuebleSerializer(read_only=True)
+    # id_inmueble se muestra anidado; al crear se indica el inmueble por su id
+    inmueble = serializers.PrimaryKeyRelatedField(
+        source='id_inmueble', queryset=Inmueble.objects.all(), write_only=True, required=False
+    )
     detalles = serializers.SerializerMethodField()
     es_moroso = serializers.SerializerMethodField()
     recibos_sin_pagar = serializers.SerializerMethodField()
@@ -147,9 +151,26 @@ class RecibosSerializer(serializers.ModelSerializer):
         model = Recibos
         fields = '__all__'
     
+    def validate(self, attrs):
+        inmueble = attrs.get('id_inmueble') or getattr(self.instance, 'id_inmueble', None)
+        fecha_emision = attrs.get('fecha_emision') or getattr(self.instance, 'fecha_emision', None)
+        if inmueble is None:
+            raise serializers.ValidationError({'inmueble': 'Este campo es requerido.'})
+
+        # periodo no es editable, así que DRF no valida la restricción recibo_unico_por_periodo
+        if fecha_emision:
+            existentes = Recibos.objects.filter(id_inmueble=inmueble).del_periodo(fecha_emision.strftime('%Y-%m'))
+            if self.instance is not None:
+                existentes = existentes.exclude(pk=self.instance.pk)
+            if existentes.exists():
+                raise serializers.ValidationError(
+                    f"El inmueble ya tiene un recibo para {fecha_emision.strftime('%Y-%m')}"
+                )
+        return attrs
+    
     def get_detalles(self, obj):
-        from .models import Detalles_Recibo
-        detalles = Detalles_Recibo.objects.filter(id_recibo=obj).order_by('tipo_gasto', 'descripcion_gasto')
+        # Usa los detalles precargados por RecibosQuerySet.para_listado cuando existen
+        detalles = sorted(obj.detalles.all(), key=lambda detalle: (detalle.tipo_gasto, detalle.descripcion_gasto))
         return [{
             'id': detalle.id,
             'descripcion_gasto': detalle.descripcion_gasto,
@@ -195,6 +216,17 @@ class PagosSerializer(serializers.ModelSerializer):
         return obj.monto_pagado != obj.id_recibo.monto_total_pagar
 
 
+class ReciboResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Recibos
+        fields = ['id', 'numero_recibo', 'fecha_emision', 'monto_total_pagar', 'saldo_pendiente', 'estado']
+
+
+class PagosResumenSerializer(PagosSerializer):
+    """Versión compacta de PagosSerializer (?view=compact) sin el recibo completo anidado"""
+    id_recibo = ReciboResumenSerializer(read_only=True)
+
+
 class Tasa_CambioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tasa_Cambio
@@ -221,4 +253,20 @@ class Creditos_PropietarioSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Creditos_Propietario
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class TareaSerializer(serializers.ModelSerializer):
+    progreso = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tarea
+        fields = '__all__'
+
+    def get_progreso(self, obj):
+        """Porcentaje de avance según los contadores de la tarea"""
+        if obj.estado == 'Completada':
+            return 100
+        if not obj.total:
+            return 0
+        return min(100, round((obj.procesados + obj.errores) * 100 / obj.total))
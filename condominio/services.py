@@ -1,98 +1,763 @@
+import multiprocessing
+from collections import defaultdict
+from itertools import groupby
 from decimal import Decimal
-from django.db import transaction
-from django.db.models import Sum
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
-from .models import Inmueble, Movimientos_Gastos, Recibos, Detalles_Recibo, Gastos_Edificios, Pagos
+from .models import (
+    Propietario, Inmueble, Movimientos_Gastos, Recibos, Detalles_Recibo, Gastos_Edificios, Gastos_del_Mes, Pagos,
+    Historial_Pagos, Creditos_Propietario,
+    Saldo_Inmueble, Secuencia_Recibos, Corrida_Facturacion
+)
+from .distribucion_service import repartir_cargos
 
+# Tamaño de lote para las inserciones masivas de recibos y detalles
+BATCH_SIZE = 1000
+# Inmuebles facturados por cada transacción confirmada de una corrida
+LOTE_CORRIDA = 500
 
-def calcular_monto_por_alicuota(monto_total, alicuota):
-    """Calcula el monto que corresponde a un inmueble basado en su alícuota"""
-    return (monto_total * alicuota).quantize(Decimal('0.01'))
 
+def planificar_facturacion(fecha_emision, origen='gastos', acumular_deuda=False, incluir_facturados=False):
+    """Fase 1 (plan): carga en un número fijo de consultas todo lo necesario para facturar el mes.
 
-def calcular_monto_partes_iguales(monto_total, total_inmuebles):
-    """Calcula el monto que corresponde a cada inmueble en partes iguales"""
-    return (monto_total / total_inmuebles).quantize(Decimal('0.01'))
+    origen='gastos' factura el monto_base de los Gastos_del_Mes activos;
+    origen='movimientos' factura el monto_real de los Movimientos_Gastos del mes.
+    Con acumular_deuda se arrastra la deuda pendiente de cada inmueble y su interés de mora.
+    Con incluir_facturados se calculan también los inmuebles que ya tienen recibo en el mes.
+    """
+    if origen == 'movimientos':
+        movimientos = Movimientos_Gastos.objects.filter(
+            mes_aplicacion=fecha_emision.replace(day=1)
+        ).select_related('id_gasto_mes__id_concepto__id_tipo_gasto').order_by('id')
+        cargos = [{
+            'gasto': movimiento.id_gasto_mes,
+            'movimiento': movimiento,
+            'monto': movimiento.monto_real
+        } for movimiento in movimientos]
+    else:
+        gastos = Gastos_del_Mes.objects.filter(
+            estado='Activo'
+        ).select_related('id_concepto__id_tipo_gasto').order_by('id')
+        cargos = [{
+            'gasto': gasto,
+            'movimiento': None,
+            'monto': gasto.monto_base
+        } for gasto in gastos]
 
+    edificios_por_gasto = defaultdict(set)
+    for gasto_id, edificio_id in Gastos_Edificios.objects.filter(
+        id_gasto_mes__in={cargo['gasto'].id for cargo in cargos}
+    ).values_list('id_gasto_mes_id', 'id_edificio_id'):
+        edificios_por_gasto[gasto_id].add(edificio_id)
 
-def generar_recibo_mensual(inmueble, mes_aplicacion, movimientos):
-    """Genera un recibo mensual para un inmueble"""
-    with transaction.atomic():
-        # Calcular deuda anterior (recibos pendientes)
-        deuda_anterior = Recibos.objects.filter(
-            id_inmueble=inmueble,
-            saldo_pendiente__gt=0
-        ).aggregate(total=Sum('saldo_pendiente'))['total'] or Decimal('0')
+    # Solo se facturan los inmuebles que aún no tienen recibo en el mes, pero los
+    # cargos se reparten entre todos para que cada cuota no dependa de cuáles falten
+    ya_facturados = set(
+        Recibos.objects.del_periodo(fecha_emision.strftime('%Y-%m')).values_list('id_inmueble_id', flat=True)
+    )
+    todos_inmuebles = list(Inmueble.objects.select_related('propietario', 'edificio').order_by('id'))
+    inmuebles = [
+        inmueble for inmueble in todos_inmuebles
+        if incluir_facturados or inmueble.id not in ya_facturados
+    ]
+
+    deuda_anterior = {}
+    if acumular_deuda:
+        deuda_anterior = dict(
+            Saldo_Inmueble.objects.filter(recibos_pendientes__gt=0).values_list('inmueble_id', 'total_deuda')
+        )
+
+    return {
+        'fecha_emision': fecha_emision,
+        'cargos': cargos,
+        'edificios_por_gasto': edificios_por_gasto,
+        'todos_inmuebles': todos_inmuebles,
+        'inmuebles': inmuebles,
+        'deuda_anterior': deuda_anterior,
+    }
+
+
+def repartir_plan(plan):
+    """Calcula los edificios afectados y el reparto completo de cada cargo del plan (una sola vez por plan)"""
+    if plan.get('repartido'):
+        return plan
+    edificios_por_gasto = plan['edificios_por_gasto']
+    for cargo in plan['cargos']:
+        gasto = cargo['gasto']
+        cargo['tipo_calculo'] = gasto.id_concepto.id_tipo_gasto.tipo_calculo
+        cargo['descripcion'] = gasto.id_concepto.descripcion
+        cargo['edificios'] = None if gasto.tipo_distribucion == 'Todos' else edificios_por_gasto.get(gasto.id, set())
+    repartir_cargos(plan['cargos'], plan['todos_inmuebles'])
+    plan['repartido'] = True
+    return plan
+
+
+def calcular_facturacion(plan, inmuebles=None):
+    """Fase 2 (cálculo): calcula en memoria la matriz inmuebles x cargos del plan sin tocar la base de datos.
 
-        # Calcular cargos del mes
+    Con `inmuebles` se calcula solo esa parte de plan['inmuebles'], reutilizando el reparto del plan.
+    """
+    repartir_plan(plan)
+
+    calculados = []
+    for inmueble in plan['inmuebles'] if inmuebles is None else inmuebles:
         cargos_mes = Decimal('0')
         detalles = []
 
-        for movimiento in movimientos:
-            # Verificar si el movimiento afecta al edificio del inmueble
-            edificio_afectado = False
-            if movimiento.id_gasto_mes.tipo_distribucion == 'Todos':
-                edificio_afectado = True
-            elif movimiento.id_gasto_mes.tipo_distribucion == 'Edificios_Especificos':
-                edificio_afectado = Gastos_Edificios.objects.filter(
-                    id_gasto_mes=movimiento.id_gasto_mes,
-                    id_edificio=inmueble.edificio
-                ).exists()
-
-            if edificio_afectado:
-                # Determinar tipo de cálculo según el tipo de gasto
-                tipo_calculo = movimiento.id_gasto_mes.id_concepto.id_tipo_gasto.tipo_calculo
-                
-                if tipo_calculo == 'Comun':
-                    # Gasto común: se calcula por alícuota
-                    monto_calculado = calcular_monto_por_alicuota(movimiento.monto_real, inmueble.alicuota)
-                else:  # No_Comun
-                    # Gasto no común: se divide en partes iguales entre inmuebles afectados
-                    if movimiento.id_gasto_mes.tipo_distribucion == 'Todos':
-                        total_inmuebles = Inmueble.objects.count()
-                    else:
-                        # Contar inmuebles en edificios específicos
-                        edificios_afectados = Gastos_Edificios.objects.filter(
-                            id_gasto_mes=movimiento.id_gasto_mes
-                        ).values_list('id_edificio', flat=True)
-                        total_inmuebles = Inmueble.objects.filter(edificio__in=edificios_afectados).count()
-                    
-                    monto_calculado = calcular_monto_partes_iguales(movimiento.monto_real, total_inmuebles)
-                
+        for cargo in plan['cargos']:
+            monto_calculado = cargo['reparto'].get(inmueble.id)
+            if monto_calculado is not None and monto_calculado > 0:
                 cargos_mes += monto_calculado
                 detalles.append({
-                    'id_movimiento': movimiento,
-                    'descripcion_gasto': movimiento.id_gasto_mes.id_concepto.descripcion,
+                    'id_gasto_mes': cargo['gasto'],
+                    'id_movimiento': cargo['movimiento'],
+                    'descripcion_gasto': cargo['descripcion'],
+                    'tipo_gasto': cargo['tipo_calculo'],
                     'monto_calculado': monto_calculado
                 })
 
-        # Calcular intereses de mora (3% anual sobre deuda acumulada)
+        deuda_anterior = plan['deuda_anterior'].get(inmueble.id, Decimal('0'))
+        # Intereses de mora (3% anual sobre deuda acumulada)
         interes_mora = (deuda_anterior * Decimal('0.03') / 12).quantize(Decimal('0.01'))
-
-        # Monto total a pagar
         monto_total = deuda_anterior + cargos_mes + interes_mora
 
-        # Crear recibo
-        recibo = Recibos.objects.create(
-            id_inmueble=inmueble,
-            fecha_emision=timezone.now().date(),
-            monto_deuda_anterior=deuda_anterior,
-            monto_cargos_mes=cargos_mes,
-            monto_interes_mora=interes_mora,
-            monto_total_pagar=monto_total,
-            saldo_pendiente=monto_total
+        if monto_total > 0:
+            calculados.append({
+                'inmueble': inmueble,
+                'monto_deuda_anterior': deuda_anterior,
+                'monto_cargos_mes': cargos_mes,
+                'monto_interes_mora': interes_mora,
+                'monto_total_pagar': monto_total,
+                'detalles': detalles
+            })
+
+    return calculados
+
+
+def persistir_facturacion(plan, calculados, primer_numero=None):
+    """Fase 3 (persistencia): inserta con bulk_create los recibos calculados y sus detalles en una sola transacción.
+
+    primer_numero es el inicio de un bloque de números ya reservado; si no se
+    indica, el bloque se reserva dentro de la transacción.
+    """
+    fecha_emision = plan['fecha_emision']
+
+    with transaction.atomic():
+        # bulk_create no llama a Recibos.save(): se reserva un bloque de números de una vez
+        prefijo = fecha_emision.strftime('%Y%m')
+        siguiente = primer_numero
+        if siguiente is None:
+            siguiente = Secuencia_Recibos.reservar(prefijo, len(calculados)) if calculados else 1
+
+        recibos = []
+        for indice, calculado in enumerate(calculados):
+            recibos.append(Recibos(
+                numero_recibo=f"{prefijo}-{siguiente + indice:04d}",
+                id_inmueble=calculado['inmueble'],
+                fecha_emision=fecha_emision,
+                periodo=fecha_emision.strftime('%Y-%m'),
+                monto_deuda_anterior=calculado['monto_deuda_anterior'],
+                monto_cargos_mes=calculado['monto_cargos_mes'],
+                monto_interes_mora=calculado['monto_interes_mora'],
+                monto_total_pagar=calculado['monto_total_pagar'],
+                saldo_pendiente=calculado['monto_total_pagar']
+            ))
+        Recibos.objects.bulk_create(recibos, batch_size=BATCH_SIZE)
+
+        detalles = []
+        for recibo, calculado in zip(recibos, calculados):
+            for detalle in calculado['detalles']:
+                detalles.append(Detalles_Recibo(id_recibo=recibo, **detalle))
+        Detalles_Recibo.objects.bulk_create(detalles, batch_size=BATCH_SIZE)
+
+        Saldo_Inmueble.recalcular(recibo.id_inmueble_id for recibo in recibos)
+
+    return recibos
+
+
+def facturar_mes(fecha_emision, origen='gastos', acumular_deuda=False, lote=LOTE_CORRIDA, progreso=None, procesos=1):
+    """Genera los recibos del mes de fecha_emision (plan -> cálculo -> persistencia).
+
+    La facturación se registra en una Corrida_Facturacion y se confirma por
+    lotes de `lote` inmuebles: si se interrumpe, la siguiente llamada con los
+    mismos parámetros continúa desde el último lote guardado, y repetirla con
+    el mes ya facturado no crea nada. Con procesos > 1 los lotes se reparten
+    por edificio entre varios procesos. progreso(procesados, total) se llama a
+    medida que avanza. Devuelve los recibos creados en esta llamada.
+    """
+    corrida = Corrida_Facturacion.iniciar(fecha_emision.strftime('%Y-%m'), {
+        'fecha_emision': fecha_emision.isoformat(),
+        'origen': origen,
+        'acumular_deuda': acumular_deuda,
+    })
+    recibos = []
+    try:
+        # Sin inmuebles por facturar (mes ya completo) no hace falta planificar nada
+        pendientes = Inmueble.objects.exclude(
+            id__in=Recibos.objects.del_periodo(corrida.periodo).values('id_inmueble_id')
         )
+        if corrida.ultimo_inmueble_id is not None:
+            pendientes = pendientes.filter(id__gt=corrida.ultimo_inmueble_id)
+
+        if pendientes.exists():
+            plan = planificar_facturacion(fecha_emision, origen=origen, acumular_deuda=acumular_deuda)
+            # Los inmuebles sin recibo hasta el último punto guardado no tenían nada que facturar
+            if corrida.ultimo_inmueble_id is not None:
+                plan['inmuebles'] = [i for i in plan['inmuebles'] if i.id > corrida.ultimo_inmueble_id]
+            repartir_plan(plan)
+
+            corrida.total_inmuebles = corrida.procesados + len(plan['inmuebles'])
+            corrida.save(update_fields=['total_inmuebles', 'fecha_actualizacion'])
+
+            # Los procesos heredan el plan con fork (no existe en Windows) y escriben a la vez,
+            # algo que SQLite no admite: en esos casos se factura en serie
+            if procesos > 1 and connection.vendor != 'sqlite' and 'fork' in multiprocessing.get_all_start_methods():
+                from .facturacion_paralela_service import facturar_en_paralelo
+                recibos = facturar_en_paralelo(plan, corrida, procesos, lote, progreso)
+            else:
+                for inicio in range(0, len(plan['inmuebles']), lote):
+                    inmuebles = plan['inmuebles'][inicio:inicio + lote]
+                    # Cada lote y el avance de la corrida se confirman juntos
+                    with transaction.atomic():
+                        creados = persistir_facturacion(plan, calcular_facturacion(plan, inmuebles))
+                        corrida.registrar_lote(len(inmuebles), len(creados), inmuebles[-1].id)
+                    recibos.extend(creados)
+                    if progreso:
+                        progreso(corrida.procesados, corrida.total_inmuebles)
+    except Exception as e:
+        corrida.finalizar(str(e) or e.__class__.__name__)
+        raise
+
+    corrida.finalizar()
+    return recibos
+
+
+def _lineas_detalle(detalles):
+    """{clave: monto} de las líneas de un recibo; la clave distingue gastos con igual descripción"""
+    lineas = {}
+    for detalle in detalles:
+        base = (detalle['id_movimiento'], detalle['descripcion_gasto'], detalle['tipo_gasto'])
+        ocurrencia = 0
+        while base + (ocurrencia,) in lineas:
+            ocurrencia += 1
+        lineas[base + (ocurrencia,)] = detalle
+    return lineas
+
+
+def _diferencia_lineas(guardadas, calculadas):
+    agregadas = [clave for clave in calculadas if clave not in guardadas]
+    eliminadas = [clave for clave in guardadas if clave not in calculadas]
+    modificadas = [
+        clave for clave in calculadas
+        if clave in guardadas and calculadas[clave]['monto_calculado'] != guardadas[clave]['monto_calculado']
+    ]
+    return agregadas, eliminadas, modificadas
 
-        # Crear detalles del recibo
-        for detalle in detalles:
-            Detalles_Recibo.objects.create(
+
+def previsualizar_facturacion(fecha_emision, origen='gastos', acumular_deuda=False, bloquear=False):
+    """Calcula en memoria los recibos del mes y los compara con los guardados, sin escribir nada.
+
+    Devuelve (plan, cambios, sin_cambios). Cada cambio es un dict con la accion
+    ('crear', 'actualizar' o 'eliminar'), el inmueble, el recibo guardado, el
+    cálculo nuevo y las líneas de detalle agregadas, eliminadas y modificadas.
+    En los recibos ya emitidos se conservan la deuda anterior y el interés de
+    mora con que se emitieron: solo se comparan los cargos del mes.
+    """
+    plan = planificar_facturacion(fecha_emision, origen=origen, acumular_deuda=acumular_deuda, incluir_facturados=True)
+    calculados = {calculado['inmueble'].id: calculado for calculado in calcular_facturacion(plan)}
+
+    recibos = Recibos.objects.del_periodo(fecha_emision.strftime('%Y-%m')).prefetch_related('detalles').order_by('id')
+    if bloquear:
+        recibos = recibos.select_for_update(of=('self',))
+    existentes = {}
+    for recibo in recibos:
+        existentes.setdefault(recibo.id_inmueble_id, recibo)
+
+    inmuebles = {inmueble.id: inmueble for inmueble in plan['todos_inmuebles']}
+    cambios = []
+    sin_cambios = 0
+    for inmueble_id in sorted(set(calculados) | set(existentes)):
+        recibo = existentes.get(inmueble_id)
+        calculado = calculados.get(inmueble_id)
+        calculadas = _lineas_detalle([
+            {**detalle, 'id_movimiento': detalle['id_movimiento'].id if detalle['id_movimiento'] else None}
+            for detalle in calculado['detalles']
+        ]) if calculado else {}
+
+        if recibo is None:
+            cambios.append({
+                'accion': 'crear', 'inmueble': inmuebles[inmueble_id], 'recibo': None, 'calculado': calculado,
+                'guardadas': {}, 'calculadas': calculadas,
+                'agregadas': list(calculadas), 'eliminadas': [], 'modificadas': [],
+            })
+            continue
+
+        guardadas = _lineas_detalle([{
+            'id_movimiento': detalle.id_movimiento_id,
+            'descripcion_gasto': detalle.descripcion_gasto,
+            'tipo_gasto': detalle.tipo_gasto,
+            'monto_calculado': detalle.monto_calculado,
+            'objeto': detalle,
+        } for detalle in recibo.detalles.all()])
+        agregadas, eliminadas, modificadas = _diferencia_lineas(guardadas, calculadas)
+        if not (agregadas or eliminadas or modificadas):
+            sin_cambios += 1
+            continue
+
+        cargos_mes = calculado['monto_cargos_mes'] if calculado else Decimal('0')
+        monto_total = recibo.monto_deuda_anterior + cargos_mes + recibo.monto_interes_mora
+        cambios.append({
+            'accion': 'actualizar' if monto_total > 0 else 'eliminar',
+            'inmueble': inmuebles[inmueble_id], 'recibo': recibo,
+            'calculado': {
+                'monto_deuda_anterior': recibo.monto_deuda_anterior,
+                'monto_cargos_mes': cargos_mes,
+                'monto_interes_mora': recibo.monto_interes_mora,
+                'monto_total_pagar': monto_total,
+            },
+            'guardadas': guardadas, 'calculadas': calculadas,
+            'agregadas': agregadas, 'eliminadas': eliminadas, 'modificadas': modificadas,
+        })
+
+    return plan, cambios, sin_cambios
+
+
+def resumir_cambios(cambios):
+    """Diferencia compacta por inmueble para mostrar la previsualización"""
+    resumen = []
+    for cambio in cambios:
+        inmueble = cambio['inmueble']
+        recibo = cambio['recibo']
+        lineas = []
+        for clave in cambio['agregadas'] + cambio['eliminadas'] + cambio['modificadas']:
+            antes = cambio['guardadas'].get(clave)
+            despues = cambio['calculadas'].get(clave)
+            lineas.append({
+                'descripcion': clave[1],
+                'antes': antes['monto_calculado'] if antes else None,
+                'despues': despues['monto_calculado'] if despues else None,
+            })
+        resumen.append({
+            'inmueble_id': inmueble.id,
+            'inmueble': f"{inmueble.edificio.numero_edificio}-{inmueble.piso}{inmueble.apartamento}",
+            'accion': cambio['accion'],
+            'recibo': recibo.numero_recibo if recibo else None,
+            'total_antes': recibo.monto_total_pagar if recibo else None,
+            'total_despues': cambio['calculado']['monto_total_pagar'],
+            'lineas': lineas,
+        })
+    return resumen
+
+
+def aplicar_facturacion(fecha_emision, origen='gastos', acumular_deuda=False):
+    """Lleva los recibos del mes al cálculo actual escribiendo solo lo que cambió.
+
+    Crea los recibos que faltan, corrige las líneas y montos de los que
+    difieren (ajustando el saldo pendiente por la diferencia, sin tocar sus
+    pagos) y elimina los que quedaron en cero si no tienen pagos. Si lo pagado
+    supera el nuevo total, el excedente pasa a crédito del propietario.
+    """
+    with transaction.atomic():
+        plan, cambios, sin_cambios = previsualizar_facturacion(
+            fecha_emision, origen=origen, acumular_deuda=acumular_deuda, bloquear=True
+        )
+
+        a_eliminar = {cambio['recibo'].id for cambio in cambios if cambio['accion'] == 'eliminar'}
+        con_pagos = set(Pagos.objects.filter(id_recibo__in=a_eliminar).values_list('id_recibo_id', flat=True))
+        con_pagos |= set(Historial_Pagos.objects.filter(id_recibo__in=a_eliminar).values_list('id_recibo_id', flat=True))
+        a_eliminar -= con_pagos
+
+        creados = persistir_facturacion(plan, [cambio['calculado'] for cambio in cambios if cambio['accion'] == 'crear'])
+
+        recibos = []
+        lineas_nuevas = []
+        lineas_modificadas = []
+        lineas_eliminadas = []
+        excedentes = []
+        for cambio in cambios:
+            recibo = cambio['recibo']
+            if cambio['accion'] == 'crear' or recibo.id in a_eliminar:
+                continue
+
+            calculado = cambio['calculado']
+            saldo = recibo.saldo_pendiente + calculado['monto_total_pagar'] - recibo.monto_total_pagar
+            if saldo < 0:
+                excedentes.append((recibo, cambio['inmueble'].propietario, -saldo))
+                saldo = Decimal('0')
+            recibo.monto_cargos_mes = calculado['monto_cargos_mes']
+            recibo.monto_total_pagar = calculado['monto_total_pagar']
+            recibo.saldo_pendiente = saldo
+            recibo.estado = 'Pagado' if saldo == 0 else 'Pendiente'
+            recibos.append(recibo)
+
+            for clave in cambio['eliminadas']:
+                lineas_eliminadas.append(cambio['guardadas'][clave]['objeto'].id)
+            for clave in cambio['modificadas']:
+                detalle = cambio['guardadas'][clave]['objeto']
+                detalle.monto_calculado = cambio['calculadas'][clave]['monto_calculado']
+                lineas_modificadas.append(detalle)
+            for clave in cambio['agregadas']:
+                linea = cambio['calculadas'][clave]
+                lineas_nuevas.append(Detalles_Recibo(
+                    id_recibo=recibo,
+                    id_gasto_mes=linea['id_gasto_mes'],
+                    id_movimiento_id=linea['id_movimiento'],
+                    descripcion_gasto=linea['descripcion_gasto'],
+                    tipo_gasto=linea['tipo_gasto'],
+                    monto_calculado=linea['monto_calculado']
+                ))
+
+        Recibos.objects.bulk_update(
+            recibos, ['monto_cargos_mes', 'monto_total_pagar', 'saldo_pendiente', 'estado'], batch_size=BATCH_SIZE
+        )
+        Detalles_Recibo.objects.filter(id__in=lineas_eliminadas).delete()
+        Detalles_Recibo.objects.bulk_update(lineas_modificadas, ['monto_calculado'], batch_size=BATCH_SIZE)
+        Detalles_Recibo.objects.bulk_create(lineas_nuevas, batch_size=BATCH_SIZE)
+        Recibos.objects.filter(id__in=a_eliminar).delete()
+
+        credito_generado = Decimal('0')
+        for recibo, propietario, excedente in excedentes:
+            Creditos_Propietario.objects.get_or_create(propietario=propietario)
+            credito = Creditos_Propietario.objects.select_for_update().get(propietario=propietario)
+            credito.saldo_credito += excedente
+            credito.save()
+            Historial_Pagos.objects.create(
                 id_recibo=recibo,
-                id_movimiento=detalle['id_movimiento'],
-                descripcion_gasto=detalle['descripcion_gasto'],
-                monto_calculado=detalle['monto_calculado']
+                propietario=propietario,
+                monto_aplicado=Decimal('0'),
+                monto_credito_generado=excedente,
+                tipo_transaccion='Sobrepago',
+                referencia_bancaria=f'AJUSTE-{recibo.numero_recibo}',
+                notas=f'Corrección de facturación generó crédito de ${excedente}'
             )
+            credito_generado += excedente
+
+    return {
+        'creados': len(creados),
+        'actualizados': len(recibos),
+        'eliminados': len(a_eliminar),
+        'sin_cambios': sin_cambios,
+        'lineas_modificadas': len(lineas_nuevas) + len(lineas_modificadas) + len(lineas_eliminadas),
+        'credito_generado': credito_generado,
+    }
 
-        return recibo
+
+# Campos de Gastos_del_Mes que cambian lo que se factura; los demás no obligan a recalcular
+CAMPOS_MONTO_GASTO = ('monto_base', 'estado', 'tipo_distribucion', 'id_concepto_id')
+
+
+def _sin_recalculo(periodo=None):
+    return {'periodo': periodo, 'recibos_actualizados': 0, 'lineas_modificadas': 0, 'omitidos': 0, 'sin_recibo': []}
+
+
+def recalcular_cargo(gasto, movimiento, periodo, monto=None):
+    """Recalcula solo las líneas de un gasto (o de uno de sus movimientos) en los recibos del período.
+
+    Las líneas se ubican por id_movimiento, o por id_gasto_mes si el gasto se
+    facturó directamente. El monto se reparte de nuevo entre los inmuebles
+    afectados y en los recibos sin pagos aplicados se corrigen, agregan o
+    quitan sus líneas y se ajustan los totales, todo en escrituras por lote.
+    Los recibos con pagos no se tocan y se cuentan como omitidos; los
+    inmuebles que ahora deben una parte del gasto pero no tienen recibo en el
+    período se devuelven en sin_recibo. Ambos quedan para actualizar_recibos.
+    """
+    if movimiento:
+        lineas = Detalles_Recibo.objects.filter(id_movimiento=movimiento)
+    else:
+        # Las líneas anteriores al vínculo con el gasto se reconocen por su descripción
+        lineas = Detalles_Recibo.objects.filter(id_movimiento__isnull=True).filter(
+            Q(id_gasto_mes=gasto) | Q(id_gasto_mes__isnull=True, descripcion_gasto=gasto.id_concepto.descripcion)
+        )
+
+    if monto is None:
+        if movimiento:
+            monto = movimiento.monto_real
+        else:
+            monto = gasto.monto_base if gasto.estado == 'Activo' else Decimal('0')
+    tipo_calculo = gasto.id_concepto.id_tipo_gasto.tipo_calculo
+    cargo = {
+        'monto': monto,
+        'tipo_calculo': tipo_calculo,
+        'edificios': None if gasto.tipo_distribucion == 'Todos' else set(
+            gasto.gastos_edificios.values_list('id_edificio_id', flat=True)
+        ),
+    }
+    # Mismo orden que planificar_facturacion, para que los céntimos sobrantes caigan igual
+    repartir_cargos([cargo], list(Inmueble.objects.only('id', 'edificio_id', 'alicuota').order_by('id')))
+
+    with transaction.atomic():
+        recibos_periodo = Recibos.objects.del_periodo(periodo)
+        recibos = {}
+        for recibo in recibos_periodo.select_for_update().order_by('id'):
+            recibos.setdefault(recibo.id_inmueble_id, recibo)
+        guardadas = defaultdict(list)
+        for linea in lineas.filter(id_recibo__in=recibos_periodo).order_by('id'):
+            guardadas[linea.id_recibo_id].append(linea)
+
+        recibos_actualizados = []
+        lineas_nuevas = []
+        lineas_modificadas = []
+        lineas_eliminadas = []
+        omitidos = 0
+        for inmueble_id, recibo in recibos.items():
+            existentes = guardadas.get(recibo.id, [])
+            nuevo = cargo['reparto'].get(inmueble_id, Decimal('0'))
+            actual = sum((linea.monto_calculado for linea in existentes), Decimal('0'))
+            if nuevo == actual and len(existentes) <= 1:
+                continue
+            if recibo.saldo_pendiente != recibo.monto_total_pagar:
+                omitidos += 1
+                continue
+
+            if nuevo > 0 and existentes:
+                existentes[0].monto_calculado = nuevo
+                existentes[0].id_gasto_mes = gasto
+                lineas_modificadas.append(existentes[0])
+                lineas_eliminadas += [linea.id for linea in existentes[1:]]
+            elif nuevo > 0:
+                lineas_nuevas.append(Detalles_Recibo(
+                    id_recibo=recibo,
+                    id_gasto_mes=gasto,
+                    id_movimiento=movimiento,
+                    descripcion_gasto=gasto.id_concepto.descripcion,
+                    tipo_gasto=tipo_calculo,
+                    monto_calculado=nuevo
+                ))
+            else:
+                nuevo = Decimal('0')
+                lineas_eliminadas += [linea.id for linea in existentes]
+
+            diferencia = nuevo - actual
+            recibo.monto_cargos_mes += diferencia
+            recibo.monto_total_pagar += diferencia
+            recibo.saldo_pendiente += diferencia
+            recibo.estado = 'Pagado' if recibo.saldo_pendiente <= 0 else 'Pendiente'
+            recibos_actualizados.append(recibo)
+
+        Detalles_Recibo.objects.bulk_update(lineas_modificadas, ['monto_calculado', 'id_gasto_mes'], batch_size=BATCH_SIZE)
+        Detalles_Recibo.objects.bulk_create(lineas_nuevas, batch_size=BATCH_SIZE)
+        Detalles_Recibo.objects.filter(id__in=lineas_eliminadas).delete()
+        Recibos.objects.bulk_update(
+            recibos_actualizados, ['monto_cargos_mes', 'monto_total_pagar', 'saldo_pendiente', 'estado'],
+            batch_size=BATCH_SIZE
+        )
+
+    # Recibos inexistentes no se crean aquí: la numeración y la deuda anterior son de la facturación
+    sin_recibo = sorted(
+        inmueble_id for inmueble_id, parte in cargo['reparto'].items()
+        if parte > 0 and inmueble_id not in recibos
+    ) if recibos else []
+
+    return {
+        'periodo': periodo,
+        'recibos_actualizados': len(recibos_actualizados),
+        'lineas_modificadas': len(lineas_nuevas) + len(lineas_modificadas) + len(lineas_eliminadas),
+        'omitidos': omitidos,
+        'sin_recibo': sin_recibo,
+    }
+
+
+def recalcular_gasto(gasto, periodo):
+    """Recalcula las líneas que dependen del gasto (directas y de sus movimientos) en los recibos del período.
+
+    Gastos_del_Mes es una plantilla que se repite cada mes: el período se
+    indica siempre de forma explícita, así editar el gasto para los meses
+    siguientes no cambia recibos ya emitidos.
+    """
+    resultado = _sin_recalculo(periodo)
+    recibos_periodo = Recibos.objects.del_periodo(periodo)
+    if not recibos_periodo.exists():
+        return resultado
+
+    movimientos = set(Detalles_Recibo.objects.filter(
+        id_gasto_mes=gasto, id_recibo__in=recibos_periodo
+    ).values_list('id_movimiento', flat=True).distinct())
+    por_movimientos = Detalles_Recibo.objects.filter(
+        id_movimiento__isnull=False, id_recibo__in=recibos_periodo
+    ).exists()
+
+    cargos = list(Movimientos_Gastos.objects.filter(id__in=movimientos - {None}).order_by('id'))
+    # Un mes facturado desde los gastos se recalcula aunque el gasto aún no tenga líneas en él
+    if None in movimientos or not por_movimientos:
+        cargos.insert(0, None)
+    sin_recibo = set()
+    for movimiento in cargos:
+        parcial = recalcular_cargo(gasto, movimiento, periodo)
+        for clave in ('recibos_actualizados', 'lineas_modificadas', 'omitidos'):
+            resultado[clave] += parcial[clave]
+        sin_recibo.update(parcial['sin_recibo'])
+    resultado['sin_recibo'] = sorted(sin_recibo)
+    return resultado
+
+
+def recalcular_movimiento(movimiento, periodo=None, eliminar=False):
+    """Recalcula las líneas del movimiento si su período se facturó a partir de movimientos.
+
+    Con eliminar=True se quitan sus líneas (antes de borrar el movimiento).
+    """
+    periodo = periodo or movimiento.mes_aplicacion.strftime('%Y-%m')
+    facturado_por_movimientos = Detalles_Recibo.objects.filter(
+        id_movimiento__isnull=False, id_recibo__in=Recibos.objects.del_periodo(periodo)
+    ).exists()
+    if not facturado_por_movimientos:
+        return _sin_recalculo()
+    return recalcular_cargo(
+        movimiento.id_gasto_mes, movimiento, periodo, monto=Decimal('0') if eliminar else None
+    )
+
+
+def aplicar_pago_propietario(recibo, monto_pagado, referencia_bancaria):
+    """Aplica un pago verificado a los recibos pendientes del propietario, del más antiguo al más reciente.
+
+    Bloquea el crédito y los recibos pendientes del propietario con select_for_update, calcula el
+    reparto en memoria y lo guarda con bulk_update/bulk_create, así dos pagos simultáneos del mismo
+    propietario se aplican uno después del otro sin duplicar crédito.
+    """
+    propietario = recibo.id_inmueble.propietario
+
+    with transaction.atomic():
+        # El crédito se bloquea primero: es el punto de serialización de los pagos del propietario
+        Creditos_Propietario.objects.get_or_create(
+            propietario=propietario,
+            defaults={'saldo_credito': Decimal('0')}
+        )
+        credito = Creditos_Propietario.objects.select_for_update().get(propietario=propietario)
+
+        # Verificar si ya existe un pago verificado con esta referencia
+        if Pagos.objects.filter(referencia_bancaria=referencia_bancaria, estado_verificacion='Verificado').exists():
+            raise ValueError('Ya existe un pago verificado con esta referencia bancaria')
+
+        recibos_pendientes = list(
+            Recibos.objects.select_for_update(of=('self',)).filter(
+                id_inmueble__propietario=propietario,
+                saldo_pendiente__gt=0
+            ).order_by('fecha_emision', 'id')
+        )
+
+        # Aplicar crédito existente primero si hay
+        monto_disponible = monto_pagado + credito.saldo_credito
+        monto_restante = monto_disponible
+
+        recibos_actualizados = []
+        historial = []
+        pagos_aplicados = []
+        for recibo_pendiente in recibos_pendientes:
+            if monto_restante <= 0:
+                break
+
+            monto_a_aplicar = min(monto_restante, recibo_pendiente.saldo_pendiente)
+            recibo_pendiente.saldo_pendiente -= monto_a_aplicar
+            if recibo_pendiente.saldo_pendiente == 0:
+                recibo_pendiente.estado = 'Pagado'
+            recibos_actualizados.append(recibo_pendiente)
+
+            historial.append(Historial_Pagos(
+                id_recibo=recibo_pendiente,
+                propietario=propietario,
+                monto_aplicado=monto_a_aplicar,
+                tipo_transaccion='Pago_Completo' if recibo_pendiente.saldo_pendiente == 0 else 'Pago_Parcial',
+                referencia_bancaria=referencia_bancaria,
+                notas=f'Aplicado desde pago de recibo {recibo.numero_recibo}'
+            ))
+            pagos_aplicados.append({
+                'recibo': recibo_pendiente.numero_recibo,
+                'monto_aplicado': monto_a_aplicar,
+                'saldo_restante': recibo_pendiente.saldo_pendiente
+            })
+            monto_restante -= monto_a_aplicar
+
+        # Si queda dinero, guardarlo como crédito
+        credito.saldo_credito = max(monto_restante, Decimal('0'))
+        if monto_restante > 0:
+            historial.append(Historial_Pagos(
+                id_recibo=recibo,
+                propietario=propietario,
+                monto_aplicado=monto_pagado,
+                monto_credito_generado=monto_restante,
+                tipo_transaccion='Sobrepago',
+                referencia_bancaria=referencia_bancaria,
+                notas=f'Sobrepago generó crédito de ${monto_restante}'
+            ))
+
+        Recibos.objects.bulk_update(recibos_actualizados, ['saldo_pendiente', 'estado'], batch_size=BATCH_SIZE)
+        Historial_Pagos.objects.bulk_create(historial, batch_size=BATCH_SIZE)
+        credito.save()
+
+        # Crear el registro de pago principal
+        pago = Pagos.objects.create(
+            id_recibo=recibo,
+            fecha_pago=timezone.now().date(),
+            monto_pagado=monto_pagado,
+            referencia_bancaria=referencia_bancaria,
+            metodo_pago='Transferencia',
+            estado_verificacion='Verificado'
+        )
+
+    return {
+        'pago': pago,
+        'pagos_aplicados': pagos_aplicados,
+        'credito_restante': credito.saldo_credito,
+        'total_aplicado': monto_disponible - monto_restante
+    }
+
+
+def verificar_pagos_en_lote(pago_ids):
+    """Verifica varios pagos y descuenta sus montos de los recibos en una sola pasada.
+
+    Pagos y recibos se bloquean con select_for_update; los pagos que comparten
+    recibo se acumulan sobre la misma instancia y todo se guarda con bulk_update.
+    Devuelve un resultado por cada id recibido (los ya verificados se omiten).
+    """
+    pago_ids = list(dict.fromkeys(int(pago_id) for pago_id in pago_ids))
+
+    with transaction.atomic():
+        pagos = {}
+        for inicio in range(0, len(pago_ids), BATCH_SIZE):
+            # Con FOR UPDATE se bloquean también los recibos unidos por select_related
+            pagos.update(
+                (pago.id, pago)
+                for pago in Pagos.objects.select_related('id_recibo').select_for_update().filter(
+                    id__in=pago_ids[inicio:inicio + BATCH_SIZE]
+                ).order_by('id')
+            )
+
+        recibos = {}
+        verificados = []
+        resultados = []
+        for pago_id in pago_ids:
+            pago = pagos.get(pago_id)
+            if pago is None:
+                resultados.append({'pago_id': pago_id, 'resultado': 'No encontrado'})
+                continue
+            if pago.estado_verificacion == 'Verificado':
+                resultados.append({'pago_id': pago_id, 'resultado': 'Ya verificado'})
+                continue
+
+            recibo = recibos.setdefault(pago.id_recibo_id, pago.id_recibo)
+            recibo.saldo_pendiente = max(Decimal('0'), recibo.saldo_pendiente - pago.monto_pagado)
+            if recibo.saldo_pendiente == 0:
+                recibo.estado = 'Pagado'
+            pago.estado_verificacion = 'Verificado'
+            verificados.append(pago)
+            resultados.append({
+                'pago_id': pago_id,
+                'resultado': 'Verificado',
+                'recibo_id': recibo.id,
+                'monto_pagado': pago.monto_pagado,
+            })
+
+        Pagos.objects.bulk_update(verificados, ['estado_verificacion'], batch_size=BATCH_SIZE)
+        Recibos.objects.bulk_update(recibos.values(), ['saldo_pendiente', 'estado'], batch_size=BATCH_SIZE)
+
+    # Saldo final de cada recibo, ya con todos los pagos del lote aplicados
+    for resultado in resultados:
+        if resultado['resultado'] == 'Verificado':
+            recibo = recibos[pagos[resultado['pago_id']].id_recibo_id]
+            resultado['saldo_pendiente'] = recibo.saldo_pendiente
+            resultado['estado_recibo'] = recibo.estado
+
+    return resultados
 
 
 def procesar_pago(recibo, monto_pagado, referencia_bancaria):
@@ -112,4 +777,50 @@ def procesar_pago(recibo, monto_pagado, referencia_bancaria):
         recibo.saldo_pendiente = max(nuevo_saldo, Decimal('0'))
         recibo.save()
 
-        return pago
\ No newline at end of file
+        return pago
+
+
+def planificar_recordatorios(solo_morosos=False):
+    """Genera (propietario, fechas_pendientes, total_deuda) por cada propietario con deuda.
+
+    Todo sale de una sola consulta que se recorre por partes; con solo_morosos
+    se excluyen en SQL los propietarios con 3 recibos pendientes o menos.
+    """
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.aggregates import ArrayAgg
+
+        # Agrupado por propietario: una fila con sus meses pendientes, cantidad y deuda
+        propietarios = Propietario.objects.filter(
+            inmuebles__recibos__saldo_pendiente__gt=0
+        ).annotate(
+            recibos_pendientes=Count('inmuebles__recibos'),
+            total_deuda=Sum('inmuebles__recibos__saldo_pendiente'),
+            fechas_pendientes=ArrayAgg('inmuebles__recibos__fecha_emision', order_by='inmuebles__recibos__fecha_emision')
+        ).order_by('id')
+        if solo_morosos:
+            propietarios = propietarios.filter(recibos_pendientes__gt=3)
+
+        for propietario in propietarios.iterator(chunk_size=BATCH_SIZE):
+            yield propietario, propietario.fechas_pendientes, propietario.total_deuda
+        return
+
+    # Otros motores no tienen ArrayAgg: se recorren los recibos pendientes ordenados
+    # por propietario y se agrupan al vuelo, en la misma única consulta
+    recibos = Recibos.objects.filter(saldo_pendiente__gt=0)
+    if solo_morosos:
+        morosos = recibos.order_by().values('id_inmueble__propietario_id').annotate(
+            cantidad=Count('id')
+        ).filter(cantidad__gt=3).values('id_inmueble__propietario_id')
+        recibos = recibos.filter(id_inmueble__propietario_id__in=morosos)
+
+    recibos = recibos.select_related('id_inmueble__propietario').only(
+        'fecha_emision', 'saldo_pendiente', 'id_inmueble__propietario'
+    ).order_by('id_inmueble__propietario_id', 'fecha_emision')
+
+    for _, grupo in groupby(recibos.iterator(chunk_size=BATCH_SIZE), key=lambda recibo: recibo.id_inmueble.propietario_id):
+        grupo = list(grupo)
+        yield (
+            grupo[0].id_inmueble.propietario,
+            [recibo.fecha_emision for recibo in grupo],
+            sum((recibo.saldo_pendiente for recibo in grupo), Decimal('0'))
+        )
@@ -0,0 +1,99 @@
+import tempfile
+from datetime import datetime
+from django.conf import settings
+from django.core.files.storage import default_storage
+from .models import Notificacion
+from .notificaciones_service import encolar_recordatorios, drenar_notificaciones
+from .services import facturar_mes, aplicar_facturacion, planificar_recordatorios
+
+
+def _facturacion(tarea):
+    parametros = tarea.parametros
+    fecha_emision = datetime.strptime(parametros['fecha_emision'], '%Y-%m-%d').date()
+
+    if parametros.get('actualizar'):
+        # Solo se escriben los recibos que cambian; sus pagos se conservan
+        resultado = aplicar_facturacion(fecha_emision)
+        procesados = resultado['creados'] + resultado['actualizados'] + resultado['eliminados']
+        tarea.avanzar(procesados=procesados, total=procesados)
+        return {
+            'message': (
+                f"Actualizados: {resultado['actualizados']} recibos corregidos, {resultado['creados']} nuevos, "
+                f"{resultado['eliminados']} eliminados, {resultado['sin_cambios']} sin cambios"
+            ),
+            **resultado,
+            'credito_generado': str(resultado['credito_generado']),
+        }
+
+    # Se factura por lotes confirmados: si la tarea falla, al reintentarla continúa donde quedó
+    recibos = facturar_mes(
+        fecha_emision,
+        progreso=lambda procesados, total: tarea.avanzar(procesados=procesados, total=total),
+        procesos=settings.FACTURACION_PROCESOS
+    )
+    return {
+        'message': f'Se generaron {len(recibos)} recibos exitosamente',
+        'recibos_generados': len(recibos),
+    }
+
+
+def _pdf_lote(tarea):
+    from .pdf_service import generar_zip_periodo, nombre_lote
+
+    with tempfile.TemporaryFile() as temporal:
+        resultado = generar_zip_periodo(
+            tarea.periodo,
+            temporal,
+            progreso=lambda procesados, total: tarea.avanzar(procesados=procesados, total=total)
+        )
+        temporal.seek(0)
+        default_storage.delete(nombre_lote(tarea.periodo))
+        default_storage.save(nombre_lote(tarea.periodo), temporal)
+
+    return {
+        'message': f"Se generaron los PDFs de {resultado['recibos']} recibos",
+        **resultado
+    }
+
+
+def _recordatorios(tarea):
+    encolar_recordatorios(planificar_recordatorios(tarea.parametros.get('solo_morosos', False)), tarea.periodo)
+    pendientes = Notificacion.objects.filter(
+        tipo='recordatorio', periodo=tarea.periodo, estado__in=['Pendiente', 'Enviando']
+    ).count()
+    tarea.avanzar(total=pendientes)
+
+    enviados = 0
+    errores = 0
+    for _, enviada, _ in drenar_notificaciones(tipo='recordatorio', periodo=tarea.periodo):
+        if enviada:
+            enviados += 1
+        else:
+            errores += 1
+        # Los contadores se guardan cada 50 envíos para no escribir una fila por mensaje
+        if (enviados + errores) % 50 == 0:
+            tarea.avanzar(procesados=enviados, errores=errores)
+    tarea.avanzar(procesados=enviados, errores=errores)
+
+    return {
+        'message': f'Recordatorios enviados: {enviados}',
+        'enviados': enviados,
+        'errores': errores,
+    }
+
+
+EJECUTORES = {
+    'facturacion': _facturacion,
+    'pdf_lote': _pdf_lote,
+    'recordatorios': _recordatorios,
+}
+
+
+def ejecutar_tarea(tarea):
+    """Ejecuta una tarea ya reservada y registra su resultado o su error"""
+    try:
+        resultado = EJECUTORES[tarea.tipo](tarea)
+    except Exception as e:
+        tarea.finalizar(error=str(e) or e.__class__.__name__)
+        return False
+    return tarea.finalizar(resultado)
@@ -0,0 +1,44 @@
+from decimal import Decimal
+from condominio.models import (
+    Conceptos_Gasto, Edificio, Gastos_del_Mes, Gastos_Edificios, Inmueble, Propietario, Tipos_Gasto
+)
+
+
+def crear_condominio(edificios=2, por_edificio=3):
+    """Edificios con inmuebles de alícuotas que suman 1 y tres gastos recurrentes.
+
+    Uno de los gastos es no común y solo se cobra al primer edificio.
+    Devuelve la lista de edificios.
+    """
+    comun = Tipos_Gasto.objects.create(nombre='Común', descripcion='', tipo_calculo='Comun')
+    no_comun = Tipos_Gasto.objects.create(nombre='No común', descripcion='', tipo_calculo='No_Comun')
+
+    total = edificios * por_edificio
+    alicuota = (Decimal(1) / total).quantize(Decimal('0.000001'))
+    lista = []
+    for numero in range(edificios):
+        edificio = Edificio.objects.create(numero_edificio=str(numero + 1))
+        for indice in range(por_edificio):
+            orden = numero * por_edificio + indice
+            propietario = Propietario.objects.create(
+                nombre=f'Propietario {orden}', apellido='Prueba', cedula=f'V{orden}',
+                telefono='04141234567', email=f'p{orden}@example.com'
+            )
+            Inmueble.objects.create(
+                propietario=propietario, edificio=edificio, piso=str(indice // 4), apartamento=str(indice),
+                # La última alícuota absorbe el redondeo para que sumen exactamente 1
+                alicuota=alicuota if orden < total - 1 else Decimal(1) - alicuota * (total - 1)
+            )
+        lista.append(edificio)
+
+    for descripcion, tipo, monto in [('Nómina', comun, '1000.00'), ('Electricidad', comun, '333.33')]:
+        Gastos_del_Mes.objects.create(
+            id_concepto=Conceptos_Gasto.objects.create(descripcion=descripcion, id_tipo_gasto=tipo),
+            monto_base=Decimal(monto), es_recurrente=True
+        )
+    ascensor = Gastos_del_Mes.objects.create(
+        id_concepto=Conceptos_Gasto.objects.create(descripcion='Ascensor', id_tipo_gasto=no_comun),
+        monto_base=Decimal('100.00'), es_recurrente=True, tipo_distribucion='Edificios_Especificos'
+    )
+    Gastos_Edificios.objects.create(id_gasto_mes=ascensor, id_edificio=lista[0])
+    return lista
@@ -0,0 +1,86 @@
+import io
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from condominio import conciliacion_service
+from condominio.conciliacion_service import conciliar_estado_cuenta, leer_estado_cuenta
+from condominio.models import Pagos
+from condominio.services import facturar_mes
+from .datos import crear_condominio
+
+
+class ConciliarEstadoCuentaTests(TestCase):
+    """Cada movimiento del banco verifica a lo sumo un pago, el de su referencia y monto"""
+
+    def setUp(self):
+        crear_condominio(edificios=1, por_edificio=2)
+        self.recibo, self.otro = facturar_mes(date(2025, 1, 1))
+
+    def pagar(self, referencia, monto, recibo=None):
+        return Pagos.objects.create(
+            id_recibo=recibo or self.recibo, fecha_pago=date(2025, 1, 10), monto_pagado=Decimal(monto),
+            referencia_bancaria=referencia
+        )
+
+    def conciliar(self, *lineas):
+        archivo = io.BytesIO('\n'.join(['fecha;referencia;monto', *lineas]).encode())
+        return conciliar_estado_cuenta(leer_estado_cuenta(archivo, nombre='banco.csv'))
+
+    def estado(self, pago):
+        pago.refresh_from_db()
+        return pago.estado_verificacion
+
+    def test_conciliacion_discrepancia_y_linea_repetida(self):
+        pago = self.pagar('000123', '100.00')
+        con_otro_monto = self.pagar('555', '80.00')
+
+        resultado = self.conciliar(
+            '2025-01-10;123;100,00',
+            '2025-01-10;123;100,00',
+            '2025-01-10;555;75,00',
+            '2025-01-10;999;10,00',
+            '2025-01-11;COMISION;-5,00',
+        )
+
+        self.assertEqual([conciliado['pago_id'] for conciliado in resultado['conciliados']], [pago.id])
+        self.assertEqual(self.estado(pago), 'Verificado')
+        discrepancia, = resultado['discrepancias']
+        self.assertEqual(discrepancia['pagos'], [{'pago_id': con_otro_monto.id, 'monto_registrado': Decimal('80.00')}])
+        self.assertEqual(self.estado(con_otro_monto), 'Por Verificar')
+        # La línea repetida ya no encuentra pago pendiente
+        self.assertEqual([movimiento['linea'] for movimiento in resultado['no_conciliados']], [3, 5])
+        self.assertEqual(resultado['total_ignorados'], 1)
+
+    def test_referencias_que_se_normalizan_igual_no_se_pisan(self):
+        primero = self.pagar('00123', '100.00')
+        segundo = self.pagar('123', '60.00', recibo=self.otro)
+
+        resultado = self.conciliar('2025-01-10;123;100.00', '2025-01-10;0123;60.00')
+
+        self.assertEqual(resultado['total_conciliados'], 2)
+        self.assertEqual((self.estado(primero), self.estado(segundo)), ('Verificado', 'Verificado'))
+
+    def test_varios_pagos_con_igual_referencia_y_monto_quedan_como_discrepancia(self):
+        primero = self.pagar('abc', '100.00')
+        segundo = self.pagar('ABC', '100.00', recibo=self.otro)
+
+        resultado = self.conciliar('2025-01-10;ABC;100.00')
+
+        self.assertEqual(resultado['total_conciliados'], 0)
+        self.assertEqual([pago['pago_id'] for pago in resultado['discrepancias'][0]['pagos']], [primero.id, segundo.id])
+        self.assertEqual((self.estado(primero), self.estado(segundo)), ('Por Verificar', 'Por Verificar'))
+
+    def test_pago_verificado_durante_la_conciliacion_no_se_cuenta(self):
+        pago = self.pagar('777', '100.00')
+        verificar = conciliacion_service.verificar_pagos_en_lote
+
+        def verificado_antes(pago_ids):
+            Pagos.objects.filter(pk=pago.pk).update(estado_verificacion='Verificado')
+            return verificar(pago_ids)
+
+        with mock.patch.object(conciliacion_service, 'verificar_pagos_en_lote', side_effect=verificado_antes):
+            resultado = self.conciliar('2025-01-10;777;100.00')
+
+        self.assertEqual(resultado['total_conciliados'], 0)
+        self.assertEqual(resultado['no_conciliados'][0]['motivo'], f'Pago {pago.id}: Ya verificado')
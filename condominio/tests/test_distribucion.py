@@ -0,0 +1,61 @@
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+from django.test import SimpleTestCase
+from condominio.distribucion_service import (
+    a_centimos, repartir_cargos, repartir_centimos, repartir_partes_iguales
+)
+
+
+class RepartirCentimosTests(SimpleTestCase):
+    """Método del mayor resto: las partes suman exactamente el monto"""
+
+    def test_suma_exacta_con_pesos_aleatorios(self):
+        azar = random.Random(2025)
+        for _ in range(500):
+            centimos = azar.randint(0, 10 ** 9)
+            pesos = [azar.randint(0, 10 ** 6) for _ in range(azar.randint(1, 60))]
+            partes = repartir_centimos(centimos, pesos)
+            self.assertEqual(sum(partes), centimos if sum(pesos) else 0)
+            # Ninguna parte se aleja más de un céntimo de su cuota exacta
+            for parte, peso in zip(partes, pesos):
+                self.assertLess(abs(parte * sum(pesos) - centimos * peso), sum(pesos))
+
+    def test_sobrante_va_al_mayor_resto_y_en_empate_a_la_primera(self):
+        self.assertEqual(repartir_centimos(100, [1, 1, 1]), [34, 33, 33])
+        self.assertEqual(repartir_centimos(10, [3, 3, 4]), [3, 3, 4])
+        self.assertEqual(repartir_centimos(1, [1, 2]), [0, 1])
+
+    def test_sin_pesos_no_reparte_nada(self):
+        self.assertEqual(repartir_centimos(100, [0, 0]), [0, 0])
+        self.assertEqual(repartir_centimos(100, []), [])
+
+    def test_partes_iguales(self):
+        self.assertEqual(repartir_partes_iguales(100, 3), [34, 33, 33])
+        self.assertEqual(repartir_partes_iguales(5, 0), [])
+
+    def test_a_centimos_redondea(self):
+        self.assertEqual(a_centimos(Decimal('333.335')), 33334)
+        self.assertEqual(a_centimos(Decimal('10')), 1000)
+
+
+class RepartirCargosTests(SimpleTestCase):
+
+    def setUp(self):
+        alicuotas = ['0.142857', '0.142857', '0.142857', '0.142857', '0.142857', '0.142857', '0.142858']
+        self.inmuebles = [
+            SimpleNamespace(id=indice + 1, edificio_id=1 if indice < 4 else 2, alicuota=Decimal(alicuota))
+            for indice, alicuota in enumerate(alicuotas)
+        ]
+
+    def test_cada_cargo_suma_su_monto(self):
+        cargos = repartir_cargos([
+            {'monto': Decimal('1000.00'), 'tipo_calculo': 'Comun', 'edificios': None},
+            {'monto': Decimal('333.33'), 'tipo_calculo': 'Comun', 'edificios': [2]},
+            {'monto': Decimal('100.00'), 'tipo_calculo': 'No_Comun', 'edificios': [1]},
+        ], self.inmuebles)
+
+        for cargo in cargos:
+            self.assertEqual(sum(cargo['reparto'].values()), cargo['monto'])
+        self.assertEqual(set(cargos[1]['reparto']), {5, 6, 7})
+        self.assertEqual(set(cargos[2]['reparto'].values()), {Decimal('25.00')})
@@ -0,0 +1,187 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.db import IntegrityError
+from django.db.models import Sum
+from django.test import TestCase
+from condominio import services
+from condominio.models import (
+    Corrida_Facturacion, Creditos_Propietario, Gastos_del_Mes, Inmueble, Pagos, Recibos, Secuencia_Recibos
+)
+from condominio.services import aplicar_facturacion, facturar_mes, verificar_pagos_en_lote
+from .datos import crear_condominio
+
+
+class NumeracionRecibosTests(TestCase):
+    """Secuencia_Recibos entrega números consecutivos sin huecos ni repetidos"""
+
+    def setUp(self):
+        crear_condominio()
+
+    def crear_recibo(self, inmueble, **campos):
+        return Recibos.objects.create(
+            id_inmueble=inmueble, fecha_emision=date(2025, 1, 1),
+            monto_total_pagar=Decimal('1'), saldo_pendiente=Decimal('1'), **campos
+        )
+
+    def test_reserva_bloques_consecutivos_por_mes(self):
+        self.assertEqual(Secuencia_Recibos.reservar('202501', 3), 1)
+        self.assertEqual(Secuencia_Recibos.reservar('202501', 2), 4)
+        self.assertEqual(Secuencia_Recibos.reservar('202502'), 1)
+        self.assertEqual(Secuencia_Recibos.objects.get(prefijo='202501').ultimo_numero, 5)
+
+    def test_sin_secuencia_continua_despues_del_mayor_emitido(self):
+        primero, segundo, tercero, cuarto = Inmueble.objects.all()[:4]
+        self.crear_recibo(primero, numero_recibo='202501-0007')
+        # Números editados a mano que no siguen el formato no se tienen en cuenta
+        self.crear_recibo(segundo, numero_recibo='202501-A1')
+        self.crear_recibo(tercero, numero_recibo='202501-0009-B')
+        Secuencia_Recibos.objects.all().delete()
+
+        self.assertEqual(self.crear_recibo(cuarto).numero_recibo, '202501-0008')
+
+    def test_recibo_rechazado_no_consume_numero(self):
+        primero, segundo = Inmueble.objects.all()[:2]
+        self.assertEqual(self.crear_recibo(primero).numero_recibo, '202501-0001')
+
+        # Segundo recibo del mismo inmueble y período
+        with self.assertRaises(IntegrityError):
+            self.crear_recibo(primero)
+
+        self.assertEqual(self.crear_recibo(segundo).numero_recibo, '202501-0002')
+
+    def test_facturacion_numera_sin_huecos_y_continua_la_secuencia(self):
+        recibos = facturar_mes(date(2025, 1, 1), lote=2)
+
+        numeros = sorted(recibo.numero_recibo for recibo in recibos)
+        self.assertEqual(numeros, [f'202501-{numero:04d}' for numero in range(1, Inmueble.objects.count() + 1)])
+        # Un recibo manual posterior toma el número siguiente
+        existente = Inmueble.objects.first()
+        nuevo = Inmueble.objects.create(
+            propietario=existente.propietario, edificio=existente.edificio,
+            piso='9', apartamento='9A', alicuota=Decimal('0')
+        )
+        self.assertEqual(self.crear_recibo(nuevo).numero_recibo, f'202501-{len(numeros) + 1:04d}')
+
+
+class AplicarFacturacionTests(TestCase):
+    """Recalcular un mes facturado corrige los montos sin perder los pagos"""
+
+    def setUp(self):
+        crear_condominio(edificios=1, por_edificio=2)
+        self.fecha = date(2025, 1, 1)
+        self.pagado, self.sin_pagos = facturar_mes(self.fecha)
+        pago = Pagos.objects.create(
+            id_recibo=self.pagado, fecha_pago=date(2025, 1, 10), monto_pagado=Decimal('300.00'),
+            referencia_bancaria='REF-1'
+        )
+        verificar_pagos_en_lote([pago.id])
+        self.pagado.refresh_from_db()
+
+    def test_aumento_conserva_pagos_y_ajusta_el_saldo_por_la_diferencia(self):
+        total = self.pagado.monto_total_pagar
+        Gastos_del_Mes.objects.filter(id_concepto__descripcion='Nómina').update(monto_base=Decimal('1200.00'))
+
+        resultado = aplicar_facturacion(self.fecha)
+
+        recibo = Recibos.objects.get(pk=self.pagado.pk)
+        self.assertEqual(resultado['actualizados'], 2)
+        self.assertEqual(recibo.numero_recibo, self.pagado.numero_recibo)
+        self.assertEqual(recibo.monto_total_pagar, total + Decimal('100.00'))
+        self.assertEqual(recibo.saldo_pendiente, self.pagado.saldo_pendiente + Decimal('100.00'))
+        self.assertEqual(recibo.pagos.get().estado_verificacion, 'Verificado')
+
+    def test_recibo_en_cero_con_pagos_se_conserva_y_el_excedente_pasa_a_credito(self):
+        Gastos_del_Mes.objects.update(estado='Inactivo')
+
+        resultado = aplicar_facturacion(self.fecha)
+
+        self.assertEqual(resultado['eliminados'], 1)
+        self.assertFalse(Recibos.objects.filter(pk=self.sin_pagos.pk).exists())
+        recibo = Recibos.objects.get(pk=self.pagado.pk)
+        self.assertEqual((recibo.monto_total_pagar, recibo.saldo_pendiente, recibo.estado), (0, 0, 'Pagado'))
+        self.assertEqual(recibo.pagos.count(), 1)
+        self.assertEqual(resultado['credito_generado'], Decimal('300.00'))
+        self.assertEqual(Creditos_Propietario.objects.get().saldo_credito, Decimal('300.00'))
+
+
+class CorridaFacturacionTests(TestCase):
+    """facturar_mes se puede repetir sin duplicar y reanuda una corrida interrumpida"""
+
+    def setUp(self):
+        crear_condominio(edificios=2, por_edificio=3)
+        self.fecha = date(2025, 1, 1)
+
+    def test_repetir_el_mes_facturado_no_crea_nada(self):
+        facturar_mes(self.fecha)
+        recibos = list(Recibos.objects.values_list('numero_recibo', 'monto_total_pagar').order_by('id'))
+
+        self.assertEqual(facturar_mes(self.fecha), [])
+
+        self.assertEqual(list(Recibos.objects.values_list('numero_recibo', 'monto_total_pagar').order_by('id')), recibos)
+        self.assertEqual(Secuencia_Recibos.objects.get().ultimo_numero, len(recibos))
+
+    def test_reanuda_desde_el_ultimo_lote_guardado(self):
+        persistir = services.persistir_facturacion
+        llamadas = []
+
+        def falla_en_el_segundo_lote(*args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise RuntimeError('Conexión perdida')
+            return persistir(*args, **kwargs)
+
+        with mock.patch.object(services, 'persistir_facturacion', side_effect=falla_en_el_segundo_lote):
+            with self.assertRaises(RuntimeError):
+                facturar_mes(self.fecha, lote=2)
+
+        corrida = Corrida_Facturacion.objects.get()
+        self.assertEqual((corrida.estado, corrida.procesados, corrida.error), ('Fallida', 2, 'Conexión perdida'))
+        self.assertEqual(Recibos.objects.count(), 2)
+
+        recibos = facturar_mes(self.fecha, lote=2)
+
+        corrida.refresh_from_db()
+        self.assertEqual(len(recibos), 4)
+        self.assertEqual(Corrida_Facturacion.objects.count(), 1)
+        self.assertEqual((corrida.estado, corrida.procesados, corrida.recibos_creados), ('Completada', 6, 6))
+        self.assertEqual(
+            sorted(Recibos.objects.values_list('numero_recibo', flat=True)),
+            [f'202501-{numero:04d}' for numero in range(1, 7)]
+        )
+        # Los cargos del mes se reparten completos aunque la corrida se haya partido
+        self.assertEqual(Recibos.objects.aggregate(total=Sum('monto_cargos_mes'))['total'], Decimal('1433.33'))
+
+
+class RecibosApiTests(TestCase):
+    """La API responde 400, y no 500, a un segundo recibo del inmueble en el mismo mes"""
+
+    def setUp(self):
+        crear_condominio(edificios=1, por_edificio=2)
+        self.recibo, self.otro = facturar_mes(date(2025, 1, 1))
+
+    def test_crear_recibo_duplicado_del_periodo(self):
+        datos = {'fecha_emision': '2025-01-20', 'monto_total_pagar': '10.00', 'saldo_pendiente': '10.00'}
+
+        respuesta = self.client.post(
+            '/api/recibos/', {**datos, 'inmueble': self.recibo.id_inmueble_id}, content_type='application/json'
+        )
+
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Secuencia_Recibos.objects.get().ultimo_numero, 2)
+
+        respuesta = self.client.post(
+            '/api/recibos/', {**datos, 'inmueble': self.recibo.id_inmueble_id, 'fecha_emision': '2025-02-01'},
+            content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['id_inmueble']['id'], self.recibo.id_inmueble_id)
+
+    def test_mover_recibo_a_un_mes_ya_facturado(self):
+        facturar_mes(date(2025, 2, 1))
+
+        respuesta = self.client.patch(
+            f'/api/recibos/{self.recibo.id}/', {'fecha_emision': '2025-02-10'}, content_type='application/json'
+        )
+
+        self.assertEqual(respuesta.status_code, 400)
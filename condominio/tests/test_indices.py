@@ -0,0 +1,23 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase
+from condominio.management.commands.verificar_indices import Command
+
+
+@skipUnless(connection.vendor == 'postgresql', 'El plan de consultas se verifica solo en PostgreSQL')
+class IndicesConsultasTests(TestCase):
+    """Las consultas frecuentes deben poder resolverse con sus índices (EXPLAIN)"""
+
+    def test_consultas_frecuentes_usan_sus_indices(self):
+        with connection.cursor() as cursor:
+            # Con tablas vacías el planificador prefiere un seq scan; se desactiva
+            # para comprobar que existe un índice utilizable para cada consulta
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+        for nombre, queryset, indices, motores in Command().consultas():
+            with self.subTest(nombre):
+                plan = queryset.explain()
+                self.assertTrue(
+                    any(indice in plan for indice in indices),
+                    f'{nombre} no usa {", ".join(indices)}:\n{plan}'
+                )
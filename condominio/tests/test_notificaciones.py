@@ -0,0 +1,128 @@
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from condominio.models import Configuracion_Recibos, Notificacion, Propietario
+from condominio.notificaciones_service import drenar_notificaciones
+from condominio.whatsapp_service import whatsapp_service
+
+
+class _ServidorStub:
+    """API de WhatsApp local: responde a cada POST con el siguiente código de `respuestas`"""
+
+    def __init__(self):
+        self.respuestas = []
+        self.recibidos = []
+        stub = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers['Content-Length']))
+                stub.recibidos.append((self.path, json.loads(cuerpo)))
+                codigo = stub.respuestas.pop(0) if stub.respuestas else 200
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = f'http://127.0.0.1:{self.servidor.server_address[1]}'
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class DespachoWhatsAppTests(TestCase):
+    """El envío real (HTTP) contra un servidor local en lugar de la API de Meta"""
+
+    def setUp(self):
+        self.stub = _ServidorStub()
+        self.addCleanup(self.stub.cerrar)
+        parche = mock.patch.object(whatsapp_service, 'api_url', self.stub.url)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+        Configuracion_Recibos.objects.create(whatsapp_activo=True, whatsapp_token='TOKEN', whatsapp_phone_id='123')
+        self.propietario = Propietario.objects.create(
+            nombre='Ana', apellido='Pérez', cedula='V1', telefono='04141234567', email='ana@example.com'
+        )
+        self.notificacion = Notificacion.objects.create(
+            clave='nuevo_recibo:1:202501-0001', tipo='nuevo_recibo', propietario=self.propietario,
+            periodo='2025-01', datos={'monto': '10.00'}
+        )
+
+    def drenar(self):
+        resultados = list(drenar_notificaciones())
+        self.notificacion.refresh_from_db()
+        return resultados
+
+    def test_envio_exitoso(self):
+        resultados = self.drenar()
+
+        self.assertEqual([(enviada, error) for _, enviada, error in resultados], [(True, None)])
+        self.assertEqual(self.notificacion.estado, 'Enviada')
+        self.assertEqual(self.notificacion.intentos, 1)
+        ruta, cuerpo = self.stub.recibidos[0]
+        self.assertEqual(ruta, '/123/messages')
+        self.assertEqual(cuerpo['to'], '584141234567')
+
+    def test_error_del_servidor_se_reintenta_con_espera(self):
+        self.stub.respuestas = [500]
+        antes = timezone.now()
+
+        resultados = self.drenar()
+
+        self.assertFalse(resultados[0][1])
+        self.assertEqual(self.notificacion.estado, 'Pendiente')
+        self.assertEqual(self.notificacion.intentos, 1)
+        self.assertGreaterEqual(self.notificacion.proximo_intento, antes + timedelta(minutes=1))
+        # Antes de su turno no se vuelve a enviar
+        self.assertEqual(self.drenar(), [])
+        self.assertEqual(len(self.stub.recibidos), 1)
+
+    def test_se_descarta_al_agotar_los_intentos(self):
+        self.stub.respuestas = [503] * Notificacion.MAX_INTENTOS
+
+        for _ in range(Notificacion.MAX_INTENTOS):
+            Notificacion.objects.filter(pk=self.notificacion.pk).update(proximo_intento=timezone.now())
+            self.drenar()
+
+        self.assertEqual(self.notificacion.estado, 'Fallida')
+        self.assertEqual(self.notificacion.intentos, Notificacion.MAX_INTENTOS)
+        Notificacion.objects.filter(pk=self.notificacion.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(self.drenar(), [])
+        self.assertEqual(len(self.stub.recibidos), Notificacion.MAX_INTENTOS)
+
+    def test_rechazo_del_cliente_se_descarta_sin_reintentar(self):
+        self.stub.respuestas = [400]
+
+        resultados = self.drenar()
+
+        self.assertFalse(resultados[0][1])
+        self.assertIn('400', resultados[0][2])
+        self.assertEqual(self.notificacion.estado, 'Fallida')
+        self.assertEqual(self.notificacion.intentos, 1)
+
+    def test_limite_de_tasa_se_reintenta(self):
+        self.stub.respuestas = [429]
+
+        self.drenar()
+
+        self.assertEqual(self.notificacion.estado, 'Pendiente')
+
+    def test_propietario_sin_telefono_se_descarta_sin_enviar(self):
+        Propietario.objects.filter(pk=self.propietario.pk).update(telefono='')
+
+        self.drenar()
+
+        self.assertEqual(self.notificacion.estado, 'Fallida')
+        self.assertEqual(self.notificacion.ultimo_error, 'Propietario sin teléfono')
+        self.assertEqual(self.stub.recibidos, [])
@@ -0,0 +1,54 @@
+from datetime import date
+from decimal import Decimal
+from django.test import TestCase
+from condominio.models import Pagos, Recibos, Saldo_Inmueble
+from condominio.services import facturar_mes, verificar_pagos_en_lote
+from .datos import crear_condominio
+
+
+class VerificarPagosEnLoteTests(TestCase):
+    """Los pagos del mismo recibo verificados juntos se acumulan sobre su saldo"""
+
+    def setUp(self):
+        crear_condominio(edificios=1, por_edificio=2)
+        self.recibo, self.otro = facturar_mes(date(2025, 1, 1))
+
+    def pagar(self, recibo, monto, referencia, **campos):
+        return Pagos.objects.create(
+            id_recibo=recibo, fecha_pago=date(2025, 1, 10), monto_pagado=Decimal(monto),
+            referencia_bancaria=referencia, **campos
+        )
+
+    def test_pagos_del_mismo_recibo_se_acumulan(self):
+        total = self.recibo.saldo_pendiente
+        primero = self.pagar(self.recibo, '100.00', 'REF-1')
+        segundo = self.pagar(self.recibo, total - Decimal('100.00'), 'REF-2')
+        parcial = self.pagar(self.otro, '50.00', 'REF-3')
+
+        resultados = verificar_pagos_en_lote([primero.id, segundo.id, parcial.id, primero.id])
+
+        self.assertEqual([resultado['resultado'] for resultado in resultados], ['Verificado'] * 3)
+        # Cada resultado informa el saldo final del recibo, con todo el lote aplicado
+        self.assertEqual({resultado['saldo_pendiente'] for resultado in resultados[:2]}, {Decimal('0')})
+        self.recibo.refresh_from_db()
+        self.otro.refresh_from_db()
+        self.assertEqual((self.recibo.saldo_pendiente, self.recibo.estado), (Decimal('0'), 'Pagado'))
+        self.assertEqual(self.otro.saldo_pendiente, self.otro.monto_total_pagar - Decimal('50.00'))
+        self.assertEqual(Pagos.objects.filter(estado_verificacion='Verificado').count(), 3)
+        self.assertEqual(Saldo_Inmueble.objects.get(inmueble_id=self.recibo.id_inmueble_id).recibos_pendientes, 0)
+
+    def test_ya_verificados_e_inexistentes_no_descuentan(self):
+        verificado = self.pagar(self.recibo, '100.00', 'REF-1', estado_verificacion='Verificado')
+
+        resultados = verificar_pagos_en_lote([verificado.id, 999999])
+
+        self.assertEqual([resultado['resultado'] for resultado in resultados], ['Ya verificado', 'No encontrado'])
+        self.assertEqual(Recibos.objects.get(pk=self.recibo.pk).saldo_pendiente, self.recibo.saldo_pendiente)
+
+    def test_pago_mayor_al_saldo_no_lo_deja_negativo(self):
+        pago = self.pagar(self.otro, self.otro.saldo_pendiente + Decimal('10.00'), 'REF-1')
+
+        verificar_pagos_en_lote([pago.id])
+
+        self.otro.refresh_from_db()
+        self.assertEqual((self.otro.saldo_pendiente, self.otro.estado), (Decimal('0'), 'Pagado'))
@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.test import RequestFactory, TestCase, override_settings
+from condominio import pdf_service
+from condominio.models import (
+    Conceptos_Gasto, Edificio, Gastos_del_Mes, Inmueble, Propietario, Recibos, Tipos_Gasto
+)
+from condominio.services import facturar_mes
+
+
+class RespuestaPdfTests(TestCase):
+    """El PDF del recibo se revalida con ETag sin volver a generarlo"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        tipo = Tipos_Gasto.objects.create(nombre='Común', descripcion='', tipo_calculo='Comun')
+        Gastos_del_Mes.objects.create(
+            id_concepto=Conceptos_Gasto.objects.create(descripcion='Nómina', id_tipo_gasto=tipo),
+            monto_base=Decimal('100.00'), es_recurrente=True
+        )
+        propietario = Propietario.objects.create(
+            nombre='Ana', apellido='Pérez', cedula='V1', telefono='04141234567', email='ana@example.com'
+        )
+        Inmueble.objects.create(
+            propietario=propietario, edificio=Edificio.objects.create(numero_edificio='1'),
+            piso='1', apartamento='1A', alicuota=Decimal('1')
+        )
+        facturar_mes(date(2025, 1, 1))
+        self.factory = RequestFactory()
+
+    def descargar(self, **cabeceras):
+        recibo = Recibos.objects.get()
+        return pdf_service.crear_respuesta_pdf(recibo, self.factory.get('/', headers=cabeceras))
+
+    def test_etag_vigente_responde_304_sin_generar_el_pdf(self):
+        with mock.patch.object(pdf_service, 'generar_pdf_recibo', wraps=pdf_service.generar_pdf_recibo) as generar:
+            primera = self.descargar()
+            self.assertEqual(primera.status_code, 200)
+            self.assertEqual(generar.call_count, 1)
+
+            # La revalidación no consulta el storage ni vuelve a generar el PDF
+            with mock.patch.object(pdf_service, 'obtener_pdf_recibo', side_effect=AssertionError):
+                segunda = self.descargar(if_none_match=primera['ETag'])
+
+        self.assertEqual(segunda.status_code, 304)
+        self.assertEqual(segunda['ETag'], primera['ETag'])
+        self.assertEqual(generar.call_count, 1)
+
+    def test_recibo_modificado_cambia_el_etag(self):
+        etag = self.descargar()['ETag']
+        Recibos.objects.update(saldo_pendiente=Decimal('0'))
+
+        respuesta = self.descargar(if_none_match=etag)
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
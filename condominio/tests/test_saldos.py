@@ -0,0 +1,41 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase
+from condominio.models import Recibos, Saldo_Inmueble
+from condominio.services import facturar_mes
+from .datos import crear_condominio
+
+
+class SaldoInmuebleTests(TestCase):
+    """Saldo_Inmueble sigue a los recibos también en borrados y actualizaciones masivas"""
+
+    def setUp(self):
+        crear_condominio(edificios=1, por_edificio=2)
+        self.recibo, self.otro = facturar_mes(date(2025, 1, 1))
+
+    def saldo(self, recibo):
+        saldo = Saldo_Inmueble.objects.get(inmueble_id=recibo.id_inmueble_id)
+        return saldo.recibos_pendientes, saldo.total_deuda
+
+    def test_borrado_masivo_recalcula(self):
+        Recibos.objects.filter(pk=self.recibo.pk).delete()
+
+        self.assertEqual(self.saldo(self.recibo), (0, Decimal('0')))
+        self.assertEqual(self.saldo(self.otro), (1, self.otro.saldo_pendiente))
+
+    def test_actualizacion_masiva_del_saldo_recalcula(self):
+        Recibos.objects.filter(pk=self.recibo.pk).update(saldo_pendiente=Decimal('12.50'))
+
+        self.assertEqual(self.saldo(self.recibo), (1, Decimal('12.50')))
+
+    def test_accion_borrar_del_admin_recalcula(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+        respuesta = self.client.post('/admin/condominio/recibos/', {
+            'action': 'delete_selected', '_selected_action': [self.recibo.pk], 'post': 'yes'
+        })
+
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertFalse(Recibos.objects.filter(pk=self.recibo.pk).exists())
+        self.assertEqual(self.saldo(self.recibo), (0, Decimal('0')))
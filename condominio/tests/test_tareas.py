@@ -0,0 +1,29 @@
+from unittest import mock
+from django.test import TestCase
+from condominio.models import Tarea
+
+
+class EncolarTareaTests(TestCase):
+    """Tarea.encolar deja una sola tarea activa por tipo y período"""
+
+    def test_devuelve_la_tarea_activa(self):
+        activa, creada = Tarea.encolar('pdf_lote', '2025-01')
+
+        self.assertEqual(Tarea.encolar('pdf_lote', '2025-01'), (activa, False))
+        self.assertTrue(creada)
+
+    def test_tarea_activa_que_termina_durante_el_encolado(self):
+        activa, _ = Tarea.encolar('pdf_lote', '2025-01')
+        get = Tarea.objects.get
+
+        def termina_antes_de_consultar(**filtros):
+            # La tarea activa termina entre el INSERT rechazado y la consulta
+            Tarea.objects.filter(pk=activa.pk).update(estado='Completada')
+            return get(**filtros)
+
+        with mock.patch.object(Tarea.objects, 'get', side_effect=termina_antes_de_consultar):
+            nueva, creada = Tarea.encolar('pdf_lote', '2025-01')
+
+        self.assertTrue(creada)
+        self.assertNotEqual(nueva.pk, activa.pk)
+        self.assertEqual(Tarea.objects.filter(estado__in=Tarea.ESTADOS_ACTIVOS).get(), nueva)
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     PropietarioViewSet, EdificioViewSet, InmuebleViewSet, RecibosViewSet, PagosViewSet,
     Tipos_GastoViewSet, Conceptos_GastoViewSet, Gastos_del_MesViewSet, Movimientos_GastosViewSet,
-    Tasa_CambioViewSet, Configuracion_RecibosViewSet, ReportesViewSet, LoginView, user_info, test_connection
+    Tasa_CambioViewSet, Configuracion_RecibosViewSet, ReportesViewSet, TareasViewSet, LoginView, user_info, test_connection
 )
 
 router = DefaultRouter()
@@ -19,6 +19,7 @@ router.register(r'movimientos-gastos', Movimientos_GastosViewSet)
 router.register(r'tasas-cambio', Tasa_CambioViewSet)
 router.register(r'configuracion-recibos', Configuracion_RecibosViewSet)
 router.register(r'reportes', ReportesViewSet, basename='reportes')
+router.register(r'jobs', TareasViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,9 +1,12 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.db.models import Prefetch
 from django.db.models.functions import TruncMonth
 from django.views.decorators.csrf import csrf_exempt
 import json
@@ -11,16 +14,40 @@ from datetime import datetime, timezone, timedelta
 from .models import (
     Propietario, Edificio, Inmueble, Pagos, Recibos,
     Tipos_Gasto, Conceptos_Gasto, Gastos_del_Mes, Movimientos_Gastos, Tasa_Cambio, Configuracion_Recibos,
-    Historial_Pagos, Creditos_Propietario
+    Historial_Pagos, Creditos_Propietario, Tarea, rango_periodo
 )
 from .serializers import (
-    PropietarioSerializer, EdificioSerializer, InmuebleSerializer, InmuebleCreateSerializer, PagosSerializer, RecibosSerializer,
+    PropietarioSerializer, EdificioSerializer, InmuebleSerializer, InmuebleCreateSerializer, PagosSerializer, PagosResumenSerializer, RecibosSerializer,
     Tipos_GastoSerializer, Conceptos_GastoSerializer, Conceptos_GastoCreateSerializer, 
     Gastos_del_MesSerializer, Gastos_del_MesCreateSerializer,
     Movimientos_GastosSerializer, Movimientos_GastosCreateSerializer,
-    Tasa_CambioSerializer, Configuracion_RecibosSerializer
+    Tasa_CambioSerializer, Configuracion_RecibosSerializer, TareaSerializer
 )
-from .services import procesar_pago
+from .services import (
+    procesar_pago, aplicar_pago_propietario, verificar_pagos_en_lote, previsualizar_facturacion, resumir_cambios,
+    recalcular_gasto, recalcular_movimiento, CAMPOS_MONTO_GASTO
+)
+from .conciliacion_service import leer_estado_cuenta, conciliar_estado_cuenta
+
+
+def encolar_tarea(tipo, periodo, **parametros):
+    """Encola la tarea y responde 202 con su id (o el de la misma tarea ya activa).
+
+    Si para el período ya hay activa una tarea del mismo tipo con otros
+    parámetros (p. ej. generar mientras se pide actualizar) responde 409.
+    """
+    tarea, creada = Tarea.encolar(tipo, periodo, **parametros)
+    if creada:
+        message = 'Tarea en cola; consulte su avance en /api/jobs/{}/'.format(tarea.id)
+    elif tarea.parametros != parametros:
+        return Response({
+            'error': 'Ya hay otra tarea en curso para este período; espere a que termine',
+            'job_id': tarea.id,
+            'estado': tarea.estado,
+        }, status=status.HTTP_409_CONFLICT)
+    else:
+        message = 'Ya hay una tarea en curso para este período'
+    return Response({'message': message, 'job_id': tarea.id, 'estado': tarea.estado}, status=status.HTTP_202_ACCEPTED)
 
 
 class PropietarioViewSet(viewsets.ModelViewSet):
@@ -44,6 +71,37 @@ class InmuebleViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'partial_update']:
             return InmuebleCreateSerializer
         return InmuebleSerializer
+    
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Importar desde CSV propietarios, edificios e inmuebles (una fila por inmueble)"""
+        from .importacion_service import leer_filas, importar_inmuebles
+        
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'El archivo CSV es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            resultado = importar_inmuebles(
+                leer_filas(archivo),
+                solo_validar=str(request.data.get('solo_validar', '')).lower() in ['1', 'true'],
+                validar_alicuotas=str(request.data.get('validar_alicuotas', 'true')).lower() in ['1', 'true']
+            )
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if resultado['errores']:
+            return Response({
+                'error': f"{resultado['total_errores']} filas con errores; no se importó nada",
+                **resultado
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        inmuebles = resultado['inmuebles']
+        accion = 'importados' if resultado['importado'] else 'validados'
+        return Response({
+            'message': f"{inmuebles['creados'] + inmuebles['actualizados']} inmuebles {accion}",
+            **resultado
+        })
 
 
 class RecibosViewSet(viewsets.ModelViewSet):
@@ -52,7 +110,9 @@ class RecibosViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        return self.filtrar(super().get_queryset().para_listado())
+
+    def filtrar(self, queryset):
         mes = self.request.query_params.get('mes')
         numero_recibo = self.request.query_params.get('numero_recibo')
         propietario = self.request.query_params.get('propietario')
@@ -60,7 +120,7 @@ class RecibosViewSet(viewsets.ModelViewSet):
         saldo_pendiente_gt = self.request.query_params.get('saldo_pendiente__gt')
         
         if mes:
-            queryset = queryset.filter(fecha_emision__startswith=mes)
+            queryset = queryset.del_periodo(mes)
         if numero_recibo:
             queryset = queryset.filter(numero_recibo__icontains=numero_recibo)
         if propietario:
@@ -72,19 +132,49 @@ class RecibosViewSet(viewsets.ModelViewSet):
             
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Descargar en CSV los recibos con los mismos filtros del listado"""
+        from .exportacion_service import respuesta_csv, COLUMNAS_RECIBOS
+        queryset = self.filtrar(Recibos.objects.order_by('-fecha_emision', 'numero_recibo'))
+        return respuesta_csv(queryset, COLUMNAS_RECIBOS, 'recibos')
+
     @action(detail=True, methods=['get'])
     def pdf(self, request, pk=None):
         """Generar PDF del recibo"""
         from .pdf_service import crear_respuesta_pdf
         recibo = self.get_object()
-        return crear_respuesta_pdf(recibo)
+        return crear_respuesta_pdf(recibo, request)
+    
+    @action(detail=False, methods=['get', 'post'])
+    def pdf_lote(self, request):
+        """Generar (POST) o descargar (GET) el ZIP con los PDFs de un mes"""
+        from django.core.files.storage import default_storage
+        from django.http import FileResponse
+        from .pdf_service import nombre_lote
+        
+        mes = request.data.get('mes') if request.method == 'POST' else request.query_params.get('mes')
+        if not mes or not rango_periodo(mes):
+            return Response({'error': 'mes es requerido (YYYY-MM)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if request.method == 'POST':
+            return encolar_tarea('pdf_lote', mes)
+        
+        tarea = Tarea.objects.filter(tipo='pdf_lote', periodo=mes, estado__in=Tarea.ESTADOS_ACTIVOS).first()
+        if tarea:
+            return Response({'estado': tarea.estado, 'job_id': tarea.id}, status=status.HTTP_202_ACCEPTED)
+        if not default_storage.exists(nombre_lote(mes)):
+            return Response({'error': f'No hay PDFs generados para {mes}'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(
+            default_storage.open(nombre_lote(mes), 'rb'),
+            as_attachment=True,
+            filename=f'recibos_{mes}.zip',
+            content_type='application/zip'
+        )
     
     @action(detail=True, methods=['post'])
     def registrar_pago(self, request, pk=None):
         from decimal import Decimal
-        from datetime import date
-        from django.db import transaction
-        from .models import Historial_Pagos, Creditos_Propietario
         
         recibo = self.get_object()
         monto_pagado = request.data.get('monto_pagado')
@@ -95,113 +185,23 @@ class RecibosViewSet(viewsets.ModelViewSet):
 
         try:
             monto_pagado = Decimal(str(monto_pagado))
-            propietario = recibo.id_inmueble.propietario
+            resultado = aplicar_pago_propietario(recibo, monto_pagado, referencia_bancaria)
             
-            with transaction.atomic():
-                # Verificar si ya existe un pago verificado con esta referencia
-                if Pagos.objects.filter(referencia_bancaria=referencia_bancaria, estado_verificacion='Verificado').exists():
-                    return Response({'error': 'Ya existe un pago verificado con esta referencia bancaria'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Obtener o crear crédito del propietario
-                credito, created = Creditos_Propietario.objects.get_or_create(
-                    propietario=propietario,
-                    defaults={'saldo_credito': Decimal('0')}
-                )
-                
-                # Aplicar crédito existente primero si hay
-                monto_disponible = monto_pagado + credito.saldo_credito
-                credito.saldo_credito = Decimal('0')
-                
-                # Obtener todos los recibos pendientes del propietario ordenados por fecha
-                recibos_pendientes = Recibos.objects.filter(
-                    id_inmueble__propietario=propietario,
-                    saldo_pendiente__gt=0
-                ).order_by('fecha_emision')
-                
-                pagos_aplicados = []
-                monto_restante = monto_disponible
-                
-                # Aplicar pagos a recibos pendientes
-                for recibo_pendiente in recibos_pendientes:
-                    if monto_restante <= 0:
-                        break
-                    
-                    monto_a_aplicar = min(monto_restante, recibo_pendiente.saldo_pendiente)
-                    
-                    # Actualizar saldo del recibo
-                    recibo_pendiente.saldo_pendiente -= monto_a_aplicar
-                    if recibo_pendiente.saldo_pendiente == 0:
-                        recibo_pendiente.estado = 'Pagado'
-                    recibo_pendiente.save()
-                    
-                    # Determinar tipo de transacción
-                    if monto_a_aplicar == recibo_pendiente.saldo_pendiente + monto_a_aplicar:
-                        tipo_transaccion = 'Pago_Completo'
-                    else:
-                        tipo_transaccion = 'Pago_Parcial'
-                    
-                    # Crear historial
-                    Historial_Pagos.objects.create(
-                        id_recibo=recibo_pendiente,
-                        propietario=propietario,
-                        monto_aplicado=monto_a_aplicar,
-                        tipo_transaccion=tipo_transaccion,
-                        referencia_bancaria=referencia_bancaria,
-                        notas=f'Aplicado desde pago de recibo {recibo.numero_recibo}'
-                    )
-                    
-                    pagos_aplicados.append({
-                        'recibo': recibo_pendiente.numero_recibo,
-                        'monto_aplicado': monto_a_aplicar,
-                        'saldo_restante': recibo_pendiente.saldo_pendiente
-                    })
-                    
-                    monto_restante -= monto_a_aplicar
-                
-                # Si queda dinero, guardarlo como crédito
-                if monto_restante > 0:
-                    credito.saldo_credito = monto_restante
-                    
-                    # Crear historial de sobrepago
-                    Historial_Pagos.objects.create(
-                        id_recibo=recibo,
-                        propietario=propietario,
-                        monto_aplicado=monto_pagado,
-                        monto_credito_generado=monto_restante,
-                        tipo_transaccion='Sobrepago',
-                        referencia_bancaria=referencia_bancaria,
-                        notas=f'Sobrepago generó crédito de ${monto_restante}'
-                    )
-                
-                credito.save()
-                
-                # Crear el registro de pago principal
-                pago = Pagos.objects.create(
-                    id_recibo=recibo,
-                    fecha_pago=date.today(),
-                    monto_pagado=monto_pagado,
-                    referencia_bancaria=referencia_bancaria,
-                    metodo_pago='Transferencia',
-                    estado_verificacion='Verificado'
-                )
-                
-                return Response({
-                    'message': 'Pago registrado exitosamente',
-                    'pago_id': pago.id,
-                    'monto_pagado': monto_pagado,
-                    'pagos_aplicados': pagos_aplicados,
-                    'credito_restante': credito.saldo_credito,
-                    'total_aplicado': monto_disponible - monto_restante
-                }, status=status.HTTP_201_CREATED)
+            return Response({
+                'message': 'Pago registrado exitosamente',
+                'pago_id': resultado['pago'].id,
+                'monto_pagado': monto_pagado,
+                'pagos_aplicados': resultado['pagos_aplicados'],
+                'credito_restante': resultado['credito_restante'],
+                'total_aplicado': resultado['total_aplicado']
+            }, status=status.HTTP_201_CREATED)
                 
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['post'])
     def generar_recibos(self, request):
-        from decimal import Decimal
-        from .models import Detalles_Recibo, Gastos_Edificios
-        from datetime import datetime, timedelta
+        from datetime import datetime
         
         mes_aplicacion = request.data.get('mes_aplicacion')
         
@@ -214,90 +214,7 @@ class RecibosViewSet(viewsets.ModelViewSet):
         except ValueError as e:
             return Response({'error': f'mes_aplicacion debe tener formato YYYY-MM-DD. Recibido: {mes_aplicacion}'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            # Convert string date to datetime object
-            from datetime import datetime
-            fecha_emision_obj = datetime.strptime(mes_aplicacion, '%Y-%m-%d').date()
-            
-            inmuebles = Inmueble.objects.all().select_related('propietario', 'edificio')
-            recibos_generados = 0
-            
-            for inmueble in inmuebles:
-                if Recibos.objects.filter(id_inmueble=inmueble, fecha_emision__startswith=mes_aplicacion[:7]).exists():
-                    continue
-                
-                # Gastos fijos mensuales (conceptos activos)
-                gastos_mes = Gastos_del_Mes.objects.filter(estado='Activo').select_related('id_concepto__id_tipo_gasto')
-                
-                monto_cargos_mes = Decimal('0')
-                detalles = []
-                
-                for gasto in gastos_mes:
-                    tipo_gasto = gasto.id_concepto.id_tipo_gasto
-                    monto_calculado = Decimal('0')
-                    
-                    if tipo_gasto.tipo_calculo == 'Comun':
-                        monto_calculado = gasto.monto_base * inmueble.alicuota
-                        if monto_calculado > 0:
-                            detalles.append({
-                                'descripcion': gasto.id_concepto.descripcion,
-                                'monto': monto_calculado,
-                                'tipo': 'Comun'
-                            })
-                    else:
-                        gastos_edificios = Gastos_Edificios.objects.filter(
-                            id_gasto_mes=gasto,
-                            id_edificio=inmueble.edificio
-                        )
-                        
-                        if gastos_edificios.exists():
-                            edificios_ids = Gastos_Edificios.objects.filter(
-                                id_gasto_mes=gasto
-                            ).values_list('id_edificio', flat=True)
-                            
-                            total_apartamentos = Inmueble.objects.filter(
-                                edificio_id__in=edificios_ids
-                            ).count()
-                            
-                            if total_apartamentos > 0:
-                                monto_calculado = gasto.monto_base / total_apartamentos
-                                detalles.append({
-                                    'descripcion': gasto.id_concepto.descripcion,
-                                    'monto': monto_calculado,
-                                    'tipo': 'No_Comun'
-                                })
-                    
-                    monto_cargos_mes += monto_calculado
-                
-                if monto_cargos_mes > 0:
-                    recibo = Recibos.objects.create(
-                        id_inmueble=inmueble,
-                        fecha_emision=fecha_emision_obj,
-                        monto_deuda_anterior=Decimal('0'),
-                        monto_cargos_mes=monto_cargos_mes,
-                        monto_interes_mora=Decimal('0'),
-                        monto_total_pagar=monto_cargos_mes,
-                        saldo_pendiente=monto_cargos_mes
-                    )
-                    
-                    for detalle in detalles:
-                        Detalles_Recibo.objects.create(
-                            id_recibo=recibo,
-                            id_movimiento=None,
-                            descripcion_gasto=detalle['descripcion'],
-                            tipo_gasto=detalle['tipo'],
-                            monto_calculado=detalle['monto']
-                        )
-                    
-                    recibos_generados += 1
-            
-            return Response({
-                'message': f'Se generaron {recibos_generados} recibos exitosamente',
-                'recibos_generados': recibos_generados
-            })
-            
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return encolar_tarea('facturacion', mes_aplicacion[:7], fecha_emision=mes_aplicacion)
     
     @action(detail=False, methods=['post'])
     def actualizar_estados(self, request):
@@ -321,113 +238,42 @@ class RecibosViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def actualizar_recibos(self, request):
-        from decimal import Decimal
-        from .models import Detalles_Recibo, Gastos_Edificios
+        from datetime import datetime
         
         mes_aplicacion = request.data.get('mes_aplicacion')
-        print(f"DEBUG: mes_aplicacion = {mes_aplicacion}")
-        print(f"DEBUG: request.data = {request.data}")
         
         if not mes_aplicacion:
-            print("DEBUG: mes_aplicacion is missing")
             return Response({'error': 'mes_aplicacion es requerido'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Convert string date to datetime object
-            from datetime import datetime
-            fecha_emision_obj = datetime.strptime(mes_aplicacion, '%Y-%m-%d').date()
-            
-            # Eliminar recibos existentes del mes
-            recibos_existentes = Recibos.objects.filter(fecha_emision__startswith=mes_aplicacion[:7])
-            count_eliminados = recibos_existentes.count()
-            print(f"DEBUG: Eliminando {count_eliminados} recibos del mes {mes_aplicacion[:7]}")
-            
-            # Debug: mostrar qué recibos se van a eliminar
-            for recibo in recibos_existentes:
-                propietario_nombre = f"{recibo.id_inmueble.propietario.nombre} {recibo.id_inmueble.propietario.apellido}"
-                print(f"DEBUG: Eliminando recibo {recibo.id} - {propietario_nombre} - Monto: {recibo.monto_total_pagar}")
-            
-            recibos_existentes.delete()
-            
-            # Generar nuevos recibos
-            inmuebles = Inmueble.objects.all().select_related('propietario', 'edificio')
-            recibos_generados = 0
-            
-            for inmueble in inmuebles:
-                print(f"DEBUG: Procesando inmueble {inmueble.id} - Alícuota: {inmueble.alicuota}")
-                gastos_mes = Gastos_del_Mes.objects.filter(estado='Activo').select_related('id_concepto__id_tipo_gasto')
-                
-                monto_cargos_mes = Decimal('0')
-                detalles = []
-                
-                for gasto in gastos_mes:
-                    tipo_gasto = gasto.id_concepto.id_tipo_gasto
-                    monto_calculado = Decimal('0')
-                    
-                    if tipo_gasto.tipo_calculo == 'Comun':
-                        monto_calculado = gasto.monto_base * inmueble.alicuota
-                        print(f"DEBUG: Gasto común {gasto.id_concepto.descripcion}: {gasto.monto_base} * {inmueble.alicuota} = {monto_calculado}")
-                        if monto_calculado > 0:
-                            detalles.append({
-                                'descripcion': gasto.id_concepto.descripcion,
-                                'monto': monto_calculado,
-                                'tipo': 'Comun'
-                            })
-                    else:
-                        gastos_edificios = Gastos_Edificios.objects.filter(
-                            id_gasto_mes=gasto,
-                            id_edificio=inmueble.edificio
-                        )
-                        
-                        if gastos_edificios.exists():
-                            edificios_ids = Gastos_Edificios.objects.filter(
-                                id_gasto_mes=gasto
-                            ).values_list('id_edificio', flat=True)
-                            
-                            total_apartamentos = Inmueble.objects.filter(
-                                edificio_id__in=edificios_ids
-                            ).count()
-                            
-                            if total_apartamentos > 0:
-                                monto_calculado = gasto.monto_base / total_apartamentos
-                                detalles.append({
-                                    'descripcion': gasto.id_concepto.descripcion,
-                                    'monto': monto_calculado,
-                                    'tipo': 'No_Comun'
-                                })
-                    
-                    monto_cargos_mes += monto_calculado
-                
-                if monto_cargos_mes > 0:
-                    recibo = Recibos.objects.create(
-                        id_inmueble=inmueble,
-                        fecha_emision=fecha_emision_obj,
-                        monto_deuda_anterior=Decimal('0'),
-                        monto_cargos_mes=monto_cargos_mes,
-                        monto_interes_mora=Decimal('0'),
-                        monto_total_pagar=monto_cargos_mes,
-                        saldo_pendiente=monto_cargos_mes
-                    )
-                    
-                    for detalle in detalles:
-                        Detalles_Recibo.objects.create(
-                            id_recibo=recibo,
-                            id_movimiento=None,
-                            descripcion_gasto=detalle['descripcion'],
-                            tipo_gasto=detalle['tipo'],
-                            monto_calculado=detalle['monto']
-                        )
-                    
-                    propietario_nombre = f"{inmueble.propietario.nombre} {inmueble.propietario.apellido}"
-                    print(f"DEBUG: Creando recibo {recibo.id} - {propietario_nombre} - Monto: {monto_cargos_mes}")
-                    recibos_generados += 1
-            
+            datetime.strptime(mes_aplicacion, '%Y-%m-%d')
+        except ValueError:
+            return Response({'error': f'mes_aplicacion debe tener formato YYYY-MM-DD. Recibido: {mes_aplicacion}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Corregir solo los recibos del mes que difieren del cálculo actual
+        return encolar_tarea('facturacion', mes_aplicacion[:7], fecha_emision=mes_aplicacion, actualizar=True)
+    
+    @action(detail=False, methods=['get'])
+    def previsualizar(self, request):
+        """Comparar los recibos guardados del mes con los que se generarían ahora, sin escribir nada"""
+        from datetime import datetime
+        
+        mes_aplicacion = request.query_params.get('mes_aplicacion')
+        try:
+            fecha_emision = datetime.strptime(mes_aplicacion or '', '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': f'mes_aplicacion debe tener formato YYYY-MM-DD. Recibido: {mes_aplicacion}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            _, cambios, sin_cambios = previsualizar_facturacion(fecha_emision)
+            resumen = resumir_cambios(cambios)
             return Response({
-                'message': f'Actualizados: eliminados {count_eliminados}, generados {recibos_generados} recibos',
-                'recibos_eliminados': count_eliminados,
-                'recibos_generados': recibos_generados
+                'crear': sum(1 for cambio in resumen if cambio['accion'] == 'crear'),
+                'actualizar': sum(1 for cambio in resumen if cambio['accion'] == 'actualizar'),
+                'eliminar': sum(1 for cambio in resumen if cambio['accion'] == 'eliminar'),
+                'sin_cambios': sin_cambios,
+                'cambios': resumen
             })
-            
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -438,7 +284,15 @@ class PagosViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = self.filtrar(super().get_queryset())
+        if self._vista_compacta():
+            return queryset.select_related('id_recibo__id_inmueble__propietario', 'id_recibo__id_inmueble__edificio')
+        # El recibo completo anidado se carga con detalles y morosidad precalculados
+        return queryset.prefetch_related(
+            Prefetch('id_recibo', queryset=Recibos.objects.para_listado())
+        )
+    
+    def filtrar(self, queryset):
         estado = self.request.query_params.get('estado')
         fecha = self.request.query_params.get('fecha')
         
@@ -446,8 +300,21 @@ class PagosViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(estado_verificacion=estado)
         if fecha:
             queryset = queryset.filter(fecha_pago=fecha)
-            
-        return queryset.select_related('id_recibo__id_inmueble__propietario', 'id_recibo__id_inmueble__edificio')
+        return queryset
+    
+    def _vista_compacta(self):
+        return self.action in ['list', 'retrieve'] and self.request.query_params.get('view') == 'compact'
+    
+    def get_serializer_class(self):
+        if self._vista_compacta():
+            return PagosResumenSerializer
+        return PagosSerializer
+    
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Descargar en CSV los pagos con los mismos filtros del listado"""
+        from .exportacion_service import respuesta_csv, COLUMNAS_PAGOS
+        return respuesta_csv(self.filtrar(Pagos.objects.order_by('id')), COLUMNAS_PAGOS, 'pagos')
     
     @action(detail=True, methods=['post'])
     def verificar(self, request, pk=None):
@@ -503,10 +370,34 @@ class PagosViewSet(viewsets.ModelViewSet):
             return Response({'error': 'IDs son requeridos'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            pagos = Pagos.objects.filter(id__in=ids)
-            pagos.update(estado_verificacion='Verificado')
+            resultados = verificar_pagos_en_lote(ids)
+            verificados = sum(1 for resultado in resultados if resultado['resultado'] == 'Verificado')
+            
+            return Response({
+                'message': f'{verificados} pagos verificados exitosamente',
+                'resultados': resultados
+            })
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'])
+    def conciliar(self, request):
+        archivo = request.FILES.get('archivo')
+        formato = request.data.get('formato')
+        
+        if not archivo:
+            return Response({'error': 'El archivo del estado de cuenta es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+        if formato and formato not in ['csv', 'ofx']:
+            return Response({'error': 'Formato no soportado (csv u ofx)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            movimientos = leer_estado_cuenta(archivo, formato, nombre=archivo.name)
+            resultado = conciliar_estado_cuenta(movimientos)
             
-            return Response({'message': f'{len(ids)} pagos verificados exitosamente'})
+            return Response({
+                'message': f"{resultado['total_conciliados']} pagos conciliados y verificados",
+                **resultado
+            })
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -538,19 +429,48 @@ class Gastos_del_MesViewSet(viewsets.ModelViewSet):
             return Gastos_del_MesCreateSerializer
         return Gastos_del_MesSerializer
     
+    def periodo_a_recalcular(self):
+        """Mes (YYYY-MM) cuyos recibos se deben corregir, solo si se pide con recalcular_periodo.
+
+        El gasto es una plantilla mensual: sin ese parámetro los cambios valen
+        para las próximas facturaciones y no tocan recibos ya emitidos.
+        """
+        periodo = self.request.data.get('recalcular_periodo')
+        if periodo and (len(periodo) != 7 or not rango_periodo(periodo)):
+            raise ValidationError({'recalcular_periodo': 'Debe tener formato YYYY-MM'})
+        return periodo or None
+
+    def update(self, request, *args, **kwargs):
+        self.recalculo = None
+        response = super().update(request, *args, **kwargs)
+        response.data['recalculo'] = self.recalculo
+        return response
+
+    def perform_update(self, serializer):
+        periodo = self.periodo_a_recalcular()
+        anteriores = [getattr(serializer.instance, campo) for campo in CAMPOS_MONTO_GASTO]
+        with transaction.atomic():
+            gasto = serializer.save()
+            # Solo se recalculan las líneas de este gasto en los recibos sin pagos del mes pedido
+            if periodo and anteriores != [getattr(gasto, campo) for campo in CAMPOS_MONTO_GASTO]:
+                self.recalculo = recalcular_gasto(gasto, periodo)
+    
     @action(detail=True, methods=['post'])
     def agregar_edificio(self, request, pk=None):
         from .models import Gastos_Edificios, Edificio
         gasto = self.get_object()
         edificio_id = request.data.get('edificio_id')
+        periodo = self.periodo_a_recalcular()
         
         try:
             edificio = Edificio.objects.get(id=edificio_id)
-            Gastos_Edificios.objects.get_or_create(
-                id_gasto_mes=gasto,
-                id_edificio=edificio
-            )
-            return Response({'message': 'Edificio agregado exitosamente'})
+            with transaction.atomic():
+                _, creado = Gastos_Edificios.objects.get_or_create(
+                    id_gasto_mes=gasto,
+                    id_edificio=edificio
+                )
+                recalculo = recalcular_gasto(gasto, periodo) if periodo and creado else None
+            return Response({'message': 'Edificio agregado exitosamente', 'recalculo': recalculo})
         except Edificio.DoesNotExist:
             return Response({'error': 'Edificio no encontrado'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -561,14 +481,17 @@ class Gastos_del_MesViewSet(viewsets.ModelViewSet):
         from .models import Gastos_Edificios
         gasto = self.get_object()
         edificio_id = request.data.get('edificio_id')
+        periodo = self.periodo_a_recalcular()
         
         try:
             gasto_edificio = Gastos_Edificios.objects.get(
                 id_gasto_mes=gasto,
                 id_edificio_id=edificio_id
             )
-            gasto_edificio.delete()
-            return Response({'message': 'Edificio eliminado exitosamente'})
+            with transaction.atomic():
+                gasto_edificio.delete()
+                recalculo = recalcular_gasto(gasto, periodo) if periodo else None
+            return Response({'message': 'Edificio eliminado exitosamente', 'recalculo': recalculo})
         except Gastos_Edificios.DoesNotExist:
             return Response({'error': 'Relación no encontrada'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -584,6 +507,24 @@ class Movimientos_GastosViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return Movimientos_GastosCreateSerializer
         return Movimientos_GastosSerializer
+    
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            recalcular_movimiento(serializer.save())
+    
+    def perform_update(self, serializer):
+        periodo_anterior = serializer.instance.mes_aplicacion.strftime('%Y-%m')
+        with transaction.atomic():
+            movimiento = serializer.save()
+            if movimiento.mes_aplicacion.strftime('%Y-%m') != periodo_anterior:
+                # Cambió de mes: sus líneas salen de los recibos del mes anterior
+                recalcular_movimiento(movimiento, periodo=periodo_anterior, eliminar=True)
+            recalcular_movimiento(movimiento)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            recalcular_movimiento(instance, eliminar=True)
+            instance.delete()
 
 
 class Tasa_CambioViewSet(viewsets.ModelViewSet):
@@ -600,8 +541,6 @@ class Configuracion_RecibosViewSet(viewsets.ModelViewSet):
     def generar_automatico(self, request):
         """Endpoint para generar recibos automáticamente según configuración"""
         from datetime import date
-        from decimal import Decimal
-        from .models import Movimientos_Gastos, Detalles_Recibo, Gastos_Edificios
         
         try:
             config = Configuracion_Recibos.objects.filter(activo=True).first()
@@ -610,84 +549,9 @@ class Configuracion_RecibosViewSet(viewsets.ModelViewSet):
             
             # Generar para el mes actual
             fecha_actual = date.today()
-            mes_aplicacion = fecha_actual.strftime('%Y-%m-01')
-            
-            inmuebles = Inmueble.objects.all().select_related('propietario', 'edificio')
-            recibos_generados = 0
-            
-            for inmueble in inmuebles:
-                if Recibos.objects.filter(id_inmueble=inmueble, fecha_emision__startswith=mes_aplicacion[:7]).exists():
-                    continue
-                
-                gastos_mes = Gastos_del_Mes.objects.filter(estado='Activo').select_related('id_concepto__id_tipo_gasto')
-                
-                monto_cargos_mes = Decimal('0')
-                detalles = []
-                
-                for gasto in gastos_mes:
-                    tipo_gasto = gasto.id_concepto.id_tipo_gasto
-                    monto_calculado = Decimal('0')
-                    
-                    if tipo_gasto.tipo_calculo == 'Comun':
-                        monto_calculado = gasto.monto_base * inmueble.alicuota
-                        if monto_calculado > 0:
-                            detalles.append({
-                                'descripcion': gasto.id_concepto.descripcion,
-                                'monto': monto_calculado,
-                                'tipo': 'Comun'
-                            })
-                    else:
-                        gastos_edificios = Gastos_Edificios.objects.filter(
-                            id_gasto_mes=gasto,
-                            id_edificio=inmueble.edificio
-                        )
-                        
-                        if gastos_edificios.exists():
-                            edificios_ids = Gastos_Edificios.objects.filter(
-                                id_gasto_mes=gasto
-                            ).values_list('id_edificio', flat=True)
-                            
-                            total_apartamentos = Inmueble.objects.filter(
-                                edificio_id__in=edificios_ids
-                            ).count()
-                            
-                            if total_apartamentos > 0:
-                                monto_calculado = gasto.monto_base / total_apartamentos
-                                detalles.append({
-                                    'descripcion': gasto.id_concepto.descripcion,
-                                    'monto': monto_calculado,
-                                    'tipo': 'No_Comun'
-                                })
-                    
-                    monto_cargos_mes += monto_calculado
-                
-                if monto_cargos_mes > 0:
-                    recibo = Recibos.objects.create(
-                        id_inmueble=inmueble,
-                        fecha_emision=fecha_actual,
-                        monto_deuda_anterior=Decimal('0'),
-                        monto_cargos_mes=monto_cargos_mes,
-                        monto_interes_mora=Decimal('0'),
-                        monto_total_pagar=monto_cargos_mes,
-                        saldo_pendiente=monto_cargos_mes
-                    )
-                    
-                    for detalle in detalles:
-                        Detalles_Recibo.objects.create(
-                            id_recibo=recibo,
-                            id_movimiento=None,
-                            descripcion_gasto=detalle['descripcion'],
-                            tipo_gasto=detalle['tipo'],
-                            monto_calculado=detalle['monto']
-                        )
-                    
-                    recibos_generados += 1
-            
-            return Response({
-                'message': f'Generación automática completada: {recibos_generados} recibos',
-                'recibos_generados': recibos_generados,
-                'fecha_generacion': fecha_actual
-            })
+            return encolar_tarea(
+                'facturacion', fecha_actual.strftime('%Y-%m'), fecha_emision=fecha_actual.isoformat()
+            )
             
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -695,39 +559,38 @@ class Configuracion_RecibosViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def enviar_recordatorios(self, request):
         """Endpoint para enviar recordatorios WhatsApp"""
-        from django.core.management import call_command
-        from io import StringIO
-        import sys
+        from datetime import date
         
         try:
-            # Capturar la salida del comando
-            old_stdout = sys.stdout
-            sys.stdout = buffer = StringIO()
-            
-            # Ejecutar comando de recordatorios
-            call_command('enviar_recordatorios')
-            
-            # Restaurar stdout
-            sys.stdout = old_stdout
-            output = buffer.getvalue()
-            
-            # Extraer número de recordatorios enviados del output
-            lines = output.strip().split('\n')
-            last_line = lines[-1] if lines else ''
-            
-            enviados = 0
-            if 'recordatorios enviados' in last_line:
-                try:
-                    enviados = int(last_line.split(':')[1].split('recordatorios')[0].strip())
-                except:
-                    pass
-            
-            return Response({
-                'message': 'Recordatorios enviados exitosamente',
-                'enviados': enviados,
-                'output': output
-            })
-            
+            solo_morosos = str(request.data.get('solo_morosos', '')).lower() in ['1', 'true']
+            return encolar_tarea('recordatorios', date.today().strftime('%Y-%m'), solo_morosos=solo_morosos)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TareasViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Tarea.objects.all().order_by('-fecha_creacion')
+    serializer_class = TareaSerializer
+    permission_classes = [AllowAny]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tipo = self.request.query_params.get('tipo')
+        estado = self.request.query_params.get('estado')
+        
+        if tipo:
+            queryset = queryset.filter(tipo=tipo)
+        if estado:
+            queryset = queryset.filter(estado=estado)
+        return queryset
+    
+    @action(detail=True, methods=['post'])
+    def reintentar(self, request, pk=None):
+        tarea = self.get_object()
+        
+        try:
+            tarea.reintentar()
+            return Response({'message': 'Tarea en cola nuevamente', 'job_id': tarea.id, 'estado': tarea.estado})
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -737,23 +600,19 @@ class ReportesViewSet(viewsets.ViewSet):
 
     @action(detail=False, methods=['get'])
     def morosos(self, request):
-        from django.db.models import Sum, Count
-        from .models import Recibos
-
-        # Agrupar por inmueble y sumar deudas
-        morosos_query = Recibos.objects.filter(saldo_pendiente__gt=0).select_related(
-            'id_inmueble__propietario', 'id_inmueble__edificio'
-        ).values(
-            'id_inmueble__id',
-            'id_inmueble__propietario__id',
-            'id_inmueble__propietario__nombre',
-            'id_inmueble__propietario__apellido',
-            'id_inmueble__edificio__numero_edificio',
-            'id_inmueble__piso',
-            'id_inmueble__apartamento'
-        ).annotate(
-            total_deuda=Sum('saldo_pendiente'),
-            recibos_pendientes=Count('id')
+        from .models import Saldo_Inmueble
+
+        # Deuda materializada por inmueble: búsqueda por índice en lugar de agrupar todos los recibos
+        morosos_query = Saldo_Inmueble.objects.filter(recibos_pendientes__gt=0).values(
+            'inmueble__id',
+            'inmueble__propietario__id',
+            'inmueble__propietario__nombre',
+            'inmueble__propietario__apellido',
+            'inmueble__edificio__numero_edificio',
+            'inmueble__piso',
+            'inmueble__apartamento',
+            'total_deuda',
+            'recibos_pendientes'
         ).order_by('-total_deuda')
 
         data = []
@@ -761,16 +620,26 @@ class ReportesViewSet(viewsets.ViewSet):
             es_moroso = moroso['recibos_pendientes'] > 3
             
             data.append({
-                'propietario_id': moroso['id_inmueble__propietario__id'],
-                'propietario': f"{moroso['id_inmueble__propietario__nombre']} {moroso['id_inmueble__propietario__apellido']}",
-                'inmueble': f"{moroso['id_inmueble__edificio__numero_edificio']}-{moroso['id_inmueble__piso']}{moroso['id_inmueble__apartamento']}",
-                'inmueble_id': moroso['id_inmueble__id'],
+                'propietario_id': moroso['inmueble__propietario__id'],
+                'propietario': f"{moroso['inmueble__propietario__nombre']} {moroso['inmueble__propietario__apellido']}",
+                'inmueble': f"{moroso['inmueble__edificio__numero_edificio']}-{moroso['inmueble__piso']}{moroso['inmueble__apartamento']}",
+                'inmueble_id': moroso['inmueble__id'],
                 'saldo_pendiente': moroso['total_deuda'],
                 'recibos_pendientes': moroso['recibos_pendientes'],
                 'es_moroso': es_moroso
             })
         return Response(data)
 
+    @action(detail=False, methods=['get'])
+    def exportar_morosos(self, request):
+        from .models import Saldo_Inmueble
+        from .exportacion_service import respuesta_csv, anotar_morosidad, COLUMNAS_MOROSOS
+
+        morosos_query = anotar_morosidad(
+            Saldo_Inmueble.objects.filter(recibos_pendientes__gt=0)
+        ).order_by('-total_deuda')
+        return respuesta_csv(morosos_query, COLUMNAS_MOROSOS, 'morosos')
+
     @action(detail=False, methods=['get'])
     def flujo_caja(self, request):
         from django.db.models import Sum
@@ -816,6 +685,20 @@ class ReportesViewSet(viewsets.ViewSet):
         
         return Response(data)
     
+    @action(detail=False, methods=['get'])
+    def exportar_historial_pagos(self, request):
+        from .models import Historial_Pagos
+        from .exportacion_service import respuesta_csv, COLUMNAS_HISTORIAL
+        
+        propietario_id = request.query_params.get('propietario_id')
+        if not propietario_id:
+            return Response({'error': 'propietario_id es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        historial = Historial_Pagos.objects.filter(
+            propietario_id=propietario_id
+        ).order_by('-fecha_transaccion')
+        return respuesta_csv(historial, COLUMNAS_HISTORIAL, f'historial_pagos_{propietario_id}')
+    
     @action(detail=False, methods=['get'])
     def creditos_propietarios(self, request):
         from .models import Creditos_Propietario
@@ -1,13 +1,77 @@
 import requests
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from requests.adapters import HTTPAdapter
 from condominio.models import Configuracion_Recibos
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Errores 4xx que sí pueden resolverse solos o al corregir la configuración
+CODIGOS_REINTENTABLES = {401, 403, 408, 429}
+
+
+class EnvioRechazado(Exception):
+    """El mensaje no se puede entregar nunca (sin teléfono, número inválido, petición rechazada)"""
+
+
+def _es_rechazo_permanente(error):
+    respuesta = getattr(error, 'response', None)
+    return respuesta is not None and 400 <= respuesta.status_code < 500 and respuesta.status_code not in CODIGOS_REINTENTABLES
+
+
+class LimitadorTasa:
+    """Token bucket: permite `tasa` envíos por segundo con ráfagas de hasta `capacidad`"""
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = tasa
+        self.capacidad = capacidad or tasa
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+
+
 class WhatsAppService:
     def __init__(self):
-        self.config = self._get_config()
+        self.api_url = settings.WHATSAPP_API_URL
+        self.timeout = settings.WHATSAPP_TIMEOUT
+        self.concurrencia = settings.WHATSAPP_CONCURRENCIA
+        self.limitador = LimitadorTasa(settings.WHATSAPP_MENSAJES_POR_SEGUNDO)
+
+        # Una sola sesión con un pool de conexiones por hilo de envío (keep-alive)
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrencia)
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+
+        self._config = None
+        self._config_cargada = False
+    
+    @property
+    def config(self):
+        # Se carga al primer uso y no al importar el módulo
+        if not self._config_cargada:
+            self._config = self._get_config()
+            self._config_cargada = True
+        return self._config
+    
+    def recargar_config(self):
+        self._config_cargada = False
+        return self.config
     
     def _get_config(self):
         try:
@@ -15,6 +79,30 @@ class WhatsAppService:
         except:
             return None
     
+    def _post(self, url, headers, payload):
+        """POST a la API respetando el límite de mensajes por segundo y el timeout"""
+        self.limitador.esperar()
+        return self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+    
+    def despachar(self, funcion, elementos):
+        """Ejecuta funcion(elemento) en paralelo con concurrencia acotada.
+
+        Genera (elemento, enviado, error) a medida que terminan los envíos; error
+        es la excepción lanzada o None. La función no debe consultar la base de
+        datos: los datos van precargados.
+        """
+        self.recargar_config()
+        with ThreadPoolExecutor(max_workers=self.concurrencia) as pool:
+            futuros = {pool.submit(funcion, elemento): elemento for elemento in elementos}
+            for futuro in as_completed(futuros):
+                try:
+                    yield futuros[futuro], bool(futuro.result()), None
+                except Exception as e:
+                    yield futuros[futuro], False, e
+    
+    def _modo_prueba(self):
+        return self.config.whatsapp_token == 'MODO_PRUEBA'
+    
     def send_message(self, phone_number, message, pdf_url=None):
         """Envía mensaje de WhatsApp usando la API de Meta"""
         if not self.config or not self.config.whatsapp_activo:
@@ -22,7 +110,7 @@ class WhatsAppService:
             return False
         
         # Modo de prueba - simular envío exitoso
-        if self.config.whatsapp_token == 'MODO_PRUEBA':
+        if self._modo_prueba():
             logger.info(f"MODO PRUEBA - Mensaje simulado a {phone_number}: {message}")
             print(f"📱 WhatsApp simulado a {phone_number}: {message[:50]}...")
             return True
@@ -31,9 +119,9 @@ class WhatsAppService:
         phone = self._clean_phone_number(phone_number)
         if not phone:
             logger.error(f"Número de teléfono inválido: {phone_number}")
-            return False
+            raise EnvioRechazado(f'Número de teléfono inválido: {phone_number}')
         
-        url = f"https://graph.facebook.com/v18.0/{self.config.whatsapp_phone_id}/messages"
+        url = f"{self.api_url}/{self.config.whatsapp_phone_id}/messages"
         headers = {
             'Authorization': f'Bearer {self.config.whatsapp_token}',
             'Content-Type': 'application/json'
@@ -51,7 +139,7 @@ class WhatsAppService:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._post(url, headers, payload)
             response.raise_for_status()
             
             # Si hay PDF, enviarlo como documento
@@ -67,11 +155,13 @@ class WhatsAppService:
             if '131030' in str(e):
                 logger.warning(f"Número {phone} no está en lista permitida. Agrega en Meta for Developers.")
                 print(f"⚠️  Número {phone_number} no permitido. Agrégalo en Meta for Developers.")
+            if _es_rechazo_permanente(e):
+                raise EnvioRechazado(str(e)) from e
             return False
     
     def _send_document(self, phone, pdf_url):
         """Envía documento PDF por WhatsApp"""
-        url = f"https://graph.facebook.com/v18.0/{self.config.whatsapp_phone_id}/messages"
+        url = f"{self.api_url}/{self.config.whatsapp_phone_id}/messages"
         headers = {
             'Authorization': f'Bearer {self.config.whatsapp_token}',
             'Content-Type': 'application/json'
@@ -89,7 +179,7 @@ class WhatsAppService:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._post(url, headers, payload)
             response.raise_for_status()
             logger.info(f"PDF enviado exitosamente a {phone}")
             return True
@@ -115,12 +205,16 @@ class WhatsAppService:
     
     def send_new_receipt_notification(self, propietario, recibo, pdf_url=None):
         """Envía notificación de nuevo recibo"""
+        return self.send_receipt_notice(propietario, recibo.monto_total_pagar, pdf_url)
+    
+    def send_receipt_notice(self, propietario, monto, pdf_url=None):
+        """Envía el aviso de recibo nuevo a partir del monto ya calculado"""
         if not propietario.telefono:
-            return False
+            raise EnvioRechazado('Propietario sin teléfono')
         
         message = self.config.mensaje_nuevo_recibo.format(
             nombre=propietario.nombre,
-            monto=recibo.monto_total_pagar,
+            monto=monto,
             link_pdf=pdf_url or "Disponible en el sistema"
         )
         
@@ -128,25 +222,34 @@ class WhatsAppService:
     
     def send_payment_reminder(self, propietario, recibos_pendientes, total_deuda):
         """Envía recordatorio de pago usando template"""
-        if not propietario.telefono:
+        # Preparar meses pendientes
+        meses_pendientes = ", ".join([
+            recibo.fecha_emision.strftime('%m/%Y') 
+            for recibo in recibos_pendientes
+        ])
+        return self.send_reminder(propietario, meses_pendientes, total_deuda)
+    
+    def send_reminder(self, propietario, meses_pendientes, total_deuda):
+        """Envía el recordatorio con los meses pendientes ya formateados"""
+        if not self.config or not self.config.whatsapp_activo:
+            logger.warning("WhatsApp no está configurado o activo")
             return False
+        if not propietario.telefono:
+            raise EnvioRechazado('Propietario sin teléfono')
+        if self._modo_prueba():
+            logger.info(f"MODO PRUEBA - Recordatorio simulado a {propietario.telefono}: ${total_deuda}")
+            return True
         
         phone = self._clean_phone_number(propietario.telefono)
         if not phone:
-            return False
+            raise EnvioRechazado(f'Número de teléfono inválido: {propietario.telefono}')
             
-        url = f"https://graph.facebook.com/v18.0/{self.config.whatsapp_phone_id}/messages"
+        url = f"{self.api_url}/{self.config.whatsapp_phone_id}/messages"
         headers = {
             'Authorization': f'Bearer {self.config.whatsapp_token}',
             'Content-Type': 'application/json'
         }
         
-        # Preparar meses pendientes
-        meses_pendientes = ", ".join([
-            recibo.fecha_emision.strftime('%m/%Y') 
-            for recibo in recibos_pendientes
-        ])
-        
         # Intentar usar template personalizado, si falla usar hello_world
         payload = {
             "messaging_product": "whatsapp",
@@ -167,7 +270,7 @@ class WhatsAppService:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._post(url, headers, payload)
             response.raise_for_status()
             logger.info(f"Template personalizado enviado a {propietario.nombre}")
             return True
@@ -179,12 +282,14 @@ class WhatsAppService:
                 "language": {"code": "en_US"}
             }
             try:
-                response = requests.post(url, headers=headers, json=payload)
+                response = self._post(url, headers, payload)
                 response.raise_for_status()
                 logger.info(f"Hello World enviado a {propietario.nombre}")
                 return True
             except requests.exceptions.RequestException as e2:
                 logger.error(f"Error enviando template: {e2}")
+                if _es_rechazo_permanente(e2):
+                    raise EnvioRechazado(str(e2)) from e2
                 return False
 
 # Instancia global del servicio
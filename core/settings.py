@@ -149,6 +149,32 @@ STATICFILES_DIRS = []
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
 WHITENOISE_USE_FINDERS = True
 
+# WhatsApp Cloud API (la URL se puede apuntar a un servidor local de pruebas)
+WHATSAPP_API_URL = config('WHATSAPP_API_URL', default='https://graph.facebook.com/v18.0')
+WHATSAPP_TIMEOUT = config('WHATSAPP_TIMEOUT', default=10, cast=float)
+WHATSAPP_CONCURRENCIA = config('WHATSAPP_CONCURRENCIA', default=10, cast=int)
+# Meta permite 80 mensajes por segundo por número emisor en el plan estándar
+WHATSAPP_MENSAJES_POR_SEGUNDO = config('WHATSAPP_MENSAJES_POR_SEGUNDO', default=80, cast=float)
+
+# Procesos que reparten la facturación mensual por edificio (1 = en el mismo proceso)
+FACTURACION_PROCESOS = config('FACTURACION_PROCESOS', default=1, cast=int)
+
+# Archivos generados (PDFs de recibos en caché)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+
+# El worker escribe los ZIPs de PDFs que luego descarga la web: si no comparten disco
+# (servicios separados en Render) los archivos se guardan en un bucket S3 compatible
+AWS_STORAGE_BUCKET_NAME = config('AWS_STORAGE_BUCKET_NAME', default='')
+if AWS_STORAGE_BUCKET_NAME:
+    STORAGES = {
+        'default': {'BACKEND': 'storages.backends.s3.S3Storage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    }
+    AWS_S3_ENDPOINT_URL = config('AWS_S3_ENDPOINT_URL', default=None)
+    AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', default=None)
+    AWS_LOCATION = config('AWS_LOCATION', default='media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 